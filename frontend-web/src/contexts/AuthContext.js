@@ -340,16 +340,41 @@ export const AuthProvider = ({ children }) => {
       return hasPermission(permissions);
     }
     
+    if (!state.isAuthenticated) return false;
+
+    // Answer from what is already known (cache, then effective permissions)
+    // and resolve only the rest with a single batch request
+    const known = (perm) => {
+      if (state.permissionCache.has(perm)) return state.permissionCache.get(perm);
+      if (state.permissions && state.permissions.length > 0) return state.permissions.includes(perm);
+      return undefined;
+    };
+    if (permissions.some(perm => known(perm) === true)) return true;
+    const pending = permissions.filter(perm => known(perm) === undefined);
+    if (pending.length === 0) return false;
+
+    dispatch({ type: AUTH_ACTIONS.PERMISSION_CHECK_START });
     try {
-      const results = await Promise.all(
-        permissions.map(perm => hasPermission(perm))
-      );
-      return results.some(result => result === true);
+      const decisions = await authService.checkPermissions(pending);
+      Object.entries(decisions).forEach(([key, value]) => {
+        dispatch({ type: AUTH_ACTIONS.SET_PERMISSION_CACHE, payload: { key, value } });
+      });
+      return pending.some(perm => decisions[perm] === true);
     } catch (error) {
-      console.error('Multiple permission check failed:', error);
+      console.warn('Multiple permission check failed, using local fallback:', error);
+      // Same local fallback as hasPermission
+      if (state.user && state.user.role) {
+        const results = pending.map(perm => checkPermissionLocally(state.user.role, perm));
+        pending.forEach((key, index) => {
+          dispatch({ type: AUTH_ACTIONS.SET_PERMISSION_CACHE, payload: { key, value: results[index] } });
+        });
+        return results.some(Boolean);
+      }
       return false;
+    } finally {
+      dispatch({ type: AUTH_ACTIONS.PERMISSION_CHECK_END });
     }
-  }, [hasPermission]);
+  }, [hasPermission, state.isAuthenticated, state.permissionCache, state.permissions, state.user]);
 
   // Sync check for permissions (uses cached values only)
   const hasPermissionSync = useCallback((permission) => {
@@ -245,6 +245,22 @@ class AuthService {
     }
   }
 
+  // Check several permissions in a single request; returns { permission: boolean }
+  async checkPermissions(permissions) {
+    const token = this.getToken();
+    if (token && token.startsWith('test-token-')) {
+      const results = await Promise.all(permissions.map(perm => this.hasPermission(perm)));
+      return Object.fromEntries(permissions.map((perm, i) => [perm, results[i]]));
+    }
+
+    const response = await axios.post(`${API_BASE_URL}/api/v1/auth/check-permissions`, {
+      checks: permissions.map(permission => ({ permission }))
+    });
+    return Object.fromEntries(
+      permissions.map((perm, i) => [perm, response.data.results[i].has_permission])
+    );
+  }
+
   // Check if user has any of the provided permissions
   async hasAnyPermission(permissions) {
     if (!Array.isArray(permissions)) {
@@ -252,10 +268,8 @@ class AuthService {
     }
     
     try {
-      const checks = await Promise.all(
-        permissions.map(perm => this.hasPermission(perm))
-      );
-      return checks.some(result => result === true);
+      const decisions = await this.checkPermissions(permissions);
+      return Object.values(decisions).some(result => result === true);
     } catch (error) {
       console.error('Multiple permission check failed:', error);
       return false;
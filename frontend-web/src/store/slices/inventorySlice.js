@@ -7,6 +7,28 @@ const getAuthHeaders = () => ({
   Authorization: `Bearer ${localStorage.getItem('token')}`,
 });
 
+// Register catalog kept in localStorage so products can be looked up and
+// priced offline: { branchId, version, products: { [id]: product } }
+const CATALOG_STORAGE_KEY = 'catalog';
+
+const loadStoredCatalog = () => {
+  try {
+    return JSON.parse(localStorage.getItem(CATALOG_STORAGE_KEY));
+  } catch (error) {
+    return null;
+  }
+};
+
+// A full storage quota only costs the offline copy: the synced catalog is
+// still used in memory, and the older stored one still syncs forward
+const storeCatalog = (catalog) => {
+  try {
+    localStorage.setItem(CATALOG_STORAGE_KEY, JSON.stringify(catalog));
+  } catch (error) {
+    console.warn('Catalog not saved for offline use:', error);
+  }
+};
+
 export const getProducts = createAsyncThunk(
   'inventory/getProducts',
   async (params = {}, { rejectWithValue }) => {
@@ -22,6 +44,49 @@ export const getProducts = createAsyncThunk(
   }
 );
 
+// Full snapshot the first time (or after switching branch), then only the
+// products changed since the version we hold, deactivations included
+export const syncCatalog = createAsyncThunk(
+  'inventory/syncCatalog',
+  async (branchId, { getState, rejectWithValue }) => {
+    const { catalog } = getState().inventory;
+    try {
+      let next;
+      if (!catalog || catalog.branchId !== branchId) {
+        const response = await axios.get(`${POS_API_BASE_URL}/api/v1/inventory/catalog`, {
+          headers: getAuthHeaders(),
+          params: { branch_id: branchId },
+        });
+        next = { branchId, version: response.data.version, products: {} };
+        response.data.products.forEach((product) => {
+          next.products[product.id] = product;
+        });
+      } else {
+        next = { ...catalog, products: { ...catalog.products } };
+        let hasMore = true;
+        while (hasMore) {
+          const response = await axios.get(`${POS_API_BASE_URL}/api/v1/inventory/catalog/changes`, {
+            headers: getAuthHeaders(),
+            params: { branch_id: branchId, since: next.version },
+          });
+          response.data.products.forEach((product) => {
+            next.products[product.id] = product;
+          });
+          response.data.deactivated.forEach((id) => {
+            delete next.products[id];
+          });
+          next.version = response.data.version;
+          hasMore = response.data.has_more;
+        }
+      }
+      storeCatalog(next);
+      return next;
+    } catch (error) {
+      return rejectWithValue(error.response ? error.response.data : error.message);
+    }
+  }
+);
+
 export const createProduct = createAsyncThunk(
   'inventory/createProduct',
   async (productData, { rejectWithValue }) => {
@@ -70,6 +135,9 @@ const inventorySlice = createSlice({
     products: [],
     loading: false,
     error: null,
+    catalog: loadStoredCatalog(),
+    catalogSyncing: false,
+    catalogError: null,
   },
   reducers: {},
   extraReducers: (builder) => {
@@ -86,6 +154,19 @@ const inventorySlice = createSlice({
         state.loading = false;
         state.error = action.payload;
       })
+      .addCase(syncCatalog.pending, (state) => {
+        state.catalogSyncing = true;
+        state.catalogError = null;
+      })
+      .addCase(syncCatalog.fulfilled, (state, action) => {
+        state.catalogSyncing = false;
+        state.catalog = action.payload;
+      })
+      .addCase(syncCatalog.rejected, (state, action) => {
+        // Offline: keep serving the catalog we already have
+        state.catalogSyncing = false;
+        state.catalogError = action.payload;
+      })
       .addCase(createProduct.pending, (state) => {
         state.loading = true;
         state.error = null;
@@ -1,12 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi.security import HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from typing import List
+from datetime import date
 import httpx
 from ....db.session import get_db
 from ....models.invoice import Invoice
 from ....schemas.invoice import InvoiceCreate, InvoiceResponse, InvoiceStatusUpdate
 from ....core.sri import SRIClient
-from ....core.config import settings
+from ....core.pricing import (
+    BasketTotals, LineTotals, TAX_RATES_BY_CODE, from_cents, pricing_engine, to_cents
+)
+from ....core.auth import security, require_permission
+from ....core.http_client import ServiceClient, get_service_client
 
 router = APIRouter()
 
@@ -14,17 +20,22 @@ router = APIRouter()
 async def create_invoice(
     invoice: InvoiceCreate,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    current_user: dict = Depends(require_permission("create_invoice")),
+    pos_client: ServiceClient = Depends(get_service_client("pos"))
 ):
-    # Get sale data from POS service
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(f"{settings.POS_SERVICE_URL}/api/v1/sales/{invoice.sale_id}")
-            if response.status_code != 200:
-                raise HTTPException(status_code=404, detail="Sale not found")
-            sale_data = response.json()
-        except httpx.RequestError:
-            raise HTTPException(status_code=503, detail="POS service unavailable")
+    # Get sale data from POS service (forwarding the caller's token)
+    try:
+        response = await pos_client.get(
+            f"/api/v1/sales/{invoice.sale_id}",
+            headers={"Authorization": f"Bearer {credentials.credentials}"}
+        )
+    except httpx.RequestError:
+        raise HTTPException(status_code=503, detail="POS service unavailable")
+    if response.status_code != 200:
+        raise HTTPException(status_code=404, detail="Sale not found")
+    sale_data = response.json()
 
     # Create invoice record
     db_invoice = Invoice(
@@ -45,7 +56,8 @@ async def create_invoice(
 async def get_invoices(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(require_permission("read_invoice"))
 ):
     invoices = db.query(Invoice).offset(skip).limit(limit).all()
     return invoices
@@ -53,13 +65,35 @@ async def get_invoices(
 @router.get("/{invoice_id}", response_model=InvoiceResponse)
 async def get_invoice(
     invoice_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(require_permission("read_invoice"))
 ):
     invoice = db.query(Invoice).filter(Invoice.id == invoice_id).first()
     if not invoice:
         raise HTTPException(status_code=404, detail="Invoice not found")
     return invoice
 
+def sale_totals(sale_data: dict) -> BasketTotals:
+    """Invoice totals from the per-line amounts pos-service priced the sale with."""
+    items = sale_data["items"]
+    if all(item.get("tax_code") for item in items):
+        return BasketTotals([
+            LineTotals(
+                rate=TAX_RATES_BY_CODE[item["tax_code"]],
+                gross_cents=to_cents(item["total_price"]),
+                discount_cents=to_cents(item.get("discount_amount")),
+                base_cents=to_cents(item["base_amount"]),
+                tax_cents=to_cents(item["tax_amount"]),
+            )
+            for item in items
+        ])
+    # Sales recorded before per-line taxes: price them the way pos-service does
+    return pricing_engine.price_basket(
+        [(item["unit_price"], item["quantity"], None) for item in items],
+        discount=sale_data.get("discount_amount"),
+        on=date.fromisoformat(sale_data["created_at"][:10]),
+    )
+
 async def process_invoice(invoice_id: int, sale_data: dict):
     """Background task to process invoice"""
     from ....db.session import SessionLocal
@@ -82,6 +116,9 @@ async def process_invoice(invoice_id: int, sale_data: dict):
             sequential=str(invoice_id).zfill(9)
         )
 
+        # Same per-line numbers pos-service charged
+        totals = sale_totals(sale_data)
+
         # Prepare invoice data for XML
         invoice_data = {
             "company_name": "Mi Empresa POS",
@@ -95,20 +132,26 @@ async def process_invoice(invoice_id: int, sale_data: dict):
             "buyer_id_type": "05",  # CEDULA
             "buyer_name": sale_data.get("customer_name", "CONSUMIDOR FINAL"),
             "buyer_id": "9999999999999",  # Consumidor final
-            "subtotal": sale_data["total_amount"] - sale_data["tax_amount"],
-            "discount": sale_data["discount_amount"],
-            "tax_amount": sale_data["tax_amount"],
-            "total": sale_data["total_amount"],
+            "subtotal": from_cents(totals.subtotal_cents),
+            "discount": from_cents(totals.discount_cents),
+            "tax_amount": from_cents(totals.tax_cents),
+            "total": from_cents(totals.total_cents),
+            "taxes": [
+                {"code": rate.code, "base": from_cents(base), "value": from_cents(tax)}
+                for rate, (base, tax) in totals.by_rate().items()
+            ],
             "items": [
                 {
                     "code": str(item["product_id"]),
                     "description": item["product_name"],
                     "quantity": item["quantity"],
                     "unit_price": item["unit_price"],
-                    "discount": 0,
-                    "subtotal": item["total_price"],
-                    "tax": item["total_price"] * 0.12
-                } for item in sale_data["items"]
+                    "discount": from_cents(line.discount_cents),
+                    "subtotal": from_cents(line.base_cents),
+                    "tax": from_cents(line.tax_cents),
+                    "tax_code": line.rate.code,
+                    "tax_rate": line.rate.percent,
+                } for item, line in zip(sale_data["items"], totals.lines)
             ]
         }
 
@@ -144,7 +187,8 @@ async def process_invoice(invoice_id: int, sale_data: dict):
 @router.post("/{invoice_id}/check-authorization")
 async def check_invoice_authorization(
     invoice_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(require_permission("update_invoice"))
 ):
     invoice = db.query(Invoice).filter(Invoice.id == invoice_id).first()
     if not invoice:
@@ -0,0 +1,92 @@
+from typing import Any, Callable, Dict
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from jose import JWTError, jwt
+from .jwks import jwks_cache
+from .permissions import decode_permission_bits, permission_registry
+from .revocation import revocation_filter
+from ..core.config import settings
+
+security = HTTPBearer()
+
+def _credentials_exception(detail: str = "Invalid authentication credentials") -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+async def verify_access_token(token: str) -> Dict[str, Any]:
+    # Verify the signature locally against user-service's published keys
+    try:
+        header = jwt.get_unverified_header(token)
+    except JWTError:
+        raise _credentials_exception()
+    if header.get("alg") not in settings.JWT_ALGORITHMS:
+        raise _credentials_exception()
+
+    key = await jwks_cache.get_key(header.get("kid"))
+    if key is None:
+        if not jwks_cache.has_keys:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication service unavailable"
+            )
+        raise _credentials_exception()
+
+    try:
+        payload = jwt.decode(token, key, algorithms=settings.JWT_ALGORITHMS)
+    except JWTError:
+        raise _credentials_exception()
+    if payload.get("type") != "access" or not payload.get("sub"):
+        raise _credentials_exception()
+
+    # Make sure the bit map covers the registry version the token was issued with
+    permission_version = int(payload.get("perm_ver", 0))
+    await permission_registry.ensure(permission_version)
+
+    return {
+        "user_id": int(payload["sub"]),
+        "username": payload.get("username"),
+        "role": payload.get("role"),
+        "permission_mask": decode_permission_bits(payload.get("perm_bits")),
+        "permission_version": permission_version,
+        "branch_id": payload.get("branch_id"),
+        "is_superuser": payload.get("is_superuser", False),
+        "exp": payload.get("exp"),
+        "iat": payload.get("iat"),
+        "jti": payload.get("jti"),
+    }
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    user = await verify_access_token(credentials.credentials)
+    if await revocation_filter.is_revoked(user):
+        raise _credentials_exception("Token has been revoked")
+    return user
+
+def has_permission(user: Dict[str, Any], permission: str) -> bool:
+    return user.get("is_superuser", False) or permission_registry.has(
+        user.get("permission_mask", 0), permission
+    )
+
+def require_permission(permission: str) -> Callable:
+    async def dependency(current_user: Dict[str, Any] = Depends(get_current_user)) -> Dict[str, Any]:
+        if has_permission(current_user, permission):
+            return current_user
+        # Only deny from a map that knows the token's bits; without one the
+        # answer is unknown, not no
+        version = current_user.get("permission_version", 0)
+        if not permission_registry.covers(version):
+            await permission_registry.refresh(version)
+            if not permission_registry.covers(version):
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Permission registry unavailable"
+                )
+            if has_permission(current_user, permission):
+                return current_user
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Permission required: {permission}"
+        )
+    return dependency
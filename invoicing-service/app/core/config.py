@@ -1,5 +1,5 @@
-from pydantic import BaseSettings
-from typing import Optional
+from pydantic_settings import BaseSettings
+from typing import Dict, List, Optional
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "Invoicing Service"
@@ -11,6 +11,39 @@ class Settings(BaseSettings):
 
     # External services
     POS_SERVICE_URL: str = "http://pos-service:8001"
+    USER_SERVICE_URL: str = "http://user-service:8000"
+
+    # JWT verification (keys fetched from user-service JWKS)
+    JWT_ALGORITHMS: List[str] = ["RS256", "ES256"]
+    JWKS_CACHE_TTL: int = 300  # seconds
+    JWKS_MIN_REFRESH_INTERVAL: int = 30  # seconds between refetch attempts
+
+    # Token revocation (bloom filter mirrored from user-service)
+    REVOCATION_REFRESH_INTERVAL: int = 2  # seconds between delta pulls
+    REVOCATION_FULL_SYNC_INTERVAL: int = 300  # seconds between full filter pulls
+    SERVICE_API_KEY: str = "dev-service-key"  # user-service's, for /auth/revocations; change in production
+
+    # Pricing and tax (app/core/pricing.py). Rates: iva_0, iva_12, iva_15,
+    # exempt; category "*" covers products without a category entry.
+    TAX_RATE_TABLE: List[Dict[str, str]] = [
+        {"category": "*", "rate": "iva_12", "from": "2000-01-01"},
+        {"category": "*", "rate": "iva_15", "from": "2024-04-01"},
+    ]
+    PRICES_INCLUDE_TAX: bool = True  # shelf prices already include IVA
+
+    # Inter-service HTTP clients (one keep-alive pool per target)
+    HTTP_CLIENT_TIMEOUT: float = 5.0  # seconds
+    HTTP_CLIENT_CONNECT_TIMEOUT: float = 2.0
+    HTTP_CLIENT_MAX_CONNECTIONS: int = 50
+    HTTP_CLIENT_TARGET_LIMITS: Dict[str, int] = {}  # per-target max_connections
+    HTTP_CLIENT_MAX_KEEPALIVE: int = 20
+    HTTP_CLIENT_KEEPALIVE_EXPIRY: float = 30.0
+    HTTP_CLIENT_HTTP2: bool = False
+    HTTP_CLIENT_RETRIES: int = 2  # idempotent requests only
+    HTTP_CLIENT_BACKOFF_BASE: float = 0.1
+    HTTP_CLIENT_BACKOFF_MAX: float = 2.0
+    HTTP_CIRCUIT_FAILURE_THRESHOLD: int = 5
+    HTTP_CIRCUIT_RESET_TIMEOUT: float = 30.0
 
     # SRI Configuration
     SRI_ENVIRONMENT: str = "test"  # test or production
@@ -0,0 +1,258 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+import httpx
+from .config import settings
+
+RETRYABLE_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRYABLE_STATUS = {502, 503, 504}
+
+class CircuitOpenError(httpx.RequestError):
+    """Raised without touching the network while a target's circuit is open."""
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed -> open -> half-open -> closed."""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._probing:
+            # Let exactly one trial request through
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """A request ended without an outcome (e.g. cancelled); free the probe slot."""
+        self._probing = False
+
+class UpstreamMetrics:
+    def __init__(self, window: int = 1024):
+        self.requests = 0
+        self.failures = 0
+        self.retries = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self._latencies = deque(maxlen=window)
+
+    def observe(self, seconds: float):
+        self._latencies.append(seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        latencies = sorted(self._latencies)
+
+        def percentile(p: float) -> float:
+            if not latencies:
+                return 0.0
+            index = min(len(latencies) - 1, int(round(p * (len(latencies) - 1))))
+            return round(latencies[index] * 1000, 3)
+
+        return {
+            "requests": self.requests,
+            "failures": self.failures,
+            "retries": self.retries,
+            "circuit_rejections": self.rejected,
+            "in_flight": self.in_flight,
+            "latency_ms": {
+                "p50": percentile(0.50),
+                "p95": percentile(0.95),
+                "p99": percentile(0.99),
+                "max": percentile(1.0),
+            },
+        }
+
+class ServiceClient:
+    """Keep-alive pooled client for one upstream service."""
+
+    def __init__(
+        self,
+        name: str,
+        base_url: str,
+        max_connections: int,
+        max_keepalive_connections: int,
+        keepalive_expiry: float,
+        timeout: float,
+        connect_timeout: float,
+        retries: int,
+        backoff_base: float,
+        backoff_max: float,
+        http2: bool,
+        breaker: CircuitBreaker,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.name = name
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker
+        self.metrics = UpstreamMetrics()
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            http2=http2,
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            transport=transport,
+        )
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: uniform(0, min(max, base * 2^attempt))
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        method = method.upper()
+        attempts = 1 + (self.retries if method in RETRYABLE_METHODS else 0)
+
+        for attempt in range(attempts):
+            if not self.breaker.allow():
+                self.metrics.rejected += 1
+                raise CircuitOpenError(f"Circuit open for {self.name}")
+
+            last_attempt = attempt == attempts - 1
+            self.metrics.requests += 1
+            self.metrics.in_flight += 1
+            start = time.perf_counter()
+            settled = False
+            try:
+                response = await self._client.request(method, url, **kwargs)
+            except httpx.TransportError:
+                settled = True
+                self.metrics.failures += 1
+                self.breaker.record_failure()
+                if last_attempt:
+                    raise
+            else:
+                settled = True
+                self.metrics.observe(time.perf_counter() - start)
+                if response.status_code < 500:
+                    self.breaker.record_success()
+                    return response
+                self.metrics.failures += 1
+                self.breaker.record_failure()
+                if last_attempt or response.status_code not in RETRYABLE_STATUS:
+                    return response
+                await response.aclose()
+            finally:
+                self.metrics.in_flight -= 1
+                if not settled:
+                    # Cancelled or failed outside the transport: without this a
+                    # half-open breaker would wait forever for its probe
+                    self.breaker.release()
+
+            self.metrics.retries += 1
+            await asyncio.sleep(self._backoff(attempt))
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    def pool_stats(self) -> Dict[str, Any]:
+        pool = getattr(self._client._transport, "_pool", None)
+        connections = list(getattr(pool, "connections", []))
+        idle = sum(1 for conn in connections if conn.is_idle())
+        return {
+            "connections": len(connections),
+            "idle": idle,
+            "active": len(connections) - idle,
+            "max_connections": getattr(pool, "_max_connections", None),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "circuit": self.breaker.state,
+            "pool": self.pool_stats(),
+            **self.metrics.snapshot(),
+        }
+
+class ServiceClientManager:
+    """One pooled client per upstream, opened and closed with the app lifespan."""
+
+    def __init__(self, targets: Dict[str, str]):
+        self.targets = targets
+        self._clients: Dict[str, ServiceClient] = {}
+
+    def _create(self, name: str) -> ServiceClient:
+        return ServiceClient(
+            name=name,
+            base_url=self.targets[name],
+            max_connections=settings.HTTP_CLIENT_TARGET_LIMITS.get(
+                name, settings.HTTP_CLIENT_MAX_CONNECTIONS
+            ),
+            max_keepalive_connections=settings.HTTP_CLIENT_MAX_KEEPALIVE,
+            keepalive_expiry=settings.HTTP_CLIENT_KEEPALIVE_EXPIRY,
+            timeout=settings.HTTP_CLIENT_TIMEOUT,
+            connect_timeout=settings.HTTP_CLIENT_CONNECT_TIMEOUT,
+            retries=settings.HTTP_CLIENT_RETRIES,
+            backoff_base=settings.HTTP_CLIENT_BACKOFF_BASE,
+            backoff_max=settings.HTTP_CLIENT_BACKOFF_MAX,
+            http2=settings.HTTP_CLIENT_HTTP2,
+            breaker=CircuitBreaker(
+                settings.HTTP_CIRCUIT_FAILURE_THRESHOLD,
+                settings.HTTP_CIRCUIT_RESET_TIMEOUT,
+            ),
+        )
+
+    def start(self):
+        for name in self.targets:
+            self.get(name)
+
+    def get(self, name: str) -> ServiceClient:
+        client = self._clients.get(name)
+        if client is None:
+            client = self._clients[name] = self._create(name)
+        return client
+
+    async def close(self):
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: client.stats() for name, client in self._clients.items()}
+
+service_clients = ServiceClientManager({
+    "pos": settings.POS_SERVICE_URL,
+    "user": settings.USER_SERVICE_URL,
+})
+
+def get_service_client(name: str) -> Callable[[], ServiceClient]:
+    def dependency() -> ServiceClient:
+        return service_clients.get(name)
+    return dependency
@@ -0,0 +1,61 @@
+import asyncio
+import time
+from typing import Any, Dict, Optional
+import httpx
+from .config import settings
+from .http_client import service_clients
+
+class JWKSCache:
+    """Public keys published by user-service, cached and refreshed in-process.
+
+    Keys are refetched when the TTL lapses or a token arrives with an unknown
+    ``kid`` (key rotation). If user-service is unreachable the last known keys
+    keep being used, so verification survives short outages.
+    """
+
+    def __init__(self, url: str, ttl: float, min_refresh_interval: float):
+        self.url = url
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self._keys: Dict[str, Dict[str, Any]] = {}
+        self._fetched_at = 0.0
+        self._last_attempt = float("-inf")
+        self._lock = asyncio.Lock()
+
+    @property
+    def has_keys(self) -> bool:
+        return bool(self._keys)
+
+    async def get_key(self, kid: Optional[str]) -> Optional[Dict[str, Any]]:
+        key = self._keys.get(kid)
+        if key is not None and time.monotonic() - self._fetched_at < self.ttl:
+            return key
+        await self.refresh()
+        return self._keys.get(kid)
+
+    async def refresh(self):
+        async with self._lock:
+            now = time.monotonic()
+            # Throttle refetches so a flood of bad kids can't hammer user-service
+            if now - self._last_attempt < self.min_refresh_interval:
+                return
+            self._last_attempt = now
+            try:
+                response = await service_clients.get("user").get(self.url)
+                response.raise_for_status()
+                keys = {
+                    key["kid"]: key
+                    for key in response.json().get("keys", [])
+                    if "kid" in key
+                }
+            except (httpx.HTTPError, ValueError, KeyError):
+                return
+            if keys:
+                self._keys = keys
+                self._fetched_at = now
+
+jwks_cache = JWKSCache(
+    url=f"{settings.USER_SERVICE_URL}/api/v1/auth/jwks.json",
+    ttl=settings.JWKS_CACHE_TTL,
+    min_refresh_interval=settings.JWKS_MIN_REFRESH_INTERVAL,
+)
@@ -9,6 +9,7 @@ from cryptography.hazmat.primitives import serialization
 from cryptography import x509
 import os
 from .config import settings
+from .pricing import IVA_TAX_CODE
 
 class SRIClient:
     def __init__(self):
@@ -70,13 +71,14 @@ class SRIClient:
         ET.SubElement(info_fact, "totalSinImpuestos").text = str(invoice_data["subtotal"])
         ET.SubElement(info_fact, "totalDescuento").text = str(invoice_data["discount"])
 
-        # Total con impuestos
+        # Total con impuestos (one entry per IVA rate on the invoice)
         total_impuestos = ET.SubElement(info_fact, "totalConImpuestos")
-        total_impuesto = ET.SubElement(total_impuestos, "totalImpuesto")
-        ET.SubElement(total_impuesto, "codigo").text = "2"  # IVA
-        ET.SubElement(total_impuesto, "codigoPorcentaje").text = "2"  # 12%
-        ET.SubElement(total_impuesto, "baseImponible").text = str(invoice_data["subtotal"])
-        ET.SubElement(total_impuesto, "valor").text = str(invoice_data["tax_amount"])
+        for tax in invoice_data["taxes"]:
+            total_impuesto = ET.SubElement(total_impuestos, "totalImpuesto")
+            ET.SubElement(total_impuesto, "codigo").text = IVA_TAX_CODE
+            ET.SubElement(total_impuesto, "codigoPorcentaje").text = tax["code"]
+            ET.SubElement(total_impuesto, "baseImponible").text = str(tax["base"])
+            ET.SubElement(total_impuesto, "valor").text = str(tax["value"])
 
         ET.SubElement(info_fact, "propina").text = "0.00"
         ET.SubElement(info_fact, "importeTotal").text = str(invoice_data["total"])
@@ -96,9 +98,9 @@ class SRIClient:
             # Impuestos por item
             impuestos = ET.SubElement(detalle, "impuestos")
             impuesto = ET.SubElement(impuestos, "impuesto")
-            ET.SubElement(impuesto, "codigo").text = "2"
-            ET.SubElement(impuesto, "codigoPorcentaje").text = "2"
-            ET.SubElement(impuesto, "tarifa").text = "12.00"
+            ET.SubElement(impuesto, "codigo").text = IVA_TAX_CODE
+            ET.SubElement(impuesto, "codigoPorcentaje").text = item["tax_code"]
+            ET.SubElement(impuesto, "tarifa").text = str(item["tax_rate"])
             ET.SubElement(impuesto, "baseImponible").text = str(item["subtotal"])
             ET.SubElement(impuesto, "valor").text = str(item["tax"])
 
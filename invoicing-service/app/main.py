@@ -1,11 +1,24 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from typing import Dict, Any
+from .core.http_client import service_clients
+from .core.revocation import revocation_filter
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Shared keep-alive clients for inter-service calls
+    service_clients.start()
+    revocation_filter.start()
+    yield
+    await revocation_filter.stop()
+    await service_clients.close()
 
 app = FastAPI(
     title="Invoicing Service",
     version="1.0.0",
-    description="Electronic Invoicing Service for SRI compliance"
+    description="Electronic Invoicing Service for SRI compliance",
+    lifespan=lifespan
 )
 
 # CORS
@@ -21,6 +34,14 @@ app.add_middleware(
 async def health_check():
     return {"status": "healthy", "service": "invoicing"}
 
+@app.get("/health/upstreams")
+async def upstream_stats():
+    return service_clients.stats()
+
+@app.get("/health/revocations")
+async def revocation_stats():
+    return revocation_filter.stats()
+
 # Simplified endpoints for testing
 @app.get("/api/v1/invoices")
 async def get_invoices():
@@ -0,0 +1,48 @@
+import xml.etree.ElementTree as ET
+from app.api.v1.endpoints.invoices import sale_totals
+from app.core.sri import SRIClient
+
+SALE = {
+    "created_at": "2025-02-01T10:00:00", "discount_amount": 1.0, "total_amount": 20.0,
+    "items": [
+        {"product_id": 1, "product_name": "Aspirin", "quantity": 1, "unit_price": 4.6, "total_price": 4.6,
+         "discount_amount": 0.2, "base_amount": 4.4, "tax_amount": 0.0, "tax_code": "0"},
+        {"product_id": 2, "product_name": "Cable", "quantity": 2, "unit_price": 8.2, "total_price": 16.4,
+         "discount_amount": 0.8, "base_amount": 13.57, "tax_amount": 2.03, "tax_code": "4"},
+    ],
+}
+
+def test_invoice_uses_the_amounts_pos_charged():
+    totals = sale_totals(SALE)
+    assert (totals.subtotal_cents, totals.tax_cents, totals.total_cents) == (1797, 203, 2000)
+    assert {rate.code: amounts for rate, amounts in totals.by_rate().items()} == {
+        "0": (440, 0), "4": (1357, 203)
+    }
+
+def test_legacy_sales_are_priced_by_the_engine():
+    legacy = dict(SALE, items=[
+        {key: item[key] for key in ("product_id", "product_name", "quantity", "unit_price", "total_price")}
+        for item in SALE["items"]
+    ])
+    totals = sale_totals(legacy)
+    assert totals.total_cents == 2000  # shelf prices include IVA
+    assert {line.rate.code for line in totals.lines} == {"4"}
+
+def test_xml_lists_each_rate():
+    totals = sale_totals(SALE)
+    xml = SRIClient().generate_invoice_xml({
+        "company_name": "Mi Empresa POS", "ruc": "1234567890001", "access_key": "1" * 49,
+        "establishment": "001", "emission_point": "001", "sequential": "000000001",
+        "address": "Quito", "date": "2025-02-01", "buyer_id_type": "07",
+        "buyer_name": "CONSUMIDOR FINAL", "buyer_id": "9999999999999",
+        "subtotal": "17.97", "discount": "1.00", "tax_amount": "2.03", "total": "20.00",
+        "taxes": [{"code": "0", "base": "4.40", "value": "0.00"}, {"code": "4", "base": "13.57", "value": "2.03"}],
+        "items": [
+            {"code": "2", "description": "Cable", "quantity": 2, "unit_price": 8.2, "discount": "0.80",
+             "subtotal": "13.57", "tax": "2.03", "tax_code": line.rate.code, "tax_rate": line.rate.percent}
+            for line in totals.lines[1:]
+        ],
+    })
+    root = ET.fromstring(xml)
+    assert [e.text for e in root.iter("codigoPorcentaje")] == ["0", "4", "4"]
+    assert root.find(".//impuesto/tarifa").text == "15.00"
@@ -1,52 +1,186 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-from ....db.session import get_db
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+import gzip
+from ....db.session import get_db, transaction
 from ....models.product import Product
-from ....schemas.product import ProductCreate, ProductUpdate, ProductResponse
-from ....core.auth import get_current_user
+from ....schemas.product import (
+    CatalogChanges, ProductCreate, ProductImportReport, ProductUpdate, ProductResponse, ProductScan,
+)
+from ....core.auth import has_permission, require_permission
+from ....core.catalog import CATALOG_COLUMNS, catalog_snapshots, next_catalog_version
+from ....core.product_import import READERS, ProductImport
+from ....core.product_index import product_index
+from ....core.product_search import MIN_SUBSTRING, fuzzy_query, normalize, search_query
 
 router = APIRouter()
 
 @router.post("/", response_model=ProductResponse)
 async def create_product(
     product: ProductCreate,
-    db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(require_permission("create_product"))
 ):
     # Check if SKU or barcode already exists
-    if db.query(Product).filter(Product.sku == product.sku).first():
+    if await db.scalar(select(Product.id).where(Product.sku == product.sku)):
         raise HTTPException(status_code=400, detail="SKU already exists")
-    if product.barcode and db.query(Product).filter(Product.barcode == product.barcode).first():
+    if product.barcode and await db.scalar(select(Product.id).where(Product.barcode == product.barcode)):
         raise HTTPException(status_code=400, detail="Barcode already exists")
 
     db_product = Product(**product.dict())
-    db.add(db_product)
-    db.commit()
-    db.refresh(db_product)
+    async with transaction(db):
+        db_product.version = await next_catalog_version(db)
+        db.add(db_product)
+    product_index.put(db_product)
     return db_product
 
+@router.post("/import", response_model=ProductImportReport)
+async def import_products(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    branch_id: Optional[int] = Query(None, description="For rows without a branch_id"),
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    update_existing: bool = True,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(require_permission("create_product"))
+):
+    # Bulk onboarding: a CSV (with header) or NDJSON body, read as it streams
+    # in and upserted by SKU in chunks; see core/product_import.py
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        format = "ndjson" if "json" in content_type else "csv"
+    if update_existing and not has_permission(current_user, "update_product"):
+        raise HTTPException(
+            status_code=403, detail="Permission required: update_product (or pass update_existing=false)"
+        )
+
+    importer = ProductImport(db, branch_id=branch_id, update_existing=update_existing)
+    report = await importer.run(READERS[format](request.stream()))
+    if report.aborted and not report.rows:
+        raise HTTPException(status_code=400, detail=report.aborted)
+    if product_index.ready and report.created + report.updated:
+        # After the response; large imports rebuild branches in a thread
+        background_tasks.add_task(product_index.check)
+    return report
+
 @router.get("/", response_model=List[ProductResponse])
 async def get_products(
     skip: int = 0,
     limit: int = 100,
     branch_id: int = None,
-    db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(require_permission("read_product"))
 ):
-    query = db.query(Product)
+    query = select(Product)
     if branch_id:
-        query = query.filter(Product.branch_id == branch_id)
-    products = query.offset(skip).limit(limit).all()
+        query = query.where(Product.branch_id == branch_id)
+    result = await db.execute(query.offset(skip).limit(limit))
+    return result.scalars().all()
+
+@router.get("/lookup", response_model=ProductScan)
+async def lookup_product(
+    branch_id: int,
+    barcode: Optional[str] = Query(None, min_length=1, max_length=64),
+    sku: Optional[str] = Query(None, min_length=1, max_length=64),
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(require_permission("read_product"))
+):
+    # Register scans: served from the in-process index, already encoded
+    if (barcode is None) == (sku is None):
+        raise HTTPException(status_code=400, detail="Pass either barcode or sku")
+    if product_index.ready:
+        body = product_index.lookup(branch_id, barcode=barcode, sku=sku)
+        if body is not None:
+            return Response(content=body, media_type="application/json")
+
+    # Not indexed yet (startup, or created by another worker since the last check)
+    key = Product.barcode == barcode if barcode is not None else Product.sku == sku
+    product = await db.scalar(
+        select(Product).where(key, Product.branch_id == branch_id, Product.is_active.is_(True))
+    )
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    product_index.put(product)
+    return product
+
+@router.get("/search", response_model=List[ProductScan])
+async def search_products(
+    branch_id: int,
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(require_permission("read_product"))
+):
+    # Type-ahead by name, SKU, barcode or category; ranking in core/product_search.py
+    term = normalize(q)
+    if not term:
+        return []
+    if product_index.search_enabled and product_index.ready:
+        bodies = product_index.search(branch_id, term, limit)
+        if bodies is not None:
+            return Response(content=b"[" + b",".join(bodies) + b"]", media_type="application/json")
+    products = (await db.execute(search_query(branch_id, term, limit))).scalars().all()
+    if not products and len(term) >= MIN_SUBSTRING and db.bind.dialect.name == "postgresql":
+        products = (await db.execute(fuzzy_query(branch_id, term, limit))).scalars().all()
     return products
 
+@router.get("/catalog")
+async def get_catalog(
+    branch_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(require_permission("read_product"))
+):
+    # Terminal bootstrap: the branch's active products and the catalog version
+    # they reflect; afterwards terminals follow /catalog/changes from it
+    snapshot = await catalog_snapshots.get(db, branch_id)
+    headers = {
+        "ETag": f'"{branch_id}-{snapshot.version}"',
+        "X-Catalog-Version": str(snapshot.version),
+        "Vary": "Accept-Encoding",
+    }
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=snapshot.body, media_type="application/json", headers=headers)
+    return Response(content=gzip.decompress(snapshot.body), media_type="application/json", headers=headers)
+
+@router.get("/catalog/changes", response_model=CatalogChanges)
+async def get_catalog_changes(
+    branch_id: int,
+    since: int = Query(..., ge=0),
+    limit: int = Query(1000, ge=1, le=5000),
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(require_permission("read_product"))
+):
+    # Every product changed after ``since``, oldest first; versions are unique,
+    # so a page that stops at ``limit`` resumes exactly where it ended
+    result = await db.execute(
+        select(*CATALOG_COLUMNS)
+        .where(Product.branch_id == branch_id, Product.version > since)
+        .order_by(Product.version)
+        .limit(limit + 1)
+    )
+    rows = result.all()
+    changes = rows[:limit]
+    return CatalogChanges(
+        branch_id=branch_id,
+        since=since,
+        version=changes[-1].version if changes else since,
+        products=[row._mapping for row in changes if row.is_active],
+        deactivated=[row.id for row in changes if not row.is_active],
+        has_more=len(rows) > limit,
+    )
+
 @router.get("/{product_id}", response_model=ProductResponse)
 async def get_product(
     product_id: int,
-    db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(require_permission("read_product"))
 ):
-    product = db.query(Product).filter(Product.id == product_id).first()
+    product = await db.get(Product, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     return product
@@ -55,31 +189,33 @@ async def get_product(
 async def update_product(
     product_id: int,
     product_update: ProductUpdate,
-    db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(require_permission("update_product"))
 ):
-    product = db.query(Product).filter(Product.id == product_id).first()
+    product = await db.get(Product, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
     update_data = product_update.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(product, field, value)
-
-    db.commit()
-    db.refresh(product)
+    async with transaction(db):
+        for field, value in update_data.items():
+            setattr(product, field, value)
+        product.version = await next_catalog_version(db)
+    product_index.put(product)
     return product
 
 @router.delete("/{product_id}")
 async def delete_product(
     product_id: int,
-    db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(require_permission("delete_product"))
 ):
-    product = db.query(Product).filter(Product.id == product_id).first()
+    product = await db.get(Product, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
-    product.is_active = False
-    db.commit()
-    return {"message": "Product deactivated"}
\ No newline at end of file
+    async with transaction(db):
+        product.is_active = False
+        product.version = await next_catalog_version(db)
+    product_index.put(product)
+    return {"message": "Product deactivated"}
@@ -0,0 +1,114 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from datetime import datetime
+from ....db.session import get_db
+from ....models.report import BranchHourlySales, CashierShiftSales, ProductDailySales
+from ....schemas.report import (
+    CashierShift, HourlySales, SalesSummary, SalesSummaryReport, TopProductsReport
+)
+from ....core.auth import require_permission
+
+# Reports read only the rollup tables, never sales/sale_items, so their cost
+# depends on the range asked for and not on how much history there is.
+# Ranges are [date_from, date_to); products are bucketed by day.
+
+router = APIRouter()
+
+def _in_range(query, model, column, branch_id, date_from, date_to):
+    if branch_id is not None:
+        query = query.filter(model.branch_id == branch_id)
+    if date_from is not None:
+        query = query.filter(column >= (date_from.date() if column is ProductDailySales.day else date_from))
+    if date_to is not None:
+        query = query.filter(column < (date_to.date() if column is ProductDailySales.day else date_to))
+    return query
+
+@router.get("/sales/summary", response_model=SalesSummaryReport)
+async def sales_summary(
+    branch_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(require_permission("view_reports"))
+):
+    stmt = _in_range(
+        select(
+            func.coalesce(func.sum(BranchHourlySales.sales_count), 0),
+            func.coalesce(func.sum(BranchHourlySales.items_count), 0),
+            func.coalesce(func.sum(BranchHourlySales.total_amount), 0),
+            func.coalesce(func.sum(BranchHourlySales.tax_amount), 0),
+            func.coalesce(func.sum(BranchHourlySales.discount_amount), 0),
+        ),
+        BranchHourlySales, BranchHourlySales.hour, branch_id, date_from, date_to
+    )
+    row = (await db.execute(stmt)).one()
+    return SalesSummaryReport(
+        branch_id=branch_id, date_from=date_from, date_to=date_to,
+        summary=SalesSummary(
+            sales_count=row[0], items_count=row[1], total_amount=row[2],
+            tax_amount=row[3], discount_amount=row[4]
+        )
+    )
+
+@router.get("/sales/hourly", response_model=List[HourlySales])
+async def hourly_sales(
+    branch_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    limit: int = Query(24 * 31, ge=1, le=24 * 366),
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(require_permission("view_reports"))
+):
+    query = _in_range(
+        select(BranchHourlySales), BranchHourlySales, BranchHourlySales.hour,
+        branch_id, date_from, date_to
+    )
+    result = await db.execute(
+        query.order_by(BranchHourlySales.hour, BranchHourlySales.branch_id).limit(limit)
+    )
+    return result.scalars().all()
+
+@router.get("/products/top", response_model=TopProductsReport)
+async def top_products(
+    branch_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    limit: int = Query(20, ge=1, le=500),
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(require_permission("view_reports"))
+):
+    revenue = func.sum(ProductDailySales.revenue)
+    rows = (await db.execute(_in_range(
+        select(ProductDailySales.product_id, func.sum(ProductDailySales.quantity), revenue),
+        ProductDailySales, ProductDailySales.day, branch_id, date_from, date_to
+    ).group_by(ProductDailySales.product_id).order_by(revenue.desc()).limit(limit))).all()
+    return TopProductsReport(
+        branch_id=branch_id, date_from=date_from, date_to=date_to,
+        products=[
+            {"product_id": product_id, "quantity": quantity, "revenue": total}
+            for product_id, quantity, total in rows
+        ]
+    )
+
+@router.get("/cashiers/shifts", response_model=List[CashierShift])
+async def cashier_shifts(
+    branch_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    limit: int = Query(500, ge=1, le=5000),
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(require_permission("view_reports"))
+):
+    query = _in_range(
+        select(CashierShiftSales), CashierShiftSales, CashierShiftSales.shift_start,
+        branch_id, date_from, date_to
+    )
+    if user_id is not None:
+        query = query.filter(CashierShiftSales.user_id == user_id)
+    result = await db.execute(
+        query.order_by(CashierShiftSales.shift_start, CashierShiftSales.user_id).limit(limit)
+    )
+    return result.scalars().all()
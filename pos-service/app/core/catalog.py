@@ -0,0 +1,102 @@
+import gzip
+import json
+from dataclasses import dataclass
+from typing import Any, Dict
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models.product import CatalogVersion, Product
+
+# Every catalog write (create, update, deactivate) stamps the product with the
+# next catalog version. The counter row stays locked until the writer commits,
+# so versions become visible in order: a reader that has seen version N has
+# seen every change up to N.
+
+async def next_catalog_version(db: AsyncSession, count: int = 1) -> int:
+    """Take the next ``count`` catalog versions inside the caller's transaction.
+
+    Returns the last one; the block is ``last - count + 1`` to ``last``.
+    """
+    for _ in range(2):
+        result = await db.execute(
+            update(CatalogVersion).where(CatalogVersion.id == 1)
+            .values(version=CatalogVersion.version + count)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount:
+            return await db.scalar(select(CatalogVersion.version).where(CatalogVersion.id == 1))
+        # First write to an empty catalog; a savepoint so losing the race to
+        # create the row doesn't abort the caller's transaction
+        try:
+            async with db.begin_nested():
+                db.add(CatalogVersion(id=1, version=count))
+            return count
+        except IntegrityError:
+            pass
+    raise RuntimeError("Could not take a catalog version")
+
+# What terminals keep of a product (and what a scan returns). Reading rows
+# instead of ORM objects keeps full loads cheap.
+CATALOG_COLUMNS = (
+    Product.id, Product.name, Product.price, Product.sku, Product.barcode,
+    Product.category, Product.branch_id, Product.version, Product.is_active,
+)
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    branch_id: int
+    version: int
+    body: bytes  # gzipped JSON
+    size: int  # uncompressed bytes
+
+class CatalogSnapshots:
+    """Full branch catalogs for terminal bootstrap, gzipped once per version.
+
+    A request costs a max(version) query while the branch's catalog hasn't
+    changed; the first request after a change rebuilds the snapshot.
+    """
+
+    def __init__(self, compress_level: int = 6):
+        self.compress_level = compress_level
+        self._snapshots: Dict[int, CatalogSnapshot] = {}
+        self.builds = 0
+        self.hits = 0
+
+    async def get(self, db: AsyncSession, branch_id: int) -> CatalogSnapshot:
+        current = await db.scalar(select(func.max(Product.version)).where(Product.branch_id == branch_id))
+        snapshot = self._snapshots.get(branch_id)
+        if snapshot is not None and snapshot.version == (current or 0):
+            self.hits += 1
+            return snapshot
+
+        # One statement, so the version read matches the products sent
+        result = await db.execute(
+            select(*CATALOG_COLUMNS).where(Product.branch_id == branch_id).order_by(Product.id)
+        )
+        rows = result.all()
+        products = []
+        for row in rows:
+            if row.is_active:
+                product = dict(row._mapping)
+                del product["is_active"]
+                products.append(product)
+        version = max((row.version for row in rows), default=0)
+        body = json.dumps(
+            {"branch_id": branch_id, "version": version, "products": products}, separators=(",", ":")
+        ).encode()
+        snapshot = CatalogSnapshot(branch_id, version, gzip.compress(body, self.compress_level), len(body))
+        self._snapshots[branch_id] = snapshot
+        self.builds += 1
+        return snapshot
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "builds": self.builds,
+            "hits": self.hits,
+            "branches": {
+                branch_id: {"version": snapshot.version, "size": snapshot.size, "compressed": len(snapshot.body)}
+                for branch_id, snapshot in self._snapshots.items()
+            },
+        }
+
+catalog_snapshots = CatalogSnapshots()
@@ -0,0 +1,76 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from .config import settings
+from ..db.session import AsyncSessionLocal
+from ..models.sale import Sale
+
+class IdempotencySweeper:
+    """Clears sale idempotency keys older than ``ttl`` seconds.
+
+    Runs every ``interval`` seconds on the async engine. Sales are kept; only
+    the key is nulled, which drops it from the partial unique index.
+    """
+
+    def __init__(self, session_factory: Callable[[], AsyncSession], ttl: float, interval: float):
+        self.session_factory = session_factory
+        self.ttl = ttl
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.cleared = 0
+        self.failures = 0
+        self.last_run: Optional[datetime] = None
+
+    async def sweep(self) -> int:
+        async with self.session_factory() as db:
+            cutoff = datetime.utcnow() - timedelta(seconds=self.ttl)
+            result = await db.execute(
+                update(Sale)
+                .where(Sale.idempotency_key.isnot(None), Sale.created_at < cutoff)
+                .values(idempotency_key=None)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+        self.runs += 1
+        self.cleared += result.rowcount
+        self.last_run = datetime.utcnow()
+        return result.rowcount
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception:
+                # Keys just live a little longer; try again next interval
+                self.failures += 1
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "runs": self.runs,
+            "cleared": self.cleared,
+            "failures": self.failures,
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+        }
+
+idempotency_sweeper = IdempotencySweeper(
+    session_factory=AsyncSessionLocal,
+    ttl=settings.IDEMPOTENCY_KEY_TTL,
+    interval=settings.IDEMPOTENCY_SWEEP_INTERVAL,
+)
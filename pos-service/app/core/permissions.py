@@ -0,0 +1,68 @@
+import asyncio
+import base64
+import time
+from typing import Dict, Optional
+import httpx
+from .config import settings
+from .http_client import service_clients
+
+def decode_permission_bits(encoded: Optional[str]) -> int:
+    """Decode the token's base64url ``perm_bits`` claim into an integer mask."""
+    if not encoded:
+        return 0
+    raw = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4))
+    return int.from_bytes(raw, "little")
+
+class PermissionRegistryCache:
+    """Permission name -> bit map published by user-service.
+
+    Bits are append-only, so the map only has to be refetched when a token
+    arrives carrying a newer ``perm_ver`` than the one cached here.
+    """
+
+    def __init__(self, url: str, min_refresh_interval: float):
+        self.url = url
+        self.min_refresh_interval = min_refresh_interval
+        self.version = 0
+        self._bits: Dict[str, int] = {}
+        self._last_attempt = float("-inf")
+        self._lock = asyncio.Lock()
+
+    async def ensure(self, version: int):
+        if version > self.version:
+            await self.refresh(version)
+
+    async def refresh(self, min_version: int = 0):
+        async with self._lock:
+            if min_version and self.version >= min_version:
+                return
+            now = time.monotonic()
+            if now - self._last_attempt < self.min_refresh_interval:
+                return
+            self._last_attempt = now
+            try:
+                response = await service_clients.get("user").get(
+                    self.url, params={"min_version": min_version}
+                )
+                response.raise_for_status()
+                data = response.json()
+                bits = {name: int(bit) for name, bit in data["permissions"].items()}
+                version = int(data["version"])
+            except (httpx.HTTPError, ValueError, KeyError, TypeError, AttributeError):
+                return
+            if version >= self.version:
+                self._bits = bits
+                self.version = version
+
+    def covers(self, version: int) -> bool:
+        """Whether the map has been fetched and knows every bit of ``version``."""
+        return bool(self._bits) and self.version >= version
+
+    def has(self, mask: int, name: str) -> bool:
+        bit = self._bits.get(name)
+        return bit is not None and bool(mask >> bit & 1)
+
+permission_registry = PermissionRegistryCache(
+    url=f"{settings.USER_SERVICE_URL}/api/v1/auth/permission-registry",
+    min_refresh_interval=settings.JWKS_MIN_REFRESH_INTERVAL,
+)
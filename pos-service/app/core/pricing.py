@@ -0,0 +1,247 @@
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from .config import settings
+
+try:
+    import numpy as np
+except ImportError:  # batch pricing falls back to the per-basket path
+    np = None
+
+# Pricing and tax engine. pos-service prices sales with it and
+# invoicing-service reads the same numbers back for the SRI XML; both services
+# carry an identical copy of this module.
+#
+# Money is integer cents and rates are basis points, so every path (scalar,
+# NumPy batch) does the same integer arithmetic and rounds the same way.
+
+BASIS = 10000  # 15% == 1500 basis points
+CENT = Decimal("0.01")
+IVA_TAX_CODE = "2"  # SRI "codigo" for IVA
+
+@dataclass(frozen=True)
+class TaxRate:
+    name: str
+    code: str  # SRI codigoPorcentaje
+    basis_points: int
+
+    @property
+    def percent(self) -> Decimal:
+        return (Decimal(self.basis_points) / 100).quantize(CENT)
+
+TAX_RATES = {rate.name: rate for rate in (
+    TaxRate("iva_0", "0", 0),
+    TaxRate("iva_12", "2", 1200),
+    TaxRate("iva_15", "4", 1500),
+    TaxRate("exempt", "7", 0),
+)}
+TAX_RATES_BY_CODE = {rate.code: rate for rate in TAX_RATES.values()}
+
+def to_cents(amount: Any) -> int:
+    return int((Decimal(str(amount or 0)) * 100).quantize(Decimal(1), ROUND_HALF_UP))
+
+def from_cents(cents: int) -> Decimal:
+    return (Decimal(int(cents)) / 100).quantize(CENT)
+
+def split_tax(net, basis_points, prices_include_tax: bool):
+    """(base, tax) for a net line amount; works on ints and on NumPy arrays."""
+    if prices_include_tax:
+        base = (net * BASIS + (BASIS + basis_points) // 2) // (BASIS + basis_points)
+        return base, net - base
+    return net, (net * basis_points + BASIS // 2) // BASIS
+
+def allocate_discount(discount: int, gross: Sequence[int]) -> List[int]:
+    """Spread a basket discount over its lines pro rata, exact to the cent.
+
+    The rounding remainder goes to the largest line (first one on ties).
+    """
+    total = sum(gross)
+    discount = min(discount, total)
+    if discount <= 0:
+        return [0] * len(gross)
+    shares = [discount * amount // total for amount in gross]
+    shares[gross.index(max(gross))] += discount - sum(shares)
+    return shares
+
+class RateTable:
+    """Tax rate by product category and effective date.
+
+    Entries are ``{"category", "rate", "from"}``; category ``"*"`` applies to
+    products whose category has no entry in force on the given day.
+    """
+
+    def __init__(self, entries: Sequence[Dict[str, str]]):
+        self._rules: Dict[str, List[Tuple[date, TaxRate]]] = {}
+        for entry in entries:
+            rule = (date.fromisoformat(entry["from"]), TAX_RATES[entry["rate"]])
+            self._rules.setdefault(entry["category"], []).append(rule)
+        for rules in self._rules.values():
+            rules.sort(key=lambda rule: rule[0])
+
+    def _lookup(self, category: str, on: date) -> Optional[TaxRate]:
+        current = None
+        for effective, rate in self._rules.get(category, ()):
+            if effective > on:
+                break
+            current = rate
+        return current
+
+    def rate_for(self, category: Optional[str], on: date) -> TaxRate:
+        rate = (category and self._lookup(category, on)) or self._lookup("*", on)
+        if rate is None:
+            raise LookupError(f"No tax rate in force on {on} for category {category!r}")
+        return rate
+
+@dataclass(frozen=True)
+class LineTotals:
+    rate: TaxRate
+    gross_cents: int  # unit price x quantity
+    discount_cents: int  # share of the basket discount
+    base_cents: int  # taxable base after discount
+    tax_cents: int
+
+    @property
+    def total_cents(self) -> int:
+        return self.base_cents + self.tax_cents
+
+@dataclass(frozen=True)
+class BasketTotals:
+    lines: List[LineTotals]
+
+    @property
+    def gross_cents(self) -> int:
+        return sum(line.gross_cents for line in self.lines)
+
+    @property
+    def discount_cents(self) -> int:
+        return sum(line.discount_cents for line in self.lines)
+
+    @property
+    def subtotal_cents(self) -> int:
+        return sum(line.base_cents for line in self.lines)
+
+    @property
+    def tax_cents(self) -> int:
+        return sum(line.tax_cents for line in self.lines)
+
+    @property
+    def total_cents(self) -> int:
+        return self.subtotal_cents + self.tax_cents
+
+    def by_rate(self) -> Dict[TaxRate, Tuple[int, int]]:
+        """(base, tax) cents per rate, as SRI's totalConImpuestos wants them."""
+        totals: Dict[TaxRate, Tuple[int, int]] = {}
+        for line in self.lines:
+            base, tax = totals.get(line.rate, (0, 0))
+            totals[line.rate] = (base + line.base_cents, tax + line.tax_cents)
+        return totals
+
+class PricingEngine:
+    def __init__(self, table: RateTable, prices_include_tax: bool):
+        self.table = table
+        self.prices_include_tax = prices_include_tax
+
+    def price_basket(self, lines: Sequence[Tuple[Any, int, Optional[str]]], discount: Any = 0,
+                     on: Optional[date] = None) -> BasketTotals:
+        """Price ``(unit_price, quantity, category)`` lines with Decimal-exact cents."""
+        on = on or date.today()
+        gross = [to_cents(unit_price) * quantity for unit_price, quantity, _ in lines]
+        discounts = allocate_discount(to_cents(discount), gross)
+        priced = []
+        for (_, _, category), amount, line_discount in zip(lines, gross, discounts):
+            rate = self.table.rate_for(category, on)
+            base, tax = split_tax(amount - line_discount, rate.basis_points, self.prices_include_tax)
+            priced.append(LineTotals(rate, amount, line_discount, base, tax))
+        return BasketTotals(priced)
+
+    def price_baskets(self, baskets: Sequence[Tuple[Sequence[Tuple[Any, int, Optional[str]]], Any]],
+                      on: Optional[date] = None) -> List[BasketTotals]:
+        """Price many ``(lines, discount)`` baskets in one vectorized pass."""
+        lines = [line for basket_lines, _ in baskets for line in basket_lines]
+        groups = [index for index, (basket_lines, _) in enumerate(baskets) for _ in basket_lines]
+        result = self.price_batch(
+            [line[0] for line in lines], [line[1] for line in lines], [line[2] for line in lines],
+            discounts=[discount for _, discount in baskets], groups=groups, on=on,
+        )
+        priced: List[List[LineTotals]] = [[] for _ in baskets]
+        for i, group in enumerate(groups):
+            priced[group].append(LineTotals(
+                result["rates"][i], int(result["gross"][i]), int(result["discount"][i]),
+                int(result["base"][i]), int(result["tax"][i]),
+            ))
+        return [BasketTotals(lines) for lines in priced]
+
+    def price_batch(self, unit_prices: Sequence[Any], quantities: Sequence[int],
+                    categories: Sequence[Optional[str]], discounts: Optional[Sequence[Any]] = None,
+                    groups: Optional[Sequence[int]] = None, on: Optional[date] = None) -> Dict[str, Any]:
+        """Line taxes and totals for a whole batch (baskets or a catalog).
+
+        ``groups`` assigns each line to a basket (default: one basket per
+        line) and ``discounts`` holds one discount per basket. Returns int
+        cents per line under "gross", "discount", "base", "tax" and "total",
+        plus the TaxRate of each line under "rates". Uses NumPy when it's
+        installed and gives identical results without it.
+        """
+        on = on or date.today()
+        count = len(unit_prices)
+        groups = list(range(count)) if groups is None else groups
+        baskets = max(groups) + 1 if count else 0
+        discounts = [0] * baskets if discounts is None else discounts
+
+        # Categories are few; resolve each once
+        rates_by_category: Dict[Optional[str], TaxRate] = {}
+        for category in set(categories):
+            rates_by_category[category] = self.table.rate_for(category, on)
+        rates = [rates_by_category[category] for category in categories]
+
+        if np is None:
+            return self._price_batch_python(unit_prices, quantities, rates, discounts, groups)
+
+        cents = np.fromiter((to_cents(price) for price in unit_prices), dtype=np.int64, count=count)
+        gross = cents * np.asarray(quantities, dtype=np.int64)
+        group = np.asarray(groups, dtype=np.int64)
+        points = np.fromiter((rate.basis_points for rate in rates), dtype=np.int64, count=count)
+
+        # Pro-rata discount per basket, remainder to each basket's largest line
+        basket_gross = np.zeros(baskets, dtype=np.int64)
+        np.add.at(basket_gross, group, gross)
+        basket_discount = np.minimum(
+            np.fromiter((to_cents(d) for d in discounts), dtype=np.int64, count=baskets), basket_gross
+        )
+        basket_discount = np.maximum(basket_discount, 0)
+        line_discount = basket_discount[group] * gross // np.maximum(basket_gross[group], 1)
+        allocated = np.zeros(baskets, dtype=np.int64)
+        np.add.at(allocated, group, line_discount)
+        order = np.lexsort((np.arange(count), -gross, group))
+        first = order[np.r_[True, group[order][1:] != group[order][:-1]]] if count else order
+        line_discount[first] += (basket_discount - allocated)[group[first]]
+
+        base, tax = split_tax(gross - line_discount, points, self.prices_include_tax)
+        return {
+            "gross": gross, "discount": line_discount, "base": base, "tax": tax,
+            "total": base + tax, "rates": rates,
+        }
+
+    def _price_batch_python(self, unit_prices, quantities, rates, discounts, groups) -> Dict[str, Any]:
+        gross = [to_cents(price) * quantity for price, quantity in zip(unit_prices, quantities)]
+        members: Dict[int, List[int]] = {}
+        for index, group in enumerate(groups):
+            members.setdefault(group, []).append(index)
+        line_discount = [0] * len(gross)
+        for group, indexes in members.items():
+            shares = allocate_discount(to_cents(discounts[group]), [gross[i] for i in indexes])
+            for index, share in zip(indexes, shares):
+                line_discount[index] = share
+
+        base, tax = [], []
+        for amount, share, rate in zip(gross, line_discount, rates):
+            line_base, line_tax = split_tax(amount - share, rate.basis_points, self.prices_include_tax)
+            base.append(line_base)
+            tax.append(line_tax)
+        return {
+            "gross": gross, "discount": line_discount, "base": base, "tax": tax,
+            "total": [b + t for b, t in zip(base, tax)], "rates": rates,
+        }
+
+pricing_engine = PricingEngine(RateTable(settings.TAX_RATE_TABLE), settings.PRICES_INCLUDE_TAX)
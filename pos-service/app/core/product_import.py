@@ -0,0 +1,259 @@
+import codecs
+import csv
+import json
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from pydantic import ValidationError
+from sqlalchemy import or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from .catalog import next_catalog_version
+from .config import settings
+from ..db.session import transaction
+from ..models.product import Product
+from ..schemas.product import ProductCreate, ProductImportError, ProductImportReport
+
+# Bulk product import (branch onboarding). The file is read as it arrives and
+# handled in chunks: one SELECT finds the chunk's SKUs and barcodes already in
+# the DB, then the valid rows go in with multi-row INSERT ... ON CONFLICT (sku)
+# DO UPDATE and a block of catalog versions, one transaction per chunk. Bad
+# rows are reported by line and skipped; good chunks stay committed.
+#
+# An existing SKU gets its catalog fields replaced and is reactivated; its
+# stock is left alone (stock_quantity only seeds new products).
+
+FIELDS = tuple(ProductCreate.model_fields)
+UPDATED_FIELDS = ("name", "description", "price", "cost", "barcode", "category", "min_stock")
+MAX_REPORTED_ERRORS = 1000
+MAX_RECORD_CHARS = 1 << 20  # a longer CSV record means an unterminated quote
+
+class ImportFormatError(ValueError):
+    """The file can't be read any further."""
+
+Record = Tuple[int, Optional[Dict[str, object]], Optional[str]]  # (line, fields, error)
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, str]]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer, number = "", 0
+    try:
+        async for chunk in chunks:
+            buffer += decoder.decode(chunk)
+            *lines, buffer = buffer.split("\n")
+            for line in lines:
+                number += 1
+                yield number, line + "\n"
+        buffer += decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        raise ImportFormatError(f"Line {number + 1}: not UTF-8")
+    if buffer:
+        yield number + 1, buffer
+
+async def read_csv(chunks: AsyncIterator[bytes]) -> AsyncIterator[Record]:
+    """Rows of a CSV file with a header line, as they arrive."""
+    header = None
+    start, pending, quotes = 0, [], 0
+    async for number, line in _lines(chunks):
+        # A record ends at a newline outside quotes
+        if not pending:
+            start = number
+        pending.append(line)
+        quotes += line.count('"')
+        if quotes % 2:
+            if sum(map(len, pending)) > MAX_RECORD_CHARS:
+                raise ImportFormatError(f"Line {start}: unterminated quoted field")
+            continue
+        row = next(csv.reader(["".join(pending)]), [])
+        pending, quotes = [], 0
+        if not any(value.strip() for value in row):
+            continue
+        if header is None:
+            header = [name.strip().lower() for name in row]
+            unknown = sorted(set(header) - set(FIELDS))
+            if unknown:
+                raise ImportFormatError(f"Unknown columns: {', '.join(unknown)}")
+            continue
+        if len(row) != len(header):
+            yield start, None, f"Expected {len(header)} fields, got {len(row)}"
+            continue
+        # Empty cells take the field's default
+        yield start, {name: value for name, value in zip(header, row) if value.strip()}, None
+    if pending:
+        raise ImportFormatError(f"Line {start}: unterminated quoted field")
+
+async def read_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[Record]:
+    """One JSON object per line, as they arrive."""
+    async for number, line in _lines(chunks):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield number, None, f"Invalid JSON: {exc.msg}"
+            continue
+        if not isinstance(record, dict):
+            yield number, None, "Expected a JSON object"
+            continue
+        yield number, {name: value for name, value in record.items() if value is not None}, None
+
+READERS = {"csv": read_csv, "ndjson": read_ndjson}
+
+def _upsert_statement(dialect: str):
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    # Core table insert: one cached statement run with all of a chunk's rows
+    stmt = insert(Product.__table__)
+    return stmt.on_conflict_do_update(
+        index_elements=["sku"],
+        set_={
+            **{name: getattr(stmt.excluded, name) for name in UPDATED_FIELDS},
+            "version": stmt.excluded.version,
+            "is_active": True,
+        },
+    )
+
+class ProductImport:
+    """One import run; feed it records with ``run``."""
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        branch_id: Optional[int] = None,
+        update_existing: bool = True,
+        chunk_size: int = settings.PRODUCT_IMPORT_CHUNK_SIZE,
+    ):
+        self.db = db
+        self.branch_id = branch_id  # for rows without one
+        self.update_existing = update_existing
+        self.chunk_size = chunk_size
+        self.seen_skus: Dict[str, int] = {}  # sku -> line, for duplicates within the file
+        self.seen_barcodes: Dict[str, int] = {}
+        self.rows = self.created = self.updated = self.failed = 0
+        self.errors: List[ProductImportError] = []
+
+    async def run(self, records: AsyncIterator[Record]) -> ProductImportReport:
+        chunk: List[Tuple[int, Dict[str, object]]] = []
+        aborted = None
+        try:
+            async for line, fields, error in records:
+                self.rows += 1
+                row = self._validate(line, fields, error)
+                if row is not None:
+                    chunk.append((line, row))
+                if len(chunk) >= self.chunk_size:
+                    await self._write(chunk)
+                    chunk = []
+        except ImportFormatError as exc:
+            aborted = str(exc)
+        await self._write(chunk)
+        return ProductImportReport(
+            rows=self.rows,
+            created=self.created,
+            updated=self.updated,
+            failed=self.failed,
+            errors=sorted(self.errors, key=lambda error: error.line),
+            errors_truncated=self.failed > len(self.errors),
+            aborted=aborted,
+        )
+
+    def _fail(self, line: int, sku: Optional[str], *errors: str):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(ProductImportError(line=line, sku=sku, errors=list(errors)))
+
+    def _validate(self, line: int, fields, error: Optional[str]) -> Optional[Dict[str, object]]:
+        """The row's column values, or None after reporting why it's skipped."""
+        if error is not None:
+            self._fail(line, None, error)
+            return None
+        fields.setdefault("branch_id", self.branch_id)
+        sku = fields.get("sku")
+        try:
+            product = ProductCreate(**fields)
+        except ValidationError as exc:
+            self._fail(line, sku if isinstance(sku, str) else None, *(
+                f"{'.'.join(map(str, detail['loc']))}: {detail['msg']}" for detail in exc.errors()
+            ))
+            return None
+        row = product.model_dump()
+        sku = row["sku"] = row["sku"].strip()
+        barcode = row["barcode"] = (row["barcode"] or "").strip() or None
+        if not sku:
+            self._fail(line, None, "sku: must not be empty")
+            return None
+        if sku in self.seen_skus:
+            self._fail(line, sku, f"Duplicate SKU (line {self.seen_skus[sku]})")
+            return None
+        if barcode in self.seen_barcodes:
+            self._fail(line, sku, f"Duplicate barcode (line {self.seen_barcodes[barcode]})")
+            return None
+        self.seen_skus[sku] = line
+        if barcode:
+            self.seen_barcodes[barcode] = line
+        row["is_active"] = True
+        return row
+
+    async def _write(self, chunk: List[Tuple[int, Dict[str, object]]]):
+        if not chunk:
+            return
+        skus = [row["sku"] for _, row in chunk]
+        barcodes = [row["barcode"] for _, row in chunk if row["barcode"]]
+        result = await self.db.execute(
+            select(Product.sku, Product.barcode, Product.branch_id)
+            .where(or_(Product.sku.in_(skus), Product.barcode.in_(barcodes)))
+        )
+        existing = result.all()
+        branch_by_sku = {row.sku: row.branch_id for row in existing}
+        sku_by_barcode = {row.barcode: row.sku for row in existing if row.barcode}
+
+        rows, lines, updated = [], [], 0
+        for line, row in chunk:
+            sku = row["sku"]
+            if sku in branch_by_sku:
+                if not self.update_existing:
+                    self._fail(line, sku, "SKU already exists")
+                    continue
+                if branch_by_sku[sku] != row["branch_id"]:
+                    self._fail(line, sku, f"SKU belongs to branch {branch_by_sku[sku]}")
+                    continue
+            owner = sku_by_barcode.get(row["barcode"])
+            if owner is not None and owner != sku:
+                self._fail(line, sku, "Barcode already exists")
+                continue
+            rows.append(row)
+            lines.append(line)
+            updated += sku in branch_by_sku
+        if not rows:
+            return
+
+        try:
+            async with transaction(self.db):
+                # Versions in file order, one per product, as for single writes
+                last = await next_catalog_version(self.db, len(rows))
+                for version, row in enumerate(rows, last - len(rows) + 1):
+                    row["version"] = version
+                await self._upsert(rows, branch_by_sku)
+        except IntegrityError:
+            # Another writer took one of the SKUs or barcodes since the SELECT
+            for line, row in zip(lines, rows):
+                self._fail(line, row["sku"], "Conflicts with a concurrent write; retry the row")
+            return
+        self.created += len(rows) - updated
+        self.updated += updated
+
+    async def _upsert(self, rows: List[Dict[str, object]], branch_by_sku: Dict[str, int]):
+        dialect = self.db.bind.dialect.name
+        if dialect in ("postgresql", "sqlite"):
+            await self.db.execute(_upsert_statement(dialect), rows)
+            return
+
+        for row in rows:
+            if row["sku"] in branch_by_sku:
+                await self.db.execute(
+                    update(Product).where(Product.sku == row["sku"])
+                    .values({name: row[name] for name in (*UPDATED_FIELDS, "version", "is_active")})
+                    .execution_options(synchronize_session=False)
+                )
+            else:
+                self.db.add(Product(**row))
+        await self.db.flush()
@@ -0,0 +1,246 @@
+import asyncio
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from .catalog import CATALOG_COLUMNS
+from .config import settings
+from .product_search import BranchSearch, memory_search_enabled
+from ..db.session import AsyncSessionLocal
+from ..models.product import Product
+from ..schemas.product import ProductScan
+
+# A branch whose DB fingerprint moved is brought up to date from the rows
+# changed since its last seen version, on the event loop; more changes than
+# this (an import, a new worker) rebuild the branch in a thread instead
+DELTA_MAX_ROWS = 100
+
+class BranchIndex:
+    """Active products of one branch by barcode and by SKU, as encoded JSON.
+
+    With ``search`` it also keeps the branch's n-gram search index.
+    """
+
+    def __init__(self, fingerprint: Tuple[int, int] = (0, 0), search: bool = False):
+        self.fingerprint = fingerprint  # (products, max version) as of the last check
+        self.by_barcode: Dict[str, bytes] = {}
+        self.by_sku: Dict[str, bytes] = {}
+        self.bodies: Dict[int, bytes] = {}
+        self.keys: Dict[int, Tuple[Optional[str], str]] = {}  # id -> (barcode, sku)
+        self.versions: Dict[int, int] = {}  # every product of the branch, active or not
+        self.search = BranchSearch() if search else None
+
+    def load(self, products: List[Product]):
+        """Build from all of the branch's products; CPU-bound, safe to run in a thread."""
+        active = []
+        for product in products:
+            self.versions[product.id] = product.version
+            if product.is_active:
+                self._put(product)
+                active.append(product)
+        if self.search is not None:
+            self.search.load(active)
+
+    def put(self, product: Product):
+        self.versions[product.id] = product.version
+        self._put(product)
+        if self.search is not None:
+            self.search.put(product)
+
+    def _put(self, product: Product):
+        self._unindex(product.id)
+        if not product.is_active:
+            return
+        body = ProductScan.model_validate(product, from_attributes=True).model_dump_json().encode()
+        if product.barcode:
+            self.by_barcode[product.barcode] = body
+        self.by_sku[product.sku] = body
+        self.bodies[product.id] = body
+        self.keys[product.id] = (product.barcode, product.sku)
+
+    def _unindex(self, product_id: int):
+        barcode, sku = self.keys.pop(product_id, (None, None))
+        self.by_barcode.pop(barcode, None)
+        self.by_sku.pop(sku, None)
+        self.bodies.pop(product_id, None)
+
+    def remove(self, product_id: int):
+        """Forget a product that moved to another branch."""
+        self._unindex(product_id)
+        self.versions.pop(product_id, None)
+        if self.search is not None:
+            self.search.remove(product_id)
+
+class ProductIndex:
+    """In-process barcode/SKU index for register scans, one map per branch.
+
+    Built from the DB at startup and updated in place by this worker's own
+    product writes. Every ``interval`` seconds each branch's (product count,
+    max catalog version) is compared with the DB; a branch that moved reads
+    the rows changed since its last seen version, or is rebuilt in a thread
+    when there are many. A scan is two dict lookups and returns JSON encoded
+    when the product was indexed.
+    """
+
+    def __init__(self, session_factory: Callable[[], AsyncSession], interval: float, search: bool = False):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.search_enabled = search
+        self._branches: Optional[Dict[int, BranchIndex]] = None
+        self._product_branch: Dict[int, int] = {}
+        # Writes made while branches are rebuilt off the loop, replayed after
+        self._pending: Optional[List[Product]] = None
+        self._task: Optional[asyncio.Task] = None
+        self.lookups = 0
+        self.updates = 0
+        self.reloads = 0
+        self.failures = 0
+        self.last_check: Optional[datetime] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._branches is not None
+
+    def lookup(self, branch_id: int, barcode: Optional[str] = None, sku: Optional[str] = None) -> Optional[bytes]:
+        self.lookups += 1
+        branch = self._branches.get(branch_id)
+        if branch is None:
+            return None
+        if barcode is not None:
+            return branch.by_barcode.get(barcode)
+        return branch.by_sku.get(sku)
+
+    def search(self, branch_id: int, term: str, limit: int) -> Optional[List[bytes]]:
+        """Encoded products for a normalized term, or None if the branch isn't indexed."""
+        branch = self._branches.get(branch_id)
+        if branch is None or branch.search is None:
+            return None
+        return [branch.bodies[product_id] for product_id in branch.search.search(term, limit)]
+
+    def put(self, product: Product):
+        """Reflect a committed create, update or deactivation."""
+        if self._pending is not None:
+            self._pending.append(product)
+        if self._branches is not None:
+            self._apply(self._branches, product)
+
+    def _apply(self, branches: Dict[int, BranchIndex], product: Product):
+        branch = branches.get(product.branch_id)
+        if branch is not None and branch.versions.get(product.id, -1) > product.version:
+            return  # the index already has a later change
+        previous = self._product_branch.get(product.id)
+        if previous is not None and previous != product.branch_id and previous in branches:
+            branches[previous].remove(product.id)
+        if branch is None:
+            branch = branches[product.branch_id] = BranchIndex(search=self.search_enabled)
+        branch.put(product)
+        self._product_branch[product.id] = product.branch_id
+
+    async def check(self) -> int:
+        """Catch up branches whose DB fingerprint moved; returns how many."""
+        if self._pending is not None:
+            return 0  # another check is rebuilding
+        self._pending = []
+        try:
+            return await self._check()
+        finally:
+            self._pending = None
+
+    async def _check(self) -> int:
+        # Local writes don't touch the fingerprint: a later version of ours
+        # doesn't mean every earlier version (another worker's) is indexed
+        branches = self._branches if self._branches is not None else {}
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(Product.branch_id, func.count(Product.id), func.max(Product.version))
+                .group_by(Product.branch_id)
+            )
+            fingerprints = {branch_id: (count, version) for branch_id, count, version in result}
+            stale = [
+                branch_id for branch_id, fingerprint in fingerprints.items()
+                if branch_id not in branches or branches[branch_id].fingerprint != fingerprint
+            ]
+            for branch_id in stale:
+                branch = branches.get(branch_id)
+                if branch is not None:
+                    since = branch.fingerprint[1]
+                    result = await db.execute(
+                        select(*CATALOG_COLUMNS)
+                        .where(Product.branch_id == branch_id, Product.version > since)
+                        .order_by(Product.version)
+                        .limit(DELTA_MAX_ROWS + 1)
+                    )
+                    rows = result.all()
+                    # Nothing newer yet still different: rows changed without
+                    # a version (or left the branch), so rebuild
+                    if 0 < len(rows) <= DELTA_MAX_ROWS:
+                        for row in rows:
+                            self._apply(branches, row)
+                        branch.fingerprint = (len(branch.versions), max(since, rows[-1].version))
+                        self.updates += 1
+                        continue
+
+                result = await db.execute(select(*CATALOG_COLUMNS).where(Product.branch_id == branch_id))
+                rows = result.all()
+                fresh = BranchIndex(
+                    (len(rows), max((row.version for row in rows), default=0)), search=self.search_enabled
+                )
+                # Seconds of CPU for a large branch with search: keep serving
+                # scans from the current index meanwhile
+                await asyncio.to_thread(fresh.load, rows)
+                if branch is not None:
+                    for product_id in branch.versions:
+                        self._product_branch.pop(product_id, None)
+                branches[branch_id] = fresh
+                for product_id in fresh.versions:
+                    self._product_branch[product_id] = branch_id
+                self.reloads += 1
+        for branch_id in set(branches) - set(fingerprints):
+            for product_id in branches.pop(branch_id).versions:
+                self._product_branch.pop(product_id, None)
+        for product in self._pending:
+            self._apply(branches, product)
+        self._branches = branches
+        self.last_check = datetime.utcnow()
+        return len(stale)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.check()
+            except Exception:
+                # Keep serving the last good index (or the DB fallback)
+                self.failures += 1
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        branches = self._branches or {}
+        return {
+            "ready": self.ready,
+            "branches": len(branches),
+            "products": sum(len(branch.keys) for branch in branches.values()),
+            "lookups": self.lookups,
+            "updates": self.updates,
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "last_check": self.last_check.isoformat() if self.last_check else None,
+        }
+
+product_index = ProductIndex(
+    session_factory=AsyncSessionLocal,
+    interval=settings.PRODUCT_INDEX_CHECK_INTERVAL,
+    search=memory_search_enabled(settings.PRODUCT_SEARCH_BACKEND, settings.DATABASE_URL),
+)
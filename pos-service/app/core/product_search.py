@@ -0,0 +1,222 @@
+import heapq
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import case, func, literal, or_, select
+from ..models.product import SEARCH_TEXT, Product
+
+# Product search for the register's type-ahead. Both backends rank the same
+# way, best first:
+#   0  exact SKU or barcode
+#   1  name starts with the term
+#   2  a later word of the name, or the SKU, barcode or category, starts with it
+#   3  the term appears anywhere (3+ characters)
+# then by name. Only when nothing matches that way: close matches for typos
+# (3+ characters), most similar first. Postgres answers from pg_trgm indexes;
+# elsewhere (SQLite) the per-branch n-gram index kept next to the scan index does.
+
+MIN_SUBSTRING = 3  # shorter terms only match prefixes
+FUZZY_THRESHOLD = 0.6  # share of the term's trigrams a typo match must have (pg_trgm: word_similarity_threshold)
+FUZZY_MAX_POSTINGS = 5000  # trigrams more common than this don't vote
+PREFIX_MAX_WORDS = 1000  # distinct words read for a word-prefix match
+# Items per list.sort() call in load(): a sort holds the GIL throughout, so a
+# branch rebuilt in a thread sorts in runs and merges them, leaving the event
+# loop room to serve requests
+SORT_RUN = 20000
+
+def memory_search_enabled(backend: str, database_url: str) -> bool:
+    """Whether search runs on the in-process index ("auto": unless on Postgres)."""
+    if backend == "auto":
+        return not database_url.startswith("postgresql")
+    return backend == "memory"
+
+def normalize(term: Optional[str]) -> str:
+    return " ".join((term or "").lower().split())
+
+def trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def sorted_in_runs(items: list, key=None) -> list:
+    runs = [sorted(items[i:i + SORT_RUN], key=key) for i in range(0, len(items), SORT_RUN)]
+    if len(runs) == 1:
+        return runs[0]
+    return list(heapq.merge(*runs, key=key))
+
+# -- SQL (pg_trgm on Postgres) ---------------------------------------------
+
+def search_query(branch_id: int, term: str, limit: int):
+    """Ranked search as one statement."""
+    # Terms are lowercased, so every field is compared lowercased too
+    name, sku, barcode = func.lower(Product.name), func.lower(Product.sku), func.lower(Product.barcode)
+    prefix = or_(
+        name.startswith(term, autoescape=True),
+        name.contains(" " + term, autoescape=True),
+        sku.startswith(term, autoescape=True),
+        barcode.startswith(term, autoescape=True),
+        func.lower(Product.category).startswith(term, autoescape=True),
+    )
+    rank = [
+        (or_(sku == term, barcode == term), 0),
+        (name.startswith(term, autoescape=True), 1),
+        (prefix, 2),
+    ]
+    match = prefix
+    if len(term) >= MIN_SUBSTRING:
+        # LIKE '%term%' is answered by the trigram index on Postgres
+        match = SEARCH_TEXT.contains(term, autoescape=True)
+    return (
+        select(Product)
+        .where(Product.branch_id == branch_id, Product.is_active.is_(True), match)
+        .order_by(case(*rank, else_=3), Product.name, Product.id)
+        .limit(limit)
+    )
+
+def fuzzy_query(branch_id: int, term: str, limit: int):
+    """Typo-tolerant fallback; needs pg_trgm (word similarity, via the same index)."""
+    return (
+        select(Product)
+        .where(
+            Product.branch_id == branch_id, Product.is_active.is_(True),
+            literal(term).op("<%")(SEARCH_TEXT),
+        )
+        .order_by(func.word_similarity(term, SEARCH_TEXT).desc(), Product.name, Product.id)
+        .limit(limit)
+    )
+
+# -- In-process -------------------------------------------------------------
+
+class BranchSearch:
+    """N-gram and prefix index over one branch's active products.
+
+    Trigram posting lists are compact int arrays in name order and are only
+    appended to between reloads; matches are always checked against the
+    product's current text, so stale postings cost time but never results.
+    """
+
+    def __init__(self):
+        self.fields: Dict[int, Tuple[str, str, str, str]] = {}  # id -> (name, sku, barcode, category)
+        self.exact: Dict[str, int] = {}  # sku/barcode -> id
+        self.names: List[Tuple[str, int]] = []  # sorted (name, id)
+        # Sorted (word, name, id) for later name words, SKU, barcode and category
+        self.words: List[Tuple[str, str, int]] = []
+        self.grams: Dict[str, array] = defaultdict(lambda: array("i"))
+
+    def load(self, products):
+        """Bulk build from rows; cheaper than put() one by one."""
+        keys = {product.id: (normalize(product.name), product.id) for product in products}
+        for product in sorted_in_runs(list(products), key=lambda product: keys[product.id]):
+            self._add(product, bulk=True)
+        self.names = sorted_in_runs(self.names)
+        self.words = sorted_in_runs(self.words)
+
+    def put(self, product):
+        self.remove(product.id)
+        if product.is_active:
+            self._add(product, bulk=False)
+
+    def _add(self, product, bulk: bool):
+        name, sku = normalize(product.name), normalize(product.sku)
+        barcode, category = normalize(product.barcode), normalize(product.category)
+        self.fields[product.id] = (name, sku, barcode, category)
+        for key in (sku, barcode):
+            if key:
+                self.exact[key] = product.id
+        add = list.append if bulk else insort
+        add(self.names, (name, product.id))
+        for word in self._words(name, sku, barcode, category):
+            add(self.words, (word, name, product.id))
+        for gram in trigrams(" ".join((name, sku, barcode, category))):
+            self.grams[gram].append(product.id)
+
+    @staticmethod
+    def _words(name, sku, barcode, category):
+        return {word for word in (*name.split()[1:], sku, barcode, category) if word}
+
+    def remove(self, product_id: int):
+        fields = self.fields.pop(product_id, None)
+        if fields is None:
+            return
+        name, sku, barcode, category = fields
+        for key in (sku, barcode):
+            if self.exact.get(key) == product_id:
+                del self.exact[key]
+        self._discard(self.names, (name, product_id))
+        for word in self._words(name, sku, barcode, category):
+            self._discard(self.words, (word, name, product_id))
+
+    @staticmethod
+    def _discard(entries, entry):
+        index = bisect_left(entries, entry)
+        if index < len(entries) and entries[index] == entry:
+            del entries[index]
+
+    def _name_prefixed(self, term, limit):
+        # Names are sorted, so the first matches are the best ones
+        index = bisect_left(self.names, (term,))
+        while limit > 0 and index < len(self.names) and self.names[index][0].startswith(term):
+            yield self.names[index][1]
+            index += 1
+            limit -= 1
+
+    def _word_prefixed(self, term, limit):
+        # Each word's entries are in name order: take the first ``limit`` of
+        # every matching word, then jump to the next word
+        index = bisect_left(self.words, (term,))
+        for _ in range(PREFIX_MAX_WORDS):
+            if index >= len(self.words) or not self.words[index][0].startswith(term):
+                return
+            word = self.words[index][0]
+            end = bisect_left(self.words, (word + "\uffff",), index)
+            for entry in self.words[index:min(end, index + limit)]:
+                yield entry[2]
+            index = end
+
+    def search(self, term: str, limit: int) -> List[int]:
+        """Product ids, best match first."""
+        found: List[int] = []
+        seen = set()
+
+        def take(ids):
+            # Within a rank, by name
+            ranked = heapq.nsmallest(
+                limit - len(found), (i for i in set(ids) if i not in seen and i in self.fields),
+                key=lambda i: (self.fields[i][0], i),
+            )
+            found.extend(ranked)
+            seen.update(ranked)
+            return len(found) >= limit
+
+        if term in self.exact and take([self.exact[term]]):
+            return found
+        if take(self._name_prefixed(term, limit)) or take(self._word_prefixed(term, limit)):
+            return found
+        if len(term) < MIN_SUBSTRING:
+            return found
+
+        # Substrings: walk the rarest trigram's postings, which are roughly in
+        # name order, and stop once there are enough
+        postings = sorted((self.grams.get(gram, ()) for gram in trigrams(term)), key=len)
+        substring = []
+        for product_id in postings[0]:
+            fields = self.fields.get(product_id)
+            if product_id not in seen and fields and term in " ".join(fields):
+                substring.append(product_id)
+                if len(substring) >= limit - len(found):
+                    break
+        if take(substring) or found:
+            return found
+
+        # Typos: products sharing enough of the term's trigrams; very common
+        # trigrams don't vote (they'd touch most of the catalog)
+        votes = Counter()
+        for posting in postings:
+            if len(posting) <= FUZZY_MAX_POSTINGS:
+                votes.update(set(posting))
+        needed = FUZZY_THRESHOLD * len(postings)
+        fuzzy = sorted(
+            (product_id for product_id, count in votes.items() if count >= needed and product_id not in seen),
+            key=lambda product_id: (-votes[product_id], self.fields.get(product_id, ("",))[0], product_id),
+        )
+        found.extend(product_id for product_id in fuzzy[:limit - len(found)] if product_id in self.fields)
+        return found
@@ -0,0 +1,153 @@
+import asyncio
+import base64
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+import httpx
+from .config import settings
+from .http_client import service_clients
+
+class BloomFilter:
+    """Read side of user-service's revocation filter (same hashing scheme)."""
+
+    def __init__(self, size: int, hashes: int, bits: bytearray):
+        self.size = size
+        self.hashes = hashes
+        self.bits = bits
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "BloomFilter":
+        return cls(int(data["size"]), int(data["hashes"]), bytearray(base64.b64decode(data["bits"])))
+
+    def _positions(self, key: str) -> Iterable[int]:
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+class RevocationFilter:
+    """Revoked-token filter mirrored from user-service.
+
+    A background task pulls deltas every ``refresh_interval`` seconds and a
+    full filter every ``full_sync_interval`` (dropping expired entries).
+    Per-request checks are two in-memory probes; only a filter hit costs a
+    round-trip to user-service for the exact answer, which is memoised until
+    the next delta brings new keys.
+    """
+
+    def __init__(self, url: str, refresh_interval: float, full_sync_interval: float, memo_size: int = 1024,
+                 service_key: str = ""):
+        self.url = url
+        self.headers = {"X-Service-Key": service_key} if service_key else {}
+        self.refresh_interval = refresh_interval
+        self.full_sync_interval = full_sync_interval
+        self.memo_size = memo_size
+        self.cursor = 0
+        self._filter: Optional[BloomFilter] = None
+        self._full_synced_at = float("-inf")
+        self._memo: "OrderedDict[str, bool]" = OrderedDict()
+        self._task: Optional[asyncio.Task] = None
+        self.checks = 0
+        self.filter_hits = 0
+        self.revoked = 0
+        self.sync_failures = 0
+
+    @property
+    def ready(self) -> bool:
+        return self._filter is not None
+
+    async def refresh(self):
+        full = self._filter is None or time.monotonic() - self._full_synced_at >= self.full_sync_interval
+        params = {} if full else {"since": self.cursor}
+        try:
+            response = await service_clients.get("user").get(self.url, params=params, headers=self.headers)
+            response.raise_for_status()
+            data = response.json()
+            cursor = int(data["cursor"])
+            if "filter" in data:
+                self._filter = BloomFilter.from_dict(data["filter"])
+                self._full_synced_at = time.monotonic()
+                self._memo.clear()
+            elif data.get("keys"):
+                for key in data["keys"]:
+                    self._filter.add(key)
+                self._memo.clear()
+            self.cursor = cursor
+        except (httpx.HTTPError, ValueError, KeyError, TypeError, AttributeError):
+            self.sync_failures += 1
+
+    async def _run(self):
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def is_revoked(self, user: Dict[str, Any]) -> bool:
+        # Until the first sync succeeds tokens are accepted on signature alone
+        if self._filter is None:
+            return False
+        self.checks += 1
+        jti = user.get("jti") or ""
+        if f"jti:{jti}" not in self._filter and f"user:{user['user_id']}" not in self._filter:
+            return False
+
+        self.filter_hits += 1
+        revoked = self._memo.get(jti)
+        if revoked is None:
+            try:
+                response = await service_clients.get("user").get(
+                    f"{self.url}/check",
+                    params={"jti": jti, "user_id": user["user_id"], "iat": user.get("iat") or 0},
+                    headers=self.headers,
+                )
+                response.raise_for_status()
+                revoked = bool(response.json()["revoked"])
+            except (httpx.HTTPError, ValueError, KeyError, TypeError):
+                # Can't confirm a likely revocation: fail closed
+                return True
+            self._memo[jti] = revoked
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+        if revoked:
+            self.revoked += 1
+        return revoked
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "cursor": self.cursor,
+            "checks": self.checks,
+            "filter_hits": self.filter_hits,
+            "revoked": self.revoked,
+            "sync_failures": self.sync_failures,
+        }
+
+revocation_filter = RevocationFilter(
+    url=f"{settings.USER_SERVICE_URL}/api/v1/auth/revocations",
+    refresh_interval=settings.REVOCATION_REFRESH_INTERVAL,
+    full_sync_interval=settings.REVOCATION_FULL_SYNC_INTERVAL,
+    service_key=settings.SERVICE_API_KEY,
+)
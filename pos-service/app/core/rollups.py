@@ -0,0 +1,153 @@
+from collections import defaultdict
+from datetime import date, datetime, time
+from typing import Any, Dict, Iterable, Optional
+from sqlalchemy import and_, case, delete, func, select, update
+from sqlalchemy.orm import Session
+from .config import settings
+from ..models.report import BranchHourlySales, CashierShiftSales, ProductDailySales
+from ..models.sale import Sale, SaleItem
+
+def hour_bucket(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+def shift_bucket(ts: datetime, shift_hours: int) -> datetime:
+    return ts.replace(hour=ts.hour - ts.hour % shift_hours, minute=0, second=0, microsecond=0)
+
+def _upsert(db: Session, model, keys, rows):
+    """Add ``rows`` onto existing rollup rows, inserting the missing ones."""
+    if not rows:
+        return
+    # Same key order in every transaction, so concurrent checkouts can't deadlock
+    rows = sorted(rows, key=lambda row: tuple(row[key] for key in keys))
+    counters = [name for name in rows[0] if name not in keys]
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(model)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=keys,
+            set_={name: getattr(model, name) + getattr(stmt.excluded, name) for name in counters},
+        )
+        db.execute(stmt, rows)
+        return
+
+    for row in rows:
+        match = and_(*(getattr(model, key) == row[key] for key in keys))
+        result = db.execute(
+            update(model).where(match)
+            .values({name: getattr(model, name) + row[name] for name in counters})
+            .execution_options(synchronize_session=False)
+        )
+        if not result.rowcount:
+            db.add(model(**row))
+    db.flush()
+
+class RollupDelta:
+    """Sales accumulated per rollup bucket, written with one upsert per table."""
+
+    def __init__(self, shift_hours: int = settings.REPORT_SHIFT_HOURS):
+        self.shift_hours = shift_hours
+        self._reset()
+
+    def _reset(self):
+        self.branch_hours = defaultdict(lambda: [0, 0, 0.0, 0.0, 0.0])
+        self.product_days = defaultdict(lambda: [0, 0.0])
+        self.cashier_shifts = defaultdict(lambda: [0, 0.0])
+        self.sales = 0
+
+    def add_sale(self, sale: Dict[str, Any], items: Iterable[Any]):
+        created_at = sale["created_at"]
+        branch_id = sale["branch_id"]
+
+        hourly = self.branch_hours[(branch_id, hour_bucket(created_at))]
+        hourly[0] += 1
+        hourly[2] += sale["total_amount"] or 0
+        hourly[3] += sale["tax_amount"] or 0
+        hourly[4] += sale["discount_amount"] or 0
+        for product_id, quantity, total_price in items:
+            hourly[1] += quantity
+            daily = self.product_days[(product_id, branch_id, created_at.date())]
+            daily[0] += quantity
+            daily[1] += total_price or 0
+
+        shift = self.cashier_shifts[(sale["user_id"], branch_id, shift_bucket(created_at, self.shift_hours))]
+        shift[0] += 1
+        shift[1] += sale["total_amount"] or 0
+        self.sales += 1
+
+    def apply(self, db: Session):
+        _upsert(db, BranchHourlySales, ("branch_id", "hour"), [
+            {"branch_id": branch_id, "hour": hour, "sales_count": v[0], "items_count": v[1],
+             "total_amount": v[2], "tax_amount": v[3], "discount_amount": v[4]}
+            for (branch_id, hour), v in self.branch_hours.items()
+        ])
+        _upsert(db, ProductDailySales, ("product_id", "branch_id", "day"), [
+            {"product_id": product_id, "branch_id": branch_id, "day": day,
+             "quantity": v[0], "revenue": v[1]}
+            for (product_id, branch_id, day), v in self.product_days.items()
+        ])
+        _upsert(db, CashierShiftSales, ("user_id", "branch_id", "shift_start"), [
+            {"user_id": user_id, "branch_id": branch_id, "shift_start": shift_start,
+             "sales_count": v[0], "total_amount": v[1]}
+            for (user_id, branch_id, shift_start), v in self.cashier_shifts.items()
+        ])
+        self._reset()
+
+def rebuild(db: Session, since: Optional[date] = None, batch_size: int = 1000, flush_every: int = 10000) -> int:
+    """Recompute rollups from sales/sale_items, from ``since`` (a whole day) on.
+
+    Runs in the caller's transaction: existing buckets in the range are
+    deleted and completed sales are streamed back through a server-side
+    cursor, so the tables are never seen half-built. Returns sales counted.
+    """
+    start = datetime.combine(since, time.min) if since else None
+    for model, column in (
+        (BranchHourlySales, BranchHourlySales.hour),
+        (ProductDailySales, ProductDailySales.day),
+        (CashierShiftSales, CashierShiftSales.shift_start),
+    ):
+        stmt = delete(model)
+        if since is not None:
+            stmt = stmt.where(column >= (since if column is ProductDailySales.day else start))
+        db.execute(stmt.execution_options(synchronize_session=False))
+
+    stmt = (
+        select(
+            Sale.id, Sale.branch_id, Sale.user_id, Sale.created_at, Sale.total_amount,
+            Sale.tax_amount, Sale.discount_amount,
+            SaleItem.product_id, SaleItem.quantity,
+            # Net of the line's discount share, as recorded live; rows from
+            # before per-line amounts only have the gross total
+            case(
+                (SaleItem.base_amount.is_(None), SaleItem.total_price),
+                else_=SaleItem.base_amount + func.coalesce(SaleItem.tax_amount, 0),
+            ).label("line_total"),
+        )
+        .outerjoin(SaleItem, SaleItem.sale_id == Sale.id)
+        .where(Sale.status == "completed")
+        .order_by(Sale.id, SaleItem.id)
+    )
+    if start is not None:
+        stmt = stmt.where(Sale.created_at >= start)
+
+    delta = RollupDelta()
+    counted = 0
+    sale, items = None, []
+    for row in db.execute(stmt.execution_options(yield_per=batch_size)):
+        if sale is None or sale["id"] != row.id:
+            if sale is not None:
+                delta.add_sale(sale, items)
+                counted += 1
+                if delta.sales >= flush_every:
+                    delta.apply(db)
+            sale, items = row._asdict(), []
+        if row.product_id is not None:
+            items.append((row.product_id, row.quantity, row.line_total))
+    if sale is not None:
+        delta.add_sale(sale, items)
+        counted += 1
+    delta.apply(db)
+    return counted
@@ -0,0 +1,134 @@
+import asyncio
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, List, Tuple
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from .config import settings
+from ..models.sale import SaleSequence
+
+def format_sale_number(branch_id: int, terminal_id: int, number: int) -> str:
+    """SRI-style establishment-emission point-sequential, e.g. 001-002-000000042."""
+    return f"{branch_id:03d}-{terminal_id:03d}-{number:09d}"
+
+class NumberClaim:
+    """Numbers set aside for one checkout: ``take`` what gets used, ``release`` the rest.
+
+    Taking never waits on the database, so a sale can be numbered once its
+    stock is secured; released numbers go to the next sale.
+    """
+
+    def __init__(self, allocator: "SaleNumberAllocator", key: Tuple[int, int], count: int):
+        self.allocator = allocator
+        self.key = key
+        self.count = count
+
+    def take(self, count: int = 1) -> List[str]:
+        if count > self.count:
+            raise ValueError(f"Only {self.count} numbers left in the claim")
+        self.count -= count
+        return self.allocator._consume(self.key, count)
+
+    def release(self):
+        self.allocator._held[self.key] -= self.count
+        self.count = 0
+
+class SaleNumberAllocator:
+    """Sequential sale numbers per branch terminal, reserved from the DB in blocks.
+
+    A reservation moves ``sale_sequences.next_value`` forward by a whole block
+    in its own short transaction; the numbers are then handed out from memory,
+    so most sales never touch the sequence row. Numbers are unique across
+    workers and increasing within each worker. Checkouts claim numbers before
+    they lock stock and take them only once the sale will be written, so a
+    rejected sale leaves no gap; a sale rolled back after that, and numbers
+    left in hand when a worker stops, do.
+    """
+
+    def __init__(self, block_size: int):
+        self.block_size = block_size
+        # (branch_id, terminal_id) -> [next, end) ranges in hand, oldest first
+        self._blocks: Dict[Tuple[int, int], Deque[List[int]]] = {}
+        # (branch_id, terminal_id) -> numbers in hand set aside by open claims
+        self._held: Dict[Tuple[int, int], int] = defaultdict(int)
+        self._locks: Dict[Tuple[int, int], asyncio.Lock] = {}
+        self.reservations = 0
+
+    async def claim(self, bind: AsyncEngine, branch_id: int, terminal_id: int, count: int = 1) -> NumberClaim:
+        """Set ``count`` numbers aside, reserving a block first if the ones in hand are spoken for."""
+        key = (branch_id, terminal_id)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            blocks = self._blocks.setdefault(key, deque())
+            short = self._held[key] + count - sum(end - start for start, end in blocks)
+            if short > 0:
+                size = max(self.block_size, short)
+                start = await self._reserve(bind, branch_id, terminal_id, size)
+                blocks.append([start, start + size])
+            self._held[key] += count
+        return NumberClaim(self, key, count)
+
+    async def take(self, bind: AsyncEngine, branch_id: int, terminal_id: int, count: int = 1) -> List[str]:
+        """The terminal's next ``count`` numbers, formatted."""
+        return (await self.claim(bind, branch_id, terminal_id, count)).take(count)
+
+    def _consume(self, key: Tuple[int, int], count: int) -> List[str]:
+        # Claims keep enough numbers in hand, so this never reserves
+        self._held[key] -= count
+        blocks = self._blocks[key]
+        numbers: List[int] = []
+        while len(numbers) < count:
+            block = blocks[0]
+            taken = min(block[1] - block[0], count - len(numbers))
+            numbers.extend(range(block[0], block[0] + taken))
+            block[0] += taken
+            if block[0] == block[1]:
+                blocks.popleft()
+        return [format_sale_number(*key, number) for number in numbers]
+
+    async def _reserve(self, bind: AsyncEngine, branch_id: int, terminal_id: int, size: int) -> int:
+        # Separate transaction: the reservation must outlive a rolled-back sale,
+        # or another worker could be handed the same block
+        where = (SaleSequence.branch_id == branch_id, SaleSequence.terminal_id == terminal_id)
+        async with AsyncSession(bind) as db:
+            for _ in range(2):
+                result = await db.execute(
+                    update(SaleSequence).where(*where)
+                    .values(next_value=SaleSequence.next_value + size)
+                    .execution_options(synchronize_session=False)
+                )
+                if result.rowcount:
+                    end = await db.scalar(select(SaleSequence.next_value).where(*where))
+                    await db.commit()
+                    self.reservations += 1
+                    return end - size
+                db.add(SaleSequence(branch_id=branch_id, terminal_id=terminal_id, next_value=1 + size))
+                try:
+                    await db.commit()
+                    self.reservations += 1
+                    return 1
+                except IntegrityError:
+                    # Another worker created the row first; reserve from it
+                    await db.rollback()
+        raise RuntimeError(f"Could not reserve sale numbers for branch {branch_id} terminal {terminal_id}")
+
+    def reset(self):
+        """Forget blocks in hand (their unused numbers are skipped)."""
+        self._blocks.clear()
+        self._held.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "block_size": self.block_size,
+            "reservations": self.reservations,
+            "remaining": {
+                f"{branch_id}/{terminal_id}": sum(end - start for start, end in blocks)
+                for (branch_id, terminal_id), blocks in self._blocks.items()
+            },
+            "claimed": {
+                f"{branch_id}/{terminal_id}": held
+                for (branch_id, terminal_id), held in self._held.items() if held
+            },
+        }
+
+sale_numbers = SaleNumberAllocator(settings.SALE_NUMBER_BLOCK_SIZE)
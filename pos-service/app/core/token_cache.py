@@ -0,0 +1,112 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Tuple
+from .config import settings
+
+class VerifiedTokenCache:
+    """Bounded LRU of already-verified tokens with request coalescing.
+
+    Entries are keyed on the SHA-256 of the token (raw tokens are never kept)
+    and expire after ``ttl`` seconds or at the token's ``exp``, whichever
+    comes first. Concurrent requests carrying the same uncached token share a
+    single in-flight verification.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    async def get_or_verify(
+        self,
+        token: str,
+        verify: Callable[[str], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        key = self._key(token)
+        now = time.time()
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, user = entry
+            if now < expires_at:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return user
+            del self._entries[key]
+            self.expirations += 1
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            # Verified in a task of its own, so a caller that is cancelled
+            # (client gone) doesn't cancel the verification the others await
+            self.misses += 1
+            task = asyncio.ensure_future(self._verify(key, token, verify, now))
+            task.add_done_callback(self._settled)
+            self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _verify(
+        self, key: str, token: str, verify: Callable[[str], Awaitable[Dict[str, Any]]], now: float
+    ) -> Dict[str, Any]:
+        try:
+            user = await verify(token)
+        finally:
+            self._inflight.pop(key, None)
+        self._store(key, user, now)
+        return user
+
+    @staticmethod
+    def _settled(task: asyncio.Task):
+        # Mark the outcome retrieved when every caller has gone
+        if not task.cancelled():
+            task.exception()
+
+    def _store(self, key: str, user: Dict[str, Any], now: float):
+        expires_at = now + self.ttl
+        if user.get("exp"):
+            expires_at = min(expires_at, float(user["exp"]))
+        if expires_at <= now:
+            return
+
+        self._entries[key] = (expires_at, user)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "inflight": len(self._inflight),
+            "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+        }
+
+token_cache = VerifiedTokenCache(
+    maxsize=settings.TOKEN_CACHE_MAX_SIZE,
+    ttl=settings.TOKEN_CACHE_TTL,
+)
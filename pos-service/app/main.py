@@ -1,11 +1,35 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from typing import Dict, Any
+from .core.http_client import service_clients
+from .core.catalog import catalog_snapshots
+from .core.idempotency import idempotency_sweeper
+from .core.product_index import product_index
+from .core.revocation import revocation_filter
+from .core.sequences import sale_numbers
+from .core.token_cache import token_cache
+from .db.session import async_engine
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Shared keep-alive clients for inter-service calls
+    service_clients.start()
+    revocation_filter.start()
+    idempotency_sweeper.start()
+    product_index.start()
+    yield
+    await product_index.stop()
+    await idempotency_sweeper.stop()
+    await revocation_filter.stop()
+    await service_clients.close()
+    await async_engine.dispose()
 
 app = FastAPI(
     title="POS Service",
     version="1.0.0",
-    description="POS Service for Point of Sale operations"
+    description="POS Service for Point of Sale operations",
+    lifespan=lifespan
 )
 
 # CORS
@@ -21,12 +45,41 @@ app.add_middleware(
 async def health_check():
     return {"status": "healthy", "service": "pos"}
 
+@app.get("/health/upstreams")
+async def upstream_stats():
+    return service_clients.stats()
+
+@app.get("/health/revocations")
+async def revocation_stats():
+    return revocation_filter.stats()
+
+@app.get("/health/idempotency")
+async def idempotency_stats():
+    return idempotency_sweeper.stats()
+
+@app.get("/health/catalog")
+async def catalog_stats():
+    return catalog_snapshots.stats()
+
+@app.get("/health/product-index")
+async def product_index_stats():
+    return product_index.stats()
+
+@app.get("/health/sale-numbers")
+async def sale_number_stats():
+    return sale_numbers.stats()
+
+@app.get("/health/token-cache")
+async def token_cache_stats():
+    return token_cache.stats()
+
 # Include API routers
 try:
-    from .api.v1.endpoints import sales, inventory, branches
+    from .api.v1.endpoints import sales, inventory, branches, reports
     app.include_router(sales.router, prefix="/api/v1/sales", tags=["sales"])
     app.include_router(inventory.router, prefix="/api/v1/inventory", tags=["inventory"])
     app.include_router(branches.router, prefix="/api/v1/branches", tags=["branches"])
+    app.include_router(reports.router, prefix="/api/v1/reports", tags=["reports"])
 except ImportError:
     # Fallback for testing
     pass
@@ -1,8 +1,12 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean
+from sqlalchemy import DDL, BigInteger, Column, Integer, String, Float, Boolean, Index, event, func
 from ..db.session import Base
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        # Catalog deltas: a branch's changes after a given version
+        Index("ix_products_branch_version", "branch_id", "version"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
@@ -15,4 +19,33 @@ class Product(Base):
     stock_quantity = Column(Integer, default=0)
     min_stock = Column(Integer, default=0)
     is_active = Column(Boolean, default=True)
-    branch_id = Column(Integer, index=True)  # For multi-branch
\ No newline at end of file
+    branch_id = Column(Integer, index=True)  # For multi-branch
+    # Catalog version of the last change to the product's catalog fields (not
+    # stock), from core/catalog.py
+    version = Column(BigInteger, nullable=False, default=0)
+
+# Product search (core/product_search.py): Postgres matches terms against
+# one lowercased text of all searchable fields through a trigram index
+SEARCH_TEXT = func.lower(
+    Product.name + " " + Product.sku + " "
+    + func.coalesce(Product.barcode, "") + " " + func.coalesce(Product.category, "")
+)
+event.listen(
+    Product.__table__, "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+Index(
+    "ix_products_search_trgm", SEARCH_TEXT.label("search_text"),
+    postgresql_using="gin", postgresql_ops={"search_text": "gin_trgm_ops"},
+).ddl_if(dialect="postgresql")
+Index(
+    "ix_products_name_prefix", func.lower(Product.name).label("name_lower"),
+    postgresql_ops={"name_lower": "text_pattern_ops"},
+).ddl_if(dialect="postgresql")
+
+class CatalogVersion(Base):
+    """Single-row counter that orders catalog changes."""
+    __tablename__ = "catalog_version"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    version = Column(BigInteger, nullable=False, default=0)
@@ -0,0 +1,34 @@
+from sqlalchemy import Column, Integer, Float, Date, DateTime
+from ..db.session import Base
+
+# Pre-aggregated sales, maintained incrementally by create_sale and rebuilt
+# from sales/sale_items by rebuild-rollups.py. Report endpoints read only these.
+
+class BranchHourlySales(Base):
+    __tablename__ = "rollup_branch_hourly"
+
+    branch_id = Column(Integer, primary_key=True)
+    hour = Column(DateTime, primary_key=True)  # truncated to the hour (UTC)
+    sales_count = Column(Integer, default=0)
+    items_count = Column(Integer, default=0)
+    total_amount = Column(Float, default=0)
+    tax_amount = Column(Float, default=0)
+    discount_amount = Column(Float, default=0)
+
+class ProductDailySales(Base):
+    __tablename__ = "rollup_product_daily"
+
+    product_id = Column(Integer, primary_key=True)
+    branch_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)
+    quantity = Column(Integer, default=0)
+    revenue = Column(Float, default=0)
+
+class CashierShiftSales(Base):
+    __tablename__ = "rollup_cashier_shift"
+
+    user_id = Column(Integer, primary_key=True)
+    branch_id = Column(Integer, primary_key=True)
+    shift_start = Column(DateTime, primary_key=True)  # REPORT_SHIFT_HOURS blocks from midnight
+    sales_count = Column(Integer, default=0)
+    total_amount = Column(Float, default=0)
@@ -1,10 +1,16 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import BigInteger, Column, Integer, String, Float, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from ..db.session import Base
 
 class Sale(Base):
     __tablename__ = "sales"
+    __table_args__ = (
+        # Listing/export filters always come with a date range
+        Index("ix_sales_branch_created", "branch_id", "created_at"),
+        Index("ix_sales_user_created", "user_id", "created_at"),
+        Index("ix_sales_status_created", "status", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     total_amount = Column(Float)
@@ -16,7 +22,9 @@ class Sale(Base):
     branch_id = Column(Integer, index=True)
     user_id = Column(Integer)  # From user service
     customer_name = Column(String, nullable=True)
-    invoice_number = Column(String, unique=True, index=True)
+    invoice_number = Column(String, unique=True, index=True)  # BBB-TTT-NNNNNNNNN, see core/sequences.py
+    # Cleared by the idempotency sweeper once retries can no longer arrive
+    idempotency_key = Column(String(64), nullable=True)
 
     items = relationship("SaleItem", back_populates="sale")
 
@@ -24,11 +32,30 @@ class SaleItem(Base):
     __tablename__ = "sale_items"
 
     id = Column(Integer, primary_key=True, index=True)
-    sale_id = Column(Integer, ForeignKey("sales.id"))
+    sale_id = Column(Integer, ForeignKey("sales.id"), index=True)
     product_id = Column(Integer)
     product_name = Column(String)
     quantity = Column(Integer)
     unit_price = Column(Float)
-    total_price = Column(Float)
+    total_price = Column(Float)  # unit_price x quantity, before discount
+    # From the pricing engine: discount share, taxable base, tax and SRI rate code
+    discount_amount = Column(Float, default=0)
+    base_amount = Column(Float)
+    tax_amount = Column(Float)
+    tax_code = Column(String(2))
+
+    sale = relationship("Sale", back_populates="items")
+
+# Partial index: only live keys are indexed, so sweeping keeps it small
+Index(
+    "ix_sales_idempotency_key", Sale.idempotency_key, unique=True,
+    postgresql_where=Sale.idempotency_key.isnot(None),
+    sqlite_where=Sale.idempotency_key.isnot(None),
+)
+class SaleSequence(Base):
+    """Next unreserved sale number of a branch terminal (hi/lo blocks)."""
+    __tablename__ = "sale_sequences"
 
-    sale = relationship("Sale", back_populates="items")
\ No newline at end of file
+    branch_id = Column(Integer, primary_key=True, autoincrement=False)
+    terminal_id = Column(Integer, primary_key=True, autoincrement=False)
+    next_value = Column(BigInteger, nullable=False, default=1)
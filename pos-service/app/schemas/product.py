@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 
 class ProductBase(BaseModel):
     name: str
@@ -33,4 +33,43 @@ class ProductResponse(ProductBase):
     is_active: bool
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class ProductScan(BaseModel):
+    """Register scan and catalog sync entry.
+
+    No stock: it moves with every sale and is checked at checkout.
+    """
+    id: int
+    name: str
+    price: float
+    sku: str
+    barcode: Optional[str] = None
+    category: Optional[str] = None
+    branch_id: int
+    version: int
+
+    class Config:
+        orm_mode = True
+
+class CatalogChanges(BaseModel):
+    branch_id: int
+    since: int
+    version: int  # pass as ``since`` on the next call
+    products: List[ProductScan]  # created, changed or reactivated
+    deactivated: List[int]
+    has_more: bool
+
+class ProductImportError(BaseModel):
+    line: int  # where the row starts in the file
+    sku: Optional[str] = None
+    errors: List[str]
+
+class ProductImportReport(BaseModel):
+    rows: int
+    created: int
+    updated: int
+    failed: int
+    errors: List[ProductImportError]  # the first MAX_REPORTED_ERRORS
+    errors_truncated: bool = False
+    aborted: Optional[str] = None  # why reading stopped before the end of the file
@@ -0,0 +1,43 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import datetime
+
+class SalesSummary(BaseModel):
+    sales_count: int
+    items_count: int
+    total_amount: float
+    tax_amount: float
+    discount_amount: float
+
+class HourlySales(SalesSummary):
+    branch_id: int
+    hour: datetime
+
+    class Config:
+        orm_mode = True
+
+class ProductSales(BaseModel):
+    product_id: int
+    quantity: int
+    revenue: float
+
+class CashierShift(BaseModel):
+    user_id: int
+    branch_id: int
+    shift_start: datetime
+    sales_count: int
+    total_amount: float
+
+    class Config:
+        orm_mode = True
+
+class ReportRange(BaseModel):
+    branch_id: Optional[int] = None
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+
+class SalesSummaryReport(ReportRange):
+    summary: SalesSummary
+
+class TopProductsReport(ReportRange):
+    products: List[ProductSales]
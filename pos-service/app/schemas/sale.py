@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 from datetime import datetime
 
@@ -8,6 +8,7 @@ class SaleItemBase(BaseModel):
     unit_price: float
 
 class SaleItemCreate(SaleItemBase):
+    quantity: int = Field(..., gt=0)
     product_name: str
     total_price: float
 
@@ -16,6 +17,10 @@ class SaleItemResponse(SaleItemBase):
     sale_id: int
     product_name: str
     total_price: float
+    discount_amount: Optional[float] = None
+    base_amount: Optional[float] = None
+    tax_amount: Optional[float] = None
+    tax_code: Optional[str] = None
 
     class Config:
         orm_mode = True
@@ -27,8 +32,13 @@ class SaleBase(BaseModel):
     customer_name: Optional[str] = None
 
 class SaleCreate(SaleBase):
-    items: List[SaleItemCreate]
+    items: List[SaleItemCreate] = Field(..., min_length=1)
     discount_amount: Optional[float] = 0
+    # Emission point inside the branch; each keeps its own number sequence
+    terminal_id: int = Field(1, ge=1, le=999)
+    # Client-generated key (e.g. a UUID) so retries don't create duplicates;
+    # the Idempotency-Key header takes precedence on POST /sales/
+    idempotency_key: Optional[str] = Field(None, max_length=64)
 
 class SaleResponse(SaleBase):
     id: int
@@ -41,4 +51,21 @@ class SaleResponse(SaleBase):
     items: List[SaleItemResponse]
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class SaleBatchCreate(BaseModel):
+    sales: List[SaleCreate] = Field(..., min_length=1, max_length=500)
+
+class SaleBatchResult(BaseModel):
+    index: int
+    success: bool
+    status_code: int
+    sale_id: Optional[int] = None
+    invoice_number: Optional[str] = None
+    detail: Optional[str] = None
+
+class SaleBatchResponse(BaseModel):
+    created: int
+    replayed: int = 0
+    failed: int
+    results: List[SaleBatchResult]
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Product search (type-ahead) benchmark on the in-process n-gram index.
+
+Builds a branch of --products synthetic products and times BranchSearch
+load, search for random prefixes of product words as a cashier types them
+(1..8 characters, plus a typo per term) and put() of single products.
+Reports p50/p95/p99 in milliseconds.
+
+Usage:
+    python benchmarks/bench_search.py --products 100000
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.product_search import BranchSearch, normalize
+
+WORDS = (
+    "leche entera deslactosada yogur queso mantequilla pan integral arroz azucar sal aceite atun "
+    "sardina fideo harina cafe te chocolate galleta agua gaseosa jugo cerveza detergente jabon "
+    "shampoo papel servilleta pollo carne cerdo huevo manzana banano naranja tomate cebolla papa"
+).split()
+BRANDS = "toni alpina nestle pronaca supermaxi facundo real la favorita oriental".split()
+CATEGORIES = "lacteos panaderia abarrotes bebidas limpieza carnes frutas verduras".split()
+
+def make_products(count: int, rng: random.Random):
+    return [
+        SimpleNamespace(
+            id=i,
+            name=f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} {rng.choice(BRANDS).title()} {rng.randint(1, 999)}g",
+            sku=f"SKU-{i:07d}",
+            barcode=f"786{i:010d}",
+            category=rng.choice(CATEGORIES),
+            is_active=True,
+        )
+        for i in range(1, count + 1)
+    ]
+
+def percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda share: round(samples[min(len(samples) - 1, int(share * len(samples)))] * 1000, 3)
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "mean": round(statistics.mean(samples) * 1000, 3)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--terms", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    products = make_products(args.products, rng)
+    index = BranchSearch()
+    started = time.perf_counter()
+    index.load(products)
+    load_seconds = time.perf_counter() - started
+
+    typed, typos = [], []
+    for _ in range(args.terms):
+        word = normalize(rng.choice(WORDS + BRANDS))
+        term = word[:rng.randint(1, 8)]
+        started = time.perf_counter()
+        index.search(term, args.limit)
+        typed.append(time.perf_counter() - started)
+        if len(word) >= 5:
+            position = rng.randrange(1, len(word) - 1)
+            started = time.perf_counter()
+            index.search(word[:position] + word[position + 1:], args.limit)
+            typos.append(time.perf_counter() - started)
+
+    puts = []
+    for product in rng.sample(products, min(500, len(products))):
+        product.name = f"{rng.choice(WORDS).title()} {rng.choice(BRANDS).title()}"
+        started = time.perf_counter()
+        index.put(product)
+        puts.append(time.perf_counter() - started)
+
+    results = {
+        "products": args.products,
+        "load_seconds": round(load_seconds, 2),
+        "search_ms": percentiles(typed),
+        "typo_ms": percentiles(typos) if typos else None,
+        "put_ms": percentiles(puts),
+    }
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Bulk import products from a CSV (with header) or NDJSON file.
+
+Rows are upserted by SKU: new SKUs are created, existing ones get their
+catalog fields updated (not their stock). Invalid rows are skipped and listed.
+
+Usage:
+    python import-products.py products.csv --branch-id 3
+    python import-products.py products.ndjson --no-update --report errors.json
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from app.core.config import settings
+from app.core.product_import import READERS, ProductImport
+from app.db.session import AsyncSessionLocal, async_engine
+
+async def read_file(path: str, size: int = 1 << 16):
+    with open(path, "rb") as source:
+        while chunk := source.read(size):
+            yield chunk
+
+async def run(args) -> int:
+    extension = os.path.splitext(args.path)[1].lower().lstrip(".")
+    file_format = args.format or ("ndjson" if extension in ("ndjson", "jsonl") else "csv")
+    start = time.perf_counter()
+    try:
+        async with AsyncSessionLocal() as db:
+            importer = ProductImport(
+                db, branch_id=args.branch_id, update_existing=not args.no_update, chunk_size=args.chunk_size
+            )
+            report = await importer.run(READERS[file_format](read_file(args.path)))
+    finally:
+        await async_engine.dispose()
+
+    print(
+        f"{report.rows} rows in {time.perf_counter() - start:.1f}s: "
+        f"{report.created} created, {report.updated} updated, {report.failed} failed"
+    )
+    for error in report.errors[:args.show_errors]:
+        print(f"  line {error.line}{f' ({error.sku})' if error.sku else ''}: {'; '.join(error.errors)}")
+    if report.failed > args.show_errors:
+        print(f"  ... {report.failed - args.show_errors} more")
+    if report.aborted:
+        print(f"Stopped early: {report.aborted}")
+    if args.report:
+        with open(args.report, "w") as output:
+            output.write(report.model_dump_json(indent=2))
+    return 1 if report.aborted else 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="CSV or NDJSON file")
+    parser.add_argument("--format", choices=sorted(READERS), help="Default: from the file extension")
+    parser.add_argument("--branch-id", type=int, help="For rows without a branch_id")
+    parser.add_argument("--no-update", action="store_true", help="Report existing SKUs instead of updating them")
+    parser.add_argument("--chunk-size", type=int, default=settings.PRODUCT_IMPORT_CHUNK_SIZE, help="Rows per transaction")
+    parser.add_argument("--show-errors", type=int, default=20, help="Errors to print")
+    parser.add_argument("--report", help="Write the full report as JSON")
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(run(args)))
+
+if __name__ == "__main__":
+    main()
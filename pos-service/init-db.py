@@ -1,9 +1,10 @@
 #!/usr/bin/env python3
 
 from app.db.session import engine, Base
-from app.models.product import Product
-from app.models.sale import Sale, SaleItem
+from app.models.product import CatalogVersion, Product
+from app.models.sale import Sale, SaleItem, SaleSequence
 from app.models.branch import Branch
+from app.models.report import BranchHourlySales, ProductDailySales, CashierShiftSales
 
 def init_db():
     Base.metadata.create_all(bind=engine)
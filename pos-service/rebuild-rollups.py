@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""Rebuild the reporting rollup tables from sales and sale_items.
+
+Usage:
+    python rebuild-rollups.py                    # everything
+    python rebuild-rollups.py --since 2024-03-01  # backfill from a day on
+"""
+
+import argparse
+import time
+from datetime import date
+
+from app.core.rollups import rebuild
+from app.db.session import SessionLocal, engine, Base
+from app.models.report import BranchHourlySales, ProductDailySales, CashierShiftSales
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--since", type=date.fromisoformat, help="First day to rebuild (YYYY-MM-DD)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows per cursor fetch")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(
+        bind=engine,
+        tables=[BranchHourlySales.__table__, ProductDailySales.__table__, CashierShiftSales.__table__]
+    )
+    start = time.perf_counter()
+    with SessionLocal() as db:
+        counted = rebuild(db, since=args.since, batch_size=args.batch_size)
+        db.commit()
+    print(f"Rebuilt rollups from {counted} sales in {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from app.main import app
+from app.core.auth import get_current_user
+from app.db.session import Base, get_db
+
+@pytest.fixture
+def database(tmp_path):
+    """Empty POS database the app is served from, as a superuser.
+
+    Yields a sync session for seeding and checking results, carrying the
+    app's statements and commits, its sync engine and its session factory.
+    """
+    engine = create_engine(f"sqlite:///{tmp_path}/pos.db")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    session = Session()
+
+    # The app runs on aiosqlite; the fixture session checks results synchronously.
+    # NullPool because TestClient may run each request on a fresh event loop.
+    app_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/pos.db", poolclass=NullPool)
+    AsyncSession = async_sessionmaker(app_engine, autoflush=False, expire_on_commit=False)
+    statements = []
+    event.listen(app_engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    commits = []
+    event.listen(app_engine.sync_engine, "commit", lambda conn: commits.append(conn))
+
+    async def override_get_db():
+        async with AsyncSession() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_user] = lambda: {"user_id": 7, "is_superuser": True}
+    session.statements = statements
+    session.commits = commits
+    session.app_engine = app_engine.sync_engine
+    session.async_sessions = AsyncSession
+    yield session
+    app.dependency_overrides.pop(get_db, None)
+    app.dependency_overrides.pop(get_current_user, None)
+    session.close()
@@ -0,0 +1,178 @@
+import asyncio
+import time
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import HTTPException
+from jose import jwk, jwt
+from app.core import auth
+from app.core.jwks import JWKSCache
+from app.core.permissions import PermissionRegistryCache
+
+def make_key(kid):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption()
+    ).decode()
+    public_jwk = jwk.construct(private_key.public_key().public_bytes(
+        serialization.Encoding.PEM,
+        serialization.PublicFormat.SubjectPublicKeyInfo
+    ), "RS256").to_dict()
+    public_jwk.update({"kid": kid, "use": "sig"})
+    return private_pem, public_jwk
+
+def make_token(private_pem, kid, **claims):
+    payload = {
+        "sub": "7", "username": "cashier1", "role": "cashier",
+        "perm_bits": "Ag", "perm_ver": 2, "branch_id": 1,
+        "exp": time.time() + 60, "type": "access",
+    }
+    payload.update(claims)
+    return jwt.encode(payload, private_pem, algorithm="RS256", headers={"kid": kid})
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = JWKSCache("http://user-service.invalid/jwks.json", ttl=300, min_refresh_interval=30)
+    monkeypatch.setattr(auth, "jwks_cache", cache)
+    registry = PermissionRegistryCache("http://user-service.invalid/registry", min_refresh_interval=30)
+    registry._bits = {"read_sale": 0, "create_sale": 1}
+    registry.version = 2
+    monkeypatch.setattr(auth, "permission_registry", registry)
+    return cache
+
+def test_token_verified_locally(cache):
+    private_pem, public_jwk = make_key("k1")
+    cache._keys = {"k1": public_jwk}
+    cache._fetched_at = time.monotonic()
+
+    user = asyncio.run(auth.verify_access_token(make_token(private_pem, "k1")))
+    assert user["user_id"] == 7
+    assert user["username"] == "cashier1"
+    assert user["permission_mask"] == 0b10
+    assert auth.has_permission(user, "create_sale")
+    assert not auth.has_permission(user, "read_sale")
+    assert auth.has_permission({"is_superuser": True}, "read_sale")
+
+def test_stale_keys_used_when_user_service_down(cache):
+    private_pem, public_jwk = make_key("k1")
+    cache._keys = {"k1": public_jwk}
+    cache._fetched_at = time.monotonic() - 3600
+
+    user = asyncio.run(auth.verify_access_token(make_token(private_pem, "k1")))
+    assert user["user_id"] == 7
+
+def test_rejects_refresh_and_unknown_keys(cache):
+    private_pem, public_jwk = make_key("k1")
+    other_pem, _ = make_key("k2")
+    cache._keys = {"k1": public_jwk}
+    cache._fetched_at = time.monotonic()
+
+    for token in (
+        make_token(private_pem, "k1", type="refresh"),
+        make_token(other_pem, "k2"),
+        make_token(other_pem, "k1"),
+    ):
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(auth.verify_access_token(token))
+        assert exc.value.status_code == 401
+
+def test_unavailable_without_any_keys(cache):
+    private_pem, _ = make_key("k1")
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(auth.verify_access_token(make_token(private_pem, "k1")))
+    assert exc.value.status_code == 503
+
+def test_token_cache_coalesces_and_expires():
+    from app.core.token_cache import VerifiedTokenCache
+
+    calls = []
+
+    async def verify(token):
+        calls.append(token)
+        await asyncio.sleep(0.01)
+        return {"user_id": 7, "exp": time.time() + 60}
+
+    async def scenario():
+        cache = VerifiedTokenCache(maxsize=2, ttl=300)
+        results = await asyncio.gather(*[cache.get_or_verify("t1", verify) for _ in range(20)])
+        assert all(r["user_id"] == 7 for r in results)
+        assert calls == ["t1"]
+
+        await cache.get_or_verify("t1", verify)
+        await cache.get_or_verify("t2", verify)
+        await cache.get_or_verify("t3", verify)
+        return cache.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["misses"] == 3
+    assert stats["coalesced"] == 19
+    assert stats["hits"] == 1
+    assert stats["evictions"] == 1
+    assert stats["size"] == 2
+
+def test_token_cache_honours_token_exp_and_failures():
+    from app.core.token_cache import VerifiedTokenCache
+
+    async def expired(token):
+        return {"user_id": 7, "exp": time.time() - 1}
+
+    async def invalid(token):
+        raise HTTPException(status_code=401)
+
+    async def scenario():
+        cache = VerifiedTokenCache(maxsize=10, ttl=300)
+        await cache.get_or_verify("old", expired)
+        with pytest.raises(HTTPException):
+            await cache.get_or_verify("bad", invalid)
+        return cache.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["size"] == 0
+    assert stats["misses"] == 2
+
+def test_denial_needs_a_registry_that_knows_the_token(cache):
+    check = auth.require_permission("read_sale")
+    user = {"user_id": 7, "permission_mask": 0b10, "permission_version": 2}
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(check(user))
+    assert exc.value.status_code == 403
+
+    # Registry newer in the token than here, and user-service unreachable
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(check({**user, "permission_version": 3}))
+    assert exc.value.status_code == 503
+
+    auth.permission_registry._bits = {}
+    auth.permission_registry.version = 0
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(check({**user, "permission_version": 0}))
+    assert exc.value.status_code == 503
+
+def test_cancelled_leader_does_not_fail_coalesced_requests():
+    from app.core.token_cache import VerifiedTokenCache
+
+    calls = []
+
+    async def verify(token):
+        calls.append(token)
+        await asyncio.sleep(0.02)
+        return {"user_id": 7, "exp": time.time() + 60}
+
+    async def scenario():
+        cache = VerifiedTokenCache(maxsize=10, ttl=300)
+        leader = asyncio.ensure_future(cache.get_or_verify("t1", verify))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(cache.get_or_verify("t1", verify))
+        await asyncio.sleep(0)
+        leader.cancel()
+        user = await follower
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return user, cache.stats()
+
+    user, stats = asyncio.run(scenario())
+    assert user["user_id"] == 7
+    assert calls == ["t1"]
+    assert (stats["coalesced"], stats["size"], stats["inflight"]) == (1, 1, 0)
@@ -0,0 +1,116 @@
+import asyncio
+import httpx
+import pytest
+from app.core.http_client import CircuitBreaker, CircuitOpenError, ServiceClient
+
+def make_client(handler, retries=2, failure_threshold=5):
+    return ServiceClient(
+        name="user",
+        base_url="http://user-service",
+        max_connections=10,
+        max_keepalive_connections=5,
+        keepalive_expiry=30,
+        timeout=1,
+        connect_timeout=1,
+        retries=retries,
+        backoff_base=0,
+        backoff_max=0,
+        http2=False,
+        breaker=CircuitBreaker(failure_threshold, reset_timeout=60),
+        transport=httpx.MockTransport(handler),
+    )
+
+def test_retries_idempotent_requests_on_503():
+    statuses = iter([503, 503, 200])
+
+    def handler(request):
+        return httpx.Response(next(statuses), json={})
+
+    async def scenario():
+        client = make_client(handler)
+        response = await client.get("/api/v1/auth/jwks.json")
+        await client.aclose()
+        return response, client.stats()
+
+    response, stats = asyncio.run(scenario())
+    assert response.status_code == 200
+    assert stats["requests"] == 3
+    assert stats["retries"] == 2
+    assert stats["circuit"] == "closed"
+
+def test_post_is_not_retried():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        raise httpx.ConnectError("refused", request=request)
+
+    async def scenario():
+        client = make_client(handler)
+        with pytest.raises(httpx.ConnectError):
+            await client.post("/api/v1/sales/")
+        await client.aclose()
+
+    asyncio.run(scenario())
+    assert len(calls) == 1
+
+def test_circuit_opens_after_consecutive_failures():
+    def handler(request):
+        raise httpx.ConnectError("refused", request=request)
+
+    async def scenario():
+        client = make_client(handler, retries=0, failure_threshold=2)
+        for _ in range(2):
+            with pytest.raises(httpx.ConnectError):
+                await client.get("/health")
+        with pytest.raises(CircuitOpenError):
+            await client.get("/health")
+        await client.aclose()
+        return client.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["circuit"] == "open"
+    assert stats["circuit_rejections"] == 1
+
+def test_half_open_probe_closes_circuit():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+def test_cancelled_probe_releases_the_circuit():
+    hang = []
+
+    async def handler(request):
+        if hang:
+            await asyncio.sleep(60)
+        raise httpx.ConnectError("refused", request=request)
+
+    async def scenario():
+        client = make_client(handler, retries=0, failure_threshold=1)
+        client.breaker.reset_timeout = 0
+        with pytest.raises(httpx.ConnectError):
+            await client.get("/health")
+        assert client.breaker.state == "half_open"
+
+        # The probe's caller goes away mid-request
+        hang.append(True)
+        probe = asyncio.create_task(client.get("/health"))
+        await asyncio.sleep(0.01)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+        # The next call is allowed to probe instead of being rejected forever
+        hang.clear()
+        with pytest.raises(httpx.ConnectError):
+            await client.get("/health")
+        await client.aclose()
+        return client.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["circuit_rejections"] == 0
+    assert stats["in_flight"] == 0
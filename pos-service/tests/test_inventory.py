@@ -0,0 +1,309 @@
+import asyncio
+import json
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.catalog import catalog_snapshots
+from app.core.product_index import product_index
+from app.models.product import CatalogVersion, Product
+
+@pytest.fixture
+def db(database, monkeypatch):
+    database.add_all([
+        Product(id=i, name=f"Product {i}", price=1.5, cost=1, sku=f"SKU{i}", barcode=f"78600000{i:04d}",
+                stock_quantity=100, branch_id=1 + i % 2, is_active=True, version=i)
+        for i in range(1, 21)
+    ])
+    database.add(CatalogVersion(id=1, version=20))
+    database.commit()
+
+    monkeypatch.setattr(product_index, "session_factory", database.async_sessions)
+    monkeypatch.setattr(product_index, "_branches", None)
+    monkeypatch.setattr(product_index, "_product_branch", {})
+    monkeypatch.setattr(catalog_snapshots, "_snapshots", {})
+    return database
+
+def lookup(client, **params):
+    return client.get("/api/v1/inventory/lookup", params=params)
+
+def test_scan_is_served_from_the_index(db):
+    assert asyncio.run(product_index.check()) == 2
+    del db.statements[:]
+    client = TestClient(app)
+
+    by_barcode = lookup(client, branch_id=1, barcode="786000000004")
+    by_sku = lookup(client, branch_id=1, sku="SKU4")
+    assert by_barcode.status_code == by_sku.status_code == 200
+    assert by_barcode.json() == by_sku.json()
+    assert by_barcode.json()["id"] == 4 and "stock_quantity" not in by_barcode.json()
+    assert db.statements == []
+
+    # Other branch's products aren't visible; misses fall back to the DB
+    assert lookup(client, branch_id=2, barcode="786000000004").status_code == 404
+    assert lookup(client, branch_id=2, sku="SKU4").status_code == 404
+    assert lookup(client, branch_id=1).status_code == 400
+    assert lookup(client, branch_id=1, sku="SKU3", barcode="786000000003").status_code == 400
+
+def test_writes_update_the_index(db):
+    asyncio.run(product_index.check())
+    client = TestClient(app)
+
+    created = client.post("/api/v1/inventory/", json={
+        "name": "Cola", "price": 0.75, "cost": 0.4, "sku": "COLA", "barcode": "7861234567890", "branch_id": 1,
+    }).json()
+    scanned = lookup(client, branch_id=1, barcode="7861234567890").json()
+    assert scanned["id"] == created["id"]
+    first_version = scanned["version"]
+
+    client.put(f"/api/v1/inventory/{created['id']}", json={"barcode": "7861234567891", "price": 0.8})
+    assert lookup(client, branch_id=1, barcode="7861234567890").status_code == 404
+    scanned = lookup(client, branch_id=1, barcode="7861234567891").json()
+    assert scanned["price"] == 0.8 and scanned["version"] > first_version
+
+    client.delete(f"/api/v1/inventory/{created['id']}")
+    assert lookup(client, branch_id=1, sku="COLA").status_code == 404
+    assert product_index.stats()["products"] == 20
+
+def test_check_reloads_branches_changed_elsewhere(db):
+    asyncio.run(product_index.check())
+    assert asyncio.run(product_index.check()) == 0
+
+    # Another worker renamed a product and deactivated one
+    db.get(Product, 3).name, db.get(Product, 3).version = "Renamed", 100
+    db.get(Product, 5).is_active, db.get(Product, 5).version = False, 101
+    db.commit()
+    client = TestClient(app)
+    assert lookup(client, branch_id=2, sku="SKU3").json()["name"] == "Product 3"
+
+    assert asyncio.run(product_index.check()) == 1
+    assert lookup(client, branch_id=2, sku="SKU3").json()["name"] == "Renamed"
+    assert lookup(client, branch_id=2, sku="SKU5").status_code == 404
+
+def test_check_catches_up_without_rebuilding(db, monkeypatch):
+    asyncio.run(product_index.check())
+    reloads = product_index.stats()["reloads"]
+    client = TestClient(app)
+
+    # Another worker's change commits (version 21) before this worker's own
+    # write (22): the check must still pick up the earlier one
+    db.get(Product, 4).name, db.get(Product, 4).version = "Changed elsewhere", 21
+    db.get(CatalogVersion, 1).version = 21
+    db.commit()
+    client.put("/api/v1/inventory/6", json={"price": 3.0})
+    assert lookup(client, branch_id=1, sku="SKU6").json()["price"] == 3.0
+
+    assert asyncio.run(product_index.check()) == 1
+    assert lookup(client, branch_id=1, sku="SKU4").json()["name"] == "Changed elsewhere"
+    assert asyncio.run(product_index.check()) == 0
+    assert product_index.stats()["reloads"] == reloads
+
+    # Many changes at once rebuild the branch (off the event loop)
+    for product in db.query(Product).filter(Product.branch_id == 2):
+        product.version += 1000
+    db.commit()
+    monkeypatch.setattr("app.core.product_index.DELTA_MAX_ROWS", 5)
+    assert asyncio.run(product_index.check()) == 1
+    assert product_index.stats()["reloads"] == reloads + 1
+    assert product_index.stats()["products"] == 20
+
+def test_lookup_before_the_index_is_loaded(db):
+    client = TestClient(app)
+    assert not product_index.ready
+    response = lookup(client, branch_id=1, barcode="786000000002")
+    assert response.status_code == 200
+    assert response.json()["sku"] == "SKU2"
+
+def test_catalog_snapshot_then_deltas(db):
+    client = TestClient(app)
+    snapshot = client.get("/api/v1/inventory/catalog", params={"branch_id": 1})
+    assert snapshot.status_code == 200
+    assert snapshot.headers["content-encoding"] == "gzip"
+    catalog = snapshot.json()
+    assert catalog["version"] == 20
+    assert sorted(product["id"] for product in catalog["products"]) == list(range(2, 21, 2))
+
+    # Unchanged catalog: served from cache, and a conditional GET is a 304
+    again = client.get("/api/v1/inventory/catalog", params={"branch_id": 1},
+                       headers={"If-None-Match": snapshot.headers["etag"]})
+    assert again.status_code == 304
+
+    client.put("/api/v1/inventory/2", json={"price": 2.25})
+    client.delete("/api/v1/inventory/4")
+    created = client.post("/api/v1/inventory/", json={
+        "name": "Cola", "price": 0.75, "cost": 0.4, "sku": "COLA", "branch_id": 1,
+    }).json()
+    client.put("/api/v1/inventory/3", json={"price": 9.0})  # other branch
+
+    changes = client.get("/api/v1/inventory/catalog/changes", params={"branch_id": 1, "since": 20}).json()
+    assert [product["id"] for product in changes["products"]] == [2, created["id"]]
+    assert changes["products"][0]["price"] == 2.25
+    assert changes["deactivated"] == [4]
+    assert not changes["has_more"]
+
+    # Paged by version; the last page's version is the snapshot's
+    first = client.get("/api/v1/inventory/catalog/changes",
+                       params={"branch_id": 1, "since": 20, "limit": 2}).json()
+    rest = client.get("/api/v1/inventory/catalog/changes",
+                      params={"branch_id": 1, "since": first["version"], "limit": 2}).json()
+    assert first["has_more"] and not rest["has_more"]
+    assert len(first["products"]) + len(first["deactivated"]) == 2
+    assert [product["id"] for product in rest["products"]] == [created["id"]]
+
+    fresh = client.get("/api/v1/inventory/catalog", params={"branch_id": 1}).json()
+    assert fresh["version"] == rest["version"] == changes["version"]
+    assert 4 not in {product["id"] for product in fresh["products"]}
+    nothing = client.get("/api/v1/inventory/catalog/changes",
+                         params={"branch_id": 1, "since": fresh["version"]}).json()
+    assert nothing["products"] == nothing["deactivated"] == [] and nothing["version"] == fresh["version"]
+
+SEARCH_PRODUCTS = [
+    # (name, sku, barcode, category)
+    ("Leche Entera Toni 1L", "LEC-001", "7861001000011", "lacteos"),
+    ("Leche Deslactosada Toni 1L", "LEC-002", "7861001000028", "lacteos"),
+    ("Yogur de Leche Alpina", "YOG-001", "7861001000035", "lacteos"),
+    ("Manjar de leche", "MAN-001", None, "dulces"),
+    ("Agua sin gas 500ml", "AGU-001", "7861001000042", "bebidas"),
+    ("Chocolate en barra", "LECHOC", None, "dulces"),
+    ("Pilas AA", "PIL-001", "AB12CD", "hogar"),
+    ("Ab12cd adaptador", "ADP-001", None, "hogar"),
+]
+
+def search(client, q, **params):
+    response = client.get("/api/v1/inventory/search", params={"branch_id": 3, "q": q, **params})
+    assert response.status_code == 200
+    return [product["name"] for product in response.json()]
+
+@pytest.mark.parametrize("in_memory", [True, False])
+def test_search_ranks_and_scopes_by_branch(db, monkeypatch, in_memory):
+    db.add_all([
+        Product(name=name, price=1.0, cost=0.5, sku=sku, barcode=barcode, category=category,
+                branch_id=3, is_active=True, version=30 + i)
+        for i, (name, sku, barcode, category) in enumerate(SEARCH_PRODUCTS)
+    ])
+    db.add(Product(name="Leche de otra sucursal", price=1.0, cost=0.5, sku="OTHER", branch_id=4,
+                   is_active=True, version=40))
+    db.get(CatalogVersion, 1).version = 40
+    db.commit()
+    monkeypatch.setattr(product_index, "search_enabled", in_memory)
+    if in_memory:
+        asyncio.run(product_index.check())
+    client = TestClient(app)
+
+    # Exact SKU, then name prefix, then a later word or SKU prefix, then anywhere
+    assert search(client, "lechoc") == ["Chocolate en barra"]
+    assert search(client, "LECHE") == [
+        "Leche Deslactosada Toni 1L", "Leche Entera Toni 1L", "Manjar de leche", "Yogur de Leche Alpina",
+    ]
+    assert search(client, "le")[:2] == ["Leche Deslactosada Toni 1L", "Leche Entera Toni 1L"]
+    assert search(client, "lactos") == ["Leche Deslactosada Toni 1L"]
+    assert search(client, "dulces") == ["Chocolate en barra", "Manjar de leche"]
+    assert search(client, "7861001000042") == ["Agua sin gas 500ml"]
+    # Alphanumeric barcodes match case-insensitively, exact first
+    assert search(client, "ab12cd") == ["Pilas AA", "Ab12cd adaptador"]
+    assert search(client, "leche", limit=1) == ["Leche Deslactosada Toni 1L"]
+    assert search(client, "100%") == []
+    assert search(client, "otra") == []
+
+    if in_memory:
+        # Typos (pg_trgm's word similarity on Postgres)
+        assert search(client, "chocolte") == ["Chocolate en barra"]
+        # Deactivated products drop out of search
+        client.delete(f"/api/v1/inventory/{db.query(Product.id).filter(Product.sku == 'AGU-001').scalar()}")
+        assert search(client, "agua") == []
+
+IMPORT_CSV = (
+    "﻿sku,name,price,cost,barcode,category,stock_quantity,description\n"
+    "IMP-1,Arroz 1kg,1.10,0.8,7860000900011,abarrotes,40,\n"
+    'IMP-2,Aceite 1L,3.5,2.9,,abarrotes,12,"Botella ""familiar"",\nvidrio"\n'
+    "\n"
+    "SKU2,Product 2 renamed,2.0,1,,,999,\n"  # existing, same branch: updated, stock kept
+    "SKU3,Other branch,2.0,1,,,,\n"  # existing in branch 2
+    "IMP-3,Sal,abc,0.1,,,,\n"
+    "IMP-1,Arroz again,1.2,0.8,,,,\n"
+    "IMP-4,Azucar,1.0,0.7,786000000006,,,\n"  # Product 6's barcode
+    "IMP-5,Cafe,4.0,3.0,7860000900011,,,\n"  # barcode used above
+    "IMP-6,Te,1.0\n"
+)
+
+def run_import(client, body, **params):
+    return client.post("/api/v1/inventory/import", params={"branch_id": 1, **params}, content=body)
+
+def test_import_csv_upserts_and_reports_rows(db):
+    asyncio.run(product_index.check())
+    client = TestClient(app)
+    del db.statements[:]
+
+    response = run_import(client, IMPORT_CSV.encode(), format="csv")
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["rows"], report["created"], report["updated"], report["failed"]) == (9, 2, 1, 6)
+    assert {error["line"]: error["errors"][0] for error in report["errors"]} == {
+        7: "SKU belongs to branch 2",
+        8: "price: Input should be a valid number, unable to parse string as a number",
+        9: "Duplicate SKU (line 2)",
+        10: "Barcode already exists",
+        11: "Duplicate barcode (line 2)",
+        12: "Expected 8 fields, got 3",
+    }
+    # One chunk: a bulk SELECT, the version block and a multi-row upsert
+    assert sum(sql.lstrip().upper().startswith("INSERT") for sql in db.statements) == 1
+
+    db.expire_all()
+    oil = db.query(Product).filter(Product.sku == "IMP-2").one()
+    assert oil.description == 'Botella "familiar",\nvidrio' and oil.barcode is None and oil.stock_quantity == 12
+    renamed = db.get(Product, 2)
+    assert renamed.name == "Product 2 renamed" and renamed.stock_quantity == 100
+    assert db.get(Product, 3).name == "Product 3"
+    versions = [db.query(Product.version).filter(Product.sku == sku).scalar() for sku in ("IMP-1", "IMP-2", "SKU2")]
+    assert versions == [21, 22, 23] and db.get(CatalogVersion, 1).version == 23
+
+    # Scans and catalog deltas see the import
+    assert lookup(client, branch_id=1, barcode="7860000900011").json()["name"] == "Arroz 1kg"
+    changes = client.get("/api/v1/inventory/catalog/changes", params={"branch_id": 1, "since": 20}).json()
+    assert [product["sku"] for product in changes["products"]] == ["IMP-1", "IMP-2", "SKU2"]
+
+def test_import_ndjson(db):
+    client = TestClient(app)
+    lines = [json.dumps({"sku": f"NEW-{i}", "name": f"New {i}", "price": 1, "cost": 0.5}) for i in range(25)]
+    lines[10] = "{not json"
+    lines[11] = "[1, 2]"
+    body = ("\n".join(lines) + "\n").encode()
+
+    report = client.post(
+        "/api/v1/inventory/import", params={"branch_id": 2}, content=body,
+        headers={"content-type": "application/x-ndjson"},
+    ).json()
+    assert (report["rows"], report["created"], report["failed"]) == (25, 23, 2)
+    assert [error["line"] for error in report["errors"]] == [11, 12]
+    assert db.query(Product).filter(Product.sku.like("NEW-%"), Product.branch_id == 2).count() == 23
+
+    # Again without updates: every row is already there
+    again = client.post(
+        "/api/v1/inventory/import", params={"branch_id": 2, "format": "ndjson", "update_existing": False},
+        content=body,
+    ).json()
+    assert again["created"] == again["updated"] == 0 and again["failed"] == 25
+    assert again["errors"][0]["errors"] == ["SKU already exists"]
+    assert [error["line"] for error in again["errors"]][10:13] == [11, 12, 13]
+
+def test_import_chunks_and_bad_files(db):
+    from app.core.product_import import ProductImport, read_csv
+
+    async def chunks(data, size=7):
+        for start in range(0, len(data), size):
+            yield data[start:start + size]
+
+    async def run(data, **kwargs):
+        async with product_index.session_factory() as session:
+            return await ProductImport(session, branch_id=1, **kwargs).run(read_csv(chunks(data)))
+
+    rows = "sku,name,price,cost\n" + "".join(f"CH-{i},Ñandú {i},1,1\n" for i in range(10))
+    report = asyncio.run(run(rows.encode(), chunk_size=3))
+    assert (report.created, report.failed, report.aborted) == (10, 0, None)
+    assert db.query(Product).filter(Product.sku == "CH-9").one().name == "Ñandú 9"
+
+    assert asyncio.run(run(b"sku,name,colour\n")).aborted == "Unknown columns: colour"
+    client = TestClient(app)
+    assert run_import(client, b"sku,nombre\nA,B\n").status_code == 400
+    report = asyncio.run(run(b'sku,name,price,cost\nQ-1,Ok,1,1\nQ-2,"open,1,1\n'))
+    assert report.created == 1 and report.aborted == "Line 3: unterminated quoted field"
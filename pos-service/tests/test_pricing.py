@@ -0,0 +1,78 @@
+from datetime import date
+from decimal import Decimal
+import pytest
+from app.core import pricing
+from app.core.pricing import PricingEngine, RateTable, TAX_RATES, allocate_discount, to_cents
+
+TABLE = RateTable([
+    {"category": "*", "rate": "iva_12", "from": "2000-01-01"},
+    {"category": "*", "rate": "iva_15", "from": "2024-04-01"},
+    {"category": "medicine", "rate": "iva_0", "from": "2000-01-01"},
+    {"category": "books", "rate": "exempt", "from": "2025-01-01"},
+])
+
+def test_rate_by_category_and_effective_date():
+    assert TABLE.rate_for(None, date(2024, 3, 31)) is TAX_RATES["iva_12"]
+    assert TABLE.rate_for("toys", date(2024, 4, 1)) is TAX_RATES["iva_15"]
+    assert TABLE.rate_for("medicine", date(2024, 4, 1)) is TAX_RATES["iva_0"]
+    # Category rules not yet in force fall back to the default
+    assert TABLE.rate_for("books", date(2024, 6, 1)) is TAX_RATES["iva_15"]
+    assert TABLE.rate_for("books", date(2025, 6, 1)).code == "7"
+    with pytest.raises(LookupError):
+        TABLE.rate_for(None, date(1999, 1, 1))
+
+def test_basket_totals_are_exact_cents():
+    engine = PricingEngine(TABLE, prices_include_tax=False)
+    totals = engine.price_basket(
+        [("0.10", 3, None), (Decimal("19.99"), 1, "medicine"), (1.15, 7, None)],
+        discount="1.00", on=date(2024, 5, 1)
+    )
+    assert [line.gross_cents for line in totals.lines] == [30, 1999, 805]
+    assert totals.discount_cents == 100
+    assert [line.discount_cents for line in totals.lines] == [1, 71, 28]
+    assert [line.tax_cents for line in totals.lines] == [4, 0, 117]
+    assert totals.total_cents == totals.subtotal_cents + totals.tax_cents == 2834 - 100 + 121
+
+    inclusive = PricingEngine(TABLE, prices_include_tax=True).price_basket(
+        [("1.15", 1, None)], on=date(2024, 5, 1)
+    )
+    line = inclusive.lines[0]
+    assert (line.base_cents, line.tax_cents, inclusive.total_cents) == (100, 15, 115)
+
+def test_discount_allocation_never_loses_a_cent():
+    assert allocate_discount(100, [100, 100, 100]) == [34, 33, 33]
+    assert allocate_discount(500, [100, 200]) == [100, 200]  # capped at the basket
+    assert sum(allocate_discount(997, [333, 333, 334, 1])) == 997
+
+def run_batch(engine, monkeypatch, numpy):
+    if not numpy:
+        monkeypatch.setattr(pricing, "np", None)
+    return engine.price_baskets([
+        ([("0.10", 3, None), ("19.99", 1, "medicine"), ("1.15", 7, None)], "1.00"),
+        ([("2.50", 2, "books")], 0),
+        ([("9.99", 1, None), ("9.99", 1, None)], "0.03"),
+    ], on=date(2025, 2, 1))
+
+@pytest.mark.parametrize("inclusive", [True, False])
+def test_batch_path_matches_per_basket_pricing(monkeypatch, inclusive):
+    engine = PricingEngine(TABLE, prices_include_tax=inclusive)
+    batch = run_batch(engine, monkeypatch, numpy=False)
+    single = [
+        engine.price_basket([("0.10", 3, None), ("19.99", 1, "medicine"), ("1.15", 7, None)],
+                            discount="1.00", on=date(2025, 2, 1)),
+        engine.price_basket([("2.50", 2, "books")], on=date(2025, 2, 1)),
+        engine.price_basket([("9.99", 1, None), ("9.99", 1, None)], discount="0.03", on=date(2025, 2, 1)),
+    ]
+    assert batch == single
+    assert [line.discount_cents for line in batch[2].lines] == [2, 1]
+
+    if pricing.np is not None:
+        assert run_batch(engine, monkeypatch, numpy=True) == single
+
+def test_catalog_repricing_in_one_pass():
+    engine = PricingEngine(TABLE, prices_include_tax=True)
+    prices = [f"{i}.99" for i in range(1000)]
+    result = engine.price_batch(prices, [1] * 1000, ["medicine" if i % 4 == 0 else None for i in range(1000)],
+                                on=date(2025, 2, 1))
+    assert list(result["total"]) == [to_cents(price) for price in prices]
+    assert int(result["tax"][0]) == 0 and int(result["tax"][1]) == 26
@@ -0,0 +1,56 @@
+import asyncio
+import base64
+import httpx
+from app.core.http_client import CircuitBreaker, ServiceClient, service_clients
+from app.core.revocation import BloomFilter, RevocationFilter
+
+def make_snapshot(*keys):
+    bloom = BloomFilter(size=4096, hashes=5, bits=bytearray(512))
+    for key in keys:
+        bloom.add(key)
+    return {"size": bloom.size, "hashes": bloom.hashes, "bits": base64.b64encode(bytes(bloom.bits)).decode()}
+
+def user_service(monkeypatch, handler):
+    client = ServiceClient(
+        name="user", base_url="http://user-service", max_connections=10,
+        max_keepalive_connections=5, keepalive_expiry=30, timeout=1, connect_timeout=1,
+        retries=0, backoff_base=0, backoff_max=0, http2=False,
+        breaker=CircuitBreaker(5, reset_timeout=60), transport=httpx.MockTransport(handler),
+    )
+    monkeypatch.setitem(service_clients._clients, "user", client)
+
+def test_filter_syncs_and_confirms_hits(monkeypatch):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        if request.url.path.endswith("/check"):
+            return httpx.Response(200, json={"revoked": request.url.params["jti"] == "gone"})
+        if "since" not in request.url.params:
+            return httpx.Response(200, json={"cursor": 1, "filter": make_snapshot("jti:gone")})
+        return httpx.Response(200, json={"cursor": 2, "keys": ["user:9"]})
+
+    user_service(monkeypatch, handler)
+
+    async def scenario():
+        revocations = RevocationFilter(
+            "/api/v1/auth/revocations", refresh_interval=1, full_sync_interval=300, service_key="secret"
+        )
+        assert not await revocations.is_revoked({"user_id": 7, "jti": "gone"})  # not synced yet
+
+        await revocations.refresh()
+        assert await revocations.is_revoked({"user_id": 7, "jti": "gone", "iat": 1})
+        assert not await revocations.is_revoked({"user_id": 7, "jti": "fine", "iat": 1})
+        checks = sum(r.url.path.endswith("/check") for r in requests)
+
+        await revocations.refresh()
+        assert revocations.cursor == 2
+        assert not await revocations.is_revoked({"user_id": 9, "jti": "other", "iat": 1})
+        return revocations.stats(), checks, requests
+
+    stats, checks, requests = asyncio.run(scenario())
+    assert checks == 1  # the miss never left the process
+    assert all(request.headers["x-service-key"] == "secret" for request in requests)
+    assert requests[-2].url.params["since"] == "1"
+    assert stats["revoked"] == 1
+    assert stats["filter_hits"] == 2
@@ -0,0 +1,332 @@
+import asyncio
+import json
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from app.main import app
+from app.core.sequences import SaleNumberAllocator, sale_numbers
+from app.models.product import Product
+from app.models.sale import Sale, SaleItem, SaleSequence
+
+@pytest.fixture
+def db(database):
+    database.add_all([
+        Product(id=i, name=f"Product {i}", price=1.5, cost=1, sku=f"SKU{i}",
+                stock_quantity=100, branch_id=1, is_active=True)
+        for i in range(1, 81)
+    ])
+    database.commit()
+    # Blocks in hand belong to the previous test's database
+    sale_numbers.reset()
+    return database
+
+def basket(lines, quantity=1):
+    return {
+        "branch_id": 1, "user_id": 7, "payment_method": "cash",
+        "items": [
+            {"product_id": i % 80 + 1, "quantity": quantity, "unit_price": 1.5,
+             "product_name": f"Product {i % 80 + 1}", "total_price": 1.5 * quantity}
+            for i in range(lines)
+        ],
+    }
+
+def test_basket_is_one_transaction_with_constant_queries(db):
+    client = TestClient(app)
+    # The first sale also reserves a block of sale numbers
+    client.post("/api/v1/sales/", json=basket(1))
+    del db.statements[:], db.commits[:]
+    response = client.post("/api/v1/sales/", json=basket(3))
+    assert response.status_code == 200
+    small = len(db.statements)
+    del db.statements[:], db.commits[:]
+
+    response = client.post("/api/v1/sales/", json=basket(60))
+    assert response.status_code == 200
+    assert len(response.json()["items"]) == 60
+    assert len(db.statements) == small
+    assert len(db.commits) == 1
+
+    # Repeated lines for the same product are decremented together
+    response = client.post("/api/v1/sales/", json=basket(160))
+    assert response.status_code == 200
+    assert db.get(Product, 1).stock_quantity == 100 - 1 - 1 - 1 - 2
+
+def test_insufficient_stock_leaves_nothing_behind(db):
+    response = TestClient(app).post("/api/v1/sales/", json=basket(200, quantity=40))
+    assert response.status_code == 400
+    assert db.query(Sale).count() == 0
+    assert db.query(SaleItem).count() == 0
+    assert db.get(Product, 1).stock_quantity == 100
+
+def test_missing_product(db):
+    payload = basket(2)
+    payload["items"][1]["product_id"] = 999
+    response = TestClient(app).post("/api/v1/sales/", json=payload)
+    assert response.status_code == 404
+    assert "999" in response.json()["detail"]
+    assert db.query(Sale).count() == 0
+
+def test_stock_error_lists_each_short_line(db):
+    payload = basket(2, quantity=60)
+    payload["items"].append(dict(payload["items"][0]))
+    response = TestClient(app).post("/api/v1/sales/", json=payload)
+    assert response.status_code == 400
+    detail = response.json()["detail"]
+    assert "Insufficient stock for Product 1 (line 1: requested 120, available 100)" in detail
+    assert "(line 3: requested 120, available 100)" in detail
+    assert "Product 2" not in detail
+
+def test_empty_basket_and_non_positive_quantities_are_rejected(db):
+    client = TestClient(app)
+    assert client.post("/api/v1/sales/", json=basket(0)).status_code == 422
+    assert client.post("/api/v1/sales/", json=basket(1, quantity=-5)).status_code == 422
+    assert client.post("/api/v1/sales/", json=basket(1, quantity=0)).status_code == 422
+    assert db.query(Sale).count() == 0
+    assert db.get(Product, 1).stock_quantity == 100
+
+def test_concurrent_checkout_cannot_oversell(db):
+    engine = db.get_bind()
+    raced = []
+
+    # Another terminal sells the last units between our read and our update
+    @event.listens_for(db.app_engine, "before_cursor_execute")
+    def steal_stock(conn, cursor, statement, *args):
+        if statement.startswith("UPDATE products") and not raced:
+            raced.append(True)
+            with engine.connect() as other:
+                other.exec_driver_sql("UPDATE products SET stock_quantity = 1 WHERE id = 1")
+                other.commit()
+
+    response = TestClient(app).post("/api/v1/sales/", json=basket(1, quantity=5))
+    event.remove(db.app_engine, "before_cursor_execute", steal_stock)
+    assert response.status_code == 400
+    assert "requested 5, available 1" in response.json()["detail"]
+    db.expire_all()
+    assert db.get(Product, 1).stock_quantity == 1
+    assert db.query(Sale).count() == 0
+    # Losing the race cost no sale number
+    sold = TestClient(app).post("/api/v1/sales/", json=basket(1))
+    assert sold.json()["invoice_number"] == "001-001-000000001"
+
+def test_batch_reports_each_sale_and_keeps_the_valid_ones(db):
+    missing = basket(1)
+    missing["items"][0]["product_id"] = 999
+    sales = [basket(3, quantity=60), missing, basket(1, quantity=60), basket(40)]
+
+    response = TestClient(app).post("/api/v1/sales/batch", json={"sales": sales})
+    assert response.status_code == 200
+    data = response.json()
+    assert (data["created"], data["failed"]) == (2, 2)
+    results = data["results"]
+    assert [r["status_code"] for r in results] == [201, 404, 400, 201]
+    assert "available 40" in results[2]["detail"]
+
+    db.expire_all()
+    assert db.query(Sale).count() == 2
+    assert db.query(SaleItem).count() == 43
+    assert db.get(Product, 1).stock_quantity == 100 - 60 - 1
+    first = db.get(Sale, results[0]["sale_id"])
+    assert first.invoice_number == results[0]["invoice_number"]
+    assert len(first.items) == 3
+
+def test_batch_statements_do_not_grow_with_batch_size(db, monkeypatch):
+    monkeypatch.setattr(sale_numbers, "block_size", 1000)
+    client = TestClient(app)
+    client.post("/api/v1/sales/", json=basket(1))
+    counts = []
+    for size in (2, 50):
+        del db.statements[:], db.commits[:]
+        response = client.post("/api/v1/sales/batch", json={"sales": [basket(5)] * size})
+        assert response.json()["created"] == size
+        counts.append(len(db.statements))
+        assert len(db.commits) == 1
+    assert counts[0] == counts[1]
+
+def test_sale_numbers_are_sequential_per_terminal(db, monkeypatch):
+    monkeypatch.setattr(sale_numbers, "block_size", 3)
+    reservations = sale_numbers.reservations
+    client = TestClient(app)
+    numbers = [client.post("/api/v1/sales/", json=basket(1)).json()["invoice_number"] for _ in range(4)]
+    other = client.post("/api/v1/sales/", json={**basket(1), "terminal_id": 2}).json()["invoice_number"]
+    batch = client.post("/api/v1/sales/batch", json={"sales": [basket(1)] * 5}).json()["results"]
+
+    assert numbers == [f"001-001-00000000{n}" for n in range(1, 5)]
+    assert other == "001-002-000000001"
+    assert [result["invoice_number"] for result in batch] == [f"001-001-00000000{n}" for n in range(5, 10)]
+    # Blocks of 3 on terminal 1 (1-3, 4-6, 7-9) and one on terminal 2
+    assert db.get(SaleSequence, (1, 1)).next_value == 10
+    assert sale_numbers.reservations - reservations == 4
+
+def test_workers_reserve_disjoint_blocks(db):
+    first, second = SaleNumberAllocator(block_size=5), SaleNumberAllocator(block_size=5)
+    bind = db.async_sessions.kw["bind"]
+
+    async def take():
+        numbers = []
+        for allocator in (first, second, first, second):
+            numbers += await allocator.take(bind, 3, 1, count=4)
+        return numbers
+
+    numbers = asyncio.run(take())
+    assert len(set(numbers)) == 16
+    assert numbers[:4] == [f"003-001-00000000{n}" for n in range(1, 5)]
+    assert numbers[4:8] == ["003-001-000000006", "003-001-000000007", "003-001-000000008", "003-001-000000009"]
+
+def test_idempotency_key_replays_the_original_sale(db):
+    client = TestClient(app)
+    headers = {"Idempotency-Key": "3f6c1a2e-terminal-7"}
+    first = client.post("/api/v1/sales/", json=basket(2, quantity=3), headers=headers)
+    retry = client.post("/api/v1/sales/", json=basket(2, quantity=3), headers=headers)
+
+    assert first.status_code == retry.status_code == 200
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert db.query(Sale).count() == 1
+    assert db.get(Product, 1).stock_quantity == 97
+
+def test_concurrent_retry_returns_the_winner(db):
+    engine = db.get_bind()
+    raced = []
+
+    # The other attempt commits the same key after our lookup missed
+    @event.listens_for(db.app_engine, "before_cursor_execute")
+    def commit_twin(conn, cursor, statement, *args):
+        if statement.startswith("SELECT products.id") and not raced:
+            raced.append(True)
+            with engine.connect() as other:
+                other.exec_driver_sql(
+                    "INSERT INTO sales (total_amount, invoice_number, idempotency_key, status, created_at, "
+                    "branch_id, user_id, payment_method, tax_amount, discount_amount) "
+                    "VALUES (3, 'INV-TWIN', 'k1', 'completed', '2026-01-01 10:00:00', 1, 7, 'cash', 0, 0)"
+                )
+                other.commit()
+
+    response = TestClient(app).post(
+        "/api/v1/sales/", json=basket(1, quantity=2), headers={"Idempotency-Key": "k1"}
+    )
+    event.remove(db.app_engine, "before_cursor_execute", commit_twin)
+    assert response.status_code == 200
+    assert response.json()["invoice_number"] == "INV-TWIN"
+    db.expire_all()
+    assert db.get(Product, 1).stock_quantity == 100  # our decrement was rolled back
+
+def test_batch_skips_sales_already_ingested(db):
+    client = TestClient(app)
+    sales = [dict(basket(1), idempotency_key=f"t7-{i}") for i in range(3)]
+    first = client.post("/api/v1/sales/batch", json={"sales": sales[:2]}).json()
+
+    again = client.post("/api/v1/sales/batch", json={"sales": sales + [sales[2]]}).json()
+    assert (again["created"], again["replayed"], again["failed"]) == (1, 3, 0)
+    assert [r["status_code"] for r in again["results"]] == [200, 200, 201, 200]
+    assert again["results"][0]["sale_id"] == first["results"][0]["sale_id"]
+    assert again["results"][3]["sale_id"] == again["results"][2]["sale_id"]
+    assert db.query(Sale).count() == 3
+
+def test_sweeper_clears_expired_keys(db):
+    from datetime import datetime, timedelta
+    from app.core.idempotency import IdempotencySweeper
+
+    client = TestClient(app)
+    for key in ("old", "new"):
+        client.post("/api/v1/sales/", json=basket(1), headers={"Idempotency-Key": key})
+    old = db.query(Sale).filter(Sale.idempotency_key == "old").one()
+    old.created_at = datetime.utcnow() - timedelta(days=2)
+    db.commit()
+
+    sweeper = IdempotencySweeper(session_factory=db.async_sessions, ttl=86400, interval=3600)
+    assert asyncio.run(sweeper.sweep()) == 1
+    db.expire_all()
+    assert [key for (key,) in db.query(Sale.idempotency_key).order_by(Sale.id)] == [None, "new"]
+    assert db.query(Sale).count() == 2
+
+def test_listing_loads_items_in_one_query_and_filters(db):
+    client = TestClient(app)
+    sales = [dict(basket(3), branch_id=1 + i % 2) for i in range(30)]
+    assert client.post("/api/v1/sales/batch", json={"sales": sales}).json()["created"] == 30
+    for sale in db.query(Sale).filter(Sale.id <= 5):
+        sale.status = "cancelled"
+    db.commit()
+
+    del db.statements[:]
+    response = client.get("/api/v1/sales/?limit=100")
+    assert response.status_code == 200
+    assert len(response.json()) == 30
+    assert all(len(sale["items"]) == 3 for sale in response.json())
+    assert len(db.statements) == 2
+
+    branch = client.get("/api/v1/sales/", params={"branch_id": 2, "status": "completed"}).json()
+    assert len(branch) == 13
+    assert {sale["branch_id"] for sale in branch} == {2}
+    assert [sale["id"] for sale in branch] == sorted((sale["id"] for sale in branch), reverse=True)
+    assert client.get("/api/v1/sales/", params={"date_to": "2000-01-01T00:00:00"}).json() == []
+    assert len(client.get("/api/v1/sales/", params={"user_id": 7, "limit": 10}).json()) == 10
+
+def test_export_streams_csv_and_ndjson(db, monkeypatch):
+    from app.api.v1.endpoints import sales as sales_endpoints
+    monkeypatch.setattr(sales_endpoints, "EXPORT_BATCH_SIZE", 4)
+
+    client = TestClient(app)
+    sales = [dict(basket(1 + i % 3), branch_id=1 + i % 2) for i in range(9)]
+    client.post("/api/v1/sales/batch", json={"sales": sales})
+    db.query(Sale).filter(Sale.id == 9).one().status = "cancelled"
+    db.commit()
+
+    response = client.get("/api/v1/sales/export", params={"format": "csv", "branch_id": 1})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    lines = response.text.strip().splitlines()
+    assert lines[0].startswith("sale_id,invoice_number,created_at")
+    assert len(lines) == 1 + 1 + 3 + 2 + 1 + 3  # header, then sales 1, 3, 5, 7, 9
+
+    response = client.get("/api/v1/sales/export", params={"status": "completed"})
+    exported = [json.loads(line) for line in response.text.splitlines()]
+    assert [sale["id"] for sale in exported] == list(range(1, 9))
+    assert [len(sale["items"]) for sale in exported] == [1, 2, 3, 1, 2, 3, 1, 2]
+    assert exported[1]["items"][1]["product_id"] == 2
+
+    assert client.get("/api/v1/sales/export", params={"format": "xml"}).status_code == 422
+
+def test_rollups_follow_sales_and_match_a_rebuild(db):
+    from app.core.rollups import rebuild
+    from app.models.report import BranchHourlySales, CashierShiftSales, ProductDailySales
+
+    client = TestClient(app)
+    client.post("/api/v1/sales/", json=basket(3, quantity=2))
+    sales = [dict(basket(1 + i % 2), branch_id=1 + i % 2) for i in range(4)]
+    client.post("/api/v1/sales/batch", json={"sales": sales})
+
+    def snapshot():
+        db.expire_all()
+        return {
+            model.__tablename__: sorted(
+                tuple(getattr(row, c.name) for c in model.__table__.columns) for row in db.query(model)
+            )
+            for model in (BranchHourlySales, ProductDailySales, CashierShiftSales)
+        }
+
+    incremental = snapshot()
+    hourly = incremental["rollup_branch_hourly"]
+    assert sum(row[2] for row in hourly) == 5  # sales_count
+    assert sum(row[3] for row in hourly) == 6 + 6  # items_count
+    assert sum(row[3] for row in incremental["rollup_product_daily"] if row[0] == 1) == 2 + 4  # quantity
+
+    assert rebuild(db) == 5
+    db.commit()
+    assert snapshot() == incremental
+
+    summary = client.get("/api/v1/reports/sales/summary", params={"branch_id": 1}).json()["summary"]
+    assert summary["sales_count"] == 3
+    assert summary["total_amount"] == pytest.approx(9.0 + 1.5 + 1.5)
+    top = client.get("/api/v1/reports/products/top", params={"limit": 1}).json()["products"]
+    assert top == [{"product_id": 1, "quantity": 6, "revenue": 9.0}]
+    shifts = client.get("/api/v1/reports/cashiers/shifts", params={"user_id": 7}).json()
+    assert sum(shift["sales_count"] for shift in shifts) == 5
+    assert {row["branch_id"] for row in client.get("/api/v1/reports/sales/hourly").json()} == {1, 2}
+
+    # Product revenue is net of each line's share of the discount, rebuilt too
+    client.post("/api/v1/sales/", json={**basket(1, quantity=2), "discount_amount": 1.0})
+    discounted = snapshot()
+    assert sum(row[4] for row in discounted["rollup_product_daily"] if row[0] == 1) == pytest.approx(9.0 + 2.0)
+    assert rebuild(db) == 6
+    db.commit()
+    assert snapshot() == discounted
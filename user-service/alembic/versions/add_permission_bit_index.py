@@ -0,0 +1,38 @@
+"""Add stable bit index to permissions for compact token claims
+
+Revision ID: permission_bit_index
+Revises: permissions_version
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'permission_bit_index'
+down_revision: Union[str, Sequence[str], None] = 'permissions_version'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema: assign every existing permission a bit in creation order."""
+    op.add_column('permissions', sa.Column('bit_index', sa.Integer(), nullable=True))
+
+    op.execute("""
+        UPDATE permissions
+        SET bit_index = numbered.rn - 1
+        FROM (SELECT id, row_number() OVER (ORDER BY id) AS rn FROM permissions) AS numbered
+        WHERE permissions.id = numbered.id
+    """)
+
+    op.create_unique_constraint('uq_permissions_bit_index', 'permissions', ['bit_index'])
+
+
+def downgrade() -> None:
+    """Downgrade schema: drop permission bit indexes."""
+    op.drop_constraint('uq_permissions_bit_index', 'permissions', type_='unique')
+    op.drop_column('permissions', 'bit_index')
@@ -0,0 +1,30 @@
+"""Add permission version counters to users and roles
+
+Revision ID: permissions_version
+Revises: remove_sessions
+Create Date: 2026-10-16 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'permissions_version'
+down_revision: Union[str, Sequence[str], None] = 'remove_sessions'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema: add counters used to invalidate cached permissions."""
+    op.add_column('users', sa.Column('permissions_version', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('roles', sa.Column('permissions_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema: drop permission version counters."""
+    op.drop_column('roles', 'permissions_version')
+    op.drop_column('users', 'permissions_version')
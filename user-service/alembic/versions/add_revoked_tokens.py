@@ -0,0 +1,45 @@
+"""Add revoked_tokens table for access/refresh token revocation
+
+Revision ID: revoked_tokens
+Revises: permission_bit_index
+Create Date: 2026-10-16 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'revoked_tokens'
+down_revision: Union[str, Sequence[str], None] = 'permission_bit_index'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema: create the exact revocation set behind the bloom filter."""
+    op.create_table('revoked_tokens',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('key', sa.String(length=100), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('reason', sa.String(length=30), nullable=False),
+        sa.Column('revoked_at', sa.DateTime(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_revoked_tokens_id', 'revoked_tokens', ['id'], unique=False)
+    op.create_index('ix_revoked_tokens_key', 'revoked_tokens', ['key'], unique=False)
+    op.create_index('ix_revoked_tokens_user_id', 'revoked_tokens', ['user_id'], unique=False)
+    op.create_index('ix_revoked_tokens_expires_at', 'revoked_tokens', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema: drop revoked_tokens."""
+    op.drop_index('ix_revoked_tokens_expires_at', table_name='revoked_tokens')
+    op.drop_index('ix_revoked_tokens_user_id', table_name='revoked_tokens')
+    op.drop_index('ix_revoked_tokens_key', table_name='revoked_tokens')
+    op.drop_index('ix_revoked_tokens_id', table_name='revoked_tokens')
+    op.drop_table('revoked_tokens')
@@ -1,19 +1,27 @@
 from datetime import datetime, timedelta
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from typing import List, Optional, Dict, Any
+from jose import JWTError
 from app.core.security import (
-    verify_password, get_password_hash, create_access_token,
-    get_current_user_token, refresh_access_token, check_user_permission
+    verify_password_async, get_password_hash_async, create_access_token,
+    get_current_user_token, refresh_access_token, check_user_permission, decode_jwt,
+    require_service_or_user
 )
 from app.core.config import settings
+from app.core.keys import get_signing_keys, is_asymmetric
+from app.core.permission_registry import permission_registry
+from app.core.revocation import (
+    claim_datetime, is_revoked_exact, revocation_list, revoke_token, revoke_user_tokens
+)
 from app.db.session import get_db
 from app.models.user import User, UserRole
 from app.schemas.user import (
     UserCreate, UserResponse, UserUpdate, LoginRequest, Token,
     RefreshTokenRequest, TokenData, PermissionCheck, PermissionResponse,
-    RolePermissions, UserProfile
+    RolePermissions, UserProfile, LogoutRequest, PasswordChangeRequest,
+    PermissionBatchCheck, PermissionBatchResponse
 )
 
 router = APIRouter()
@@ -28,25 +36,37 @@ async def login(
 ):
     """Autenticación completa con JWT y roles"""
     
-    # Buscar usuario
-    user = db.query(User).filter(
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Incorrect username or password",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    
+    # Buscar hash del usuario
+    row = db.query(User.id, User.hashed_password).filter(
         User.username == login_data.username,
         User.is_active == True
     ).first()
+    # Devolver la conexión al pool mientras bcrypt corre en el executor
+    db.rollback()
 
-    if not user or not verify_password(login_data.password, user.hashed_password):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Incorrect username or password",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+    if not row or not await verify_password_async(login_data.password, row.hashed_password):
+        raise credentials_exception
+    
+    # Cargar usuario con rol y permisos en carga ansiosa
+    user = db.query(User).options(*User.permission_load_options()).filter(
+        User.id == row.id,
+        User.is_active == True
+    ).first()
+    if not user:
+        raise credentials_exception
+    
+    # Crear tokens JWT (antes del commit, que expiraría las relaciones ya cargadas)
+    token_data = create_access_token(user)
     
     # Actualizar último login
     user.last_login = datetime.utcnow()
     db.commit()
-    Token
-    # Crear tokens JWT
-    token_data = create_access_token(user)
     
     return Token(
         access_token=token_data["access_token"],
@@ -78,6 +98,61 @@ async def refresh_token(
         expires_in=token_data["expires_in"]
     )
 
+@router.post("/logout")
+async def logout(
+    logout_data: LogoutRequest,
+    current_user: TokenData = Depends(get_current_user_token),
+    db: Session = Depends(get_db)
+):
+    """Revocar el access token actual (y el refresh token o todas las sesiones)"""
+    
+    if logout_data.logout_all_devices:
+        revoke_user_tokens(db, current_user.user_id, reason="logout")
+    else:
+        revoke_token(
+            db, current_user.jti, current_user.user_id,
+            claim_datetime(current_user.exp), reason="logout"
+        )
+        if logout_data.refresh_token:
+            try:
+                payload = decode_jwt(logout_data.refresh_token)
+            except JWTError:
+                payload = {}
+            if payload.get("type") == "refresh" and payload.get("sub") == str(current_user.user_id):
+                revoke_token(
+                    db, payload["jti"], current_user.user_id,
+                    claim_datetime(payload["exp"]), reason="logout"
+                )
+    db.commit()
+    
+    return {"message": "Logged out"}
+
+@router.post("/change-password")
+async def change_password(
+    password_data: PasswordChangeRequest,
+    current_user: TokenData = Depends(get_current_user_token),
+    db: Session = Depends(get_db)
+):
+    """Cambiar password; revoca todos los tokens emitidos hasta ahora"""
+    
+    row = db.query(User.hashed_password).filter(User.id == current_user.user_id).first()
+    # Devolver la conexión al pool mientras bcrypt corre en el executor
+    db.rollback()
+    if not row or not await verify_password_async(password_data.current_password, row.hashed_password):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Current password is incorrect"
+        )
+    
+    hashed_password = await get_password_hash_async(password_data.new_password)
+    db.query(User).filter(User.id == current_user.user_id).update(
+        {User.hashed_password: hashed_password}, synchronize_session=False
+    )
+    revoke_user_tokens(db, current_user.user_id, reason="password_change")
+    db.commit()
+    
+    return {"message": "Password changed, please log in again"}
+
 @router.get("/me", response_model=UserProfile)
 async def get_current_user(
     current_user: TokenData = Depends(get_current_user_token),
@@ -104,32 +179,60 @@ async def get_current_user(
         branch_id=user.branch_id
     )
 
+def _evaluate_permission(
+    current_user: TokenData,
+    permission_check: PermissionCheck,
+    known_permissions: Dict[str, int]
+) -> PermissionResponse:
+    if permission_check.permission not in known_permissions:
+        return PermissionResponse(
+            has_permission=False,
+            reason=f"Invalid permission: {permission_check.permission}"
+        )
+    result = check_user_permission(
+        current_user,
+        permission_check.permission,
+        resource_id=permission_check.resource_id,
+        branch_id=permission_check.branch_id
+    )
+    return PermissionResponse(
+        has_permission=result["has_permission"],
+        reason=result.get("reason")
+    )
+
 @router.post("/check-permission", response_model=PermissionResponse)
 async def check_permission(
     permission_check: PermissionCheck,
-    current_user: TokenData = Depends(get_current_user_token)
+    current_user: TokenData = Depends(get_current_user_token),
+    db: Session = Depends(get_db)
 ):
     """Verificar si el usuario actual tiene un permiso específico"""
     
-    try:
-        permission = Permission(permission_check.permission)
-    except ValueError:
+    registry = permission_registry.get(db, min_version=current_user.permission_version)
+    if permission_check.permission not in registry.bits:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Invalid permission: {permission_check.permission}"
         )
     
-    result = check_user_permission(
-        current_user, 
-        permission,
-        resource_id=permission_check.resource_id,
-        branch_id=permission_check.branch_id
-    )
+    return _evaluate_permission(current_user, permission_check, registry.bits)
+
+@router.post("/check-permissions", response_model=PermissionBatchResponse)
+async def check_permissions(
+    batch: PermissionBatchCheck,
+    current_user: TokenData = Depends(get_current_user_token),
+    db: Session = Depends(get_db)
+):
+    """Verificar varios permisos en una sola llamada (menús y botones de una pantalla)
+
+    Los permisos desconocidos se responden como denegados sin invalidar el lote.
+    """
     
-    return PermissionResponse(
-        has_permission=result["has_permission"],
-        reason=result.get("reason")
-    )
+    registry = permission_registry.get(db, min_version=current_user.permission_version)
+    return PermissionBatchResponse(results=[
+        _evaluate_permission(current_user, permission_check, registry.bits)
+        for permission_check in batch.checks
+    ])
 
 @router.get("/permissions", response_model=List[str])
 async def get_user_permissions(
@@ -161,6 +264,43 @@ async def get_available_roles():
     
     return roles_info
 
+@router.get("/jwks.json")
+async def get_jwks(response: Response):
+    """Claves públicas para verificar tokens localmente en otros servicios"""
+    if not is_asymmetric(settings.ALGORITHM):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Token signing is not asymmetric"
+        )
+    response.headers["Cache-Control"] = "public, max-age=300"
+    return get_signing_keys().jwks()
+
+@router.get("/permission-registry")
+async def get_permission_registry(
+    response: Response,
+    min_version: int = 0,
+    db: Session = Depends(get_db)
+):
+    """Mapa permiso -> bit para decodificar el claim `perm_bits` de los tokens"""
+    registry = permission_registry.get(db, min_version=min_version)
+    response.headers["Cache-Control"] = "public, max-age=60"
+    return registry.to_dict()
+
+@router.get("/revocations", dependencies=[Depends(require_service_or_user)])
+async def get_revocations(since: Optional[int] = None, db: Session = Depends(get_db)):
+    """Filtro de Bloom de tokens revocados (sin `since`) o claves nuevas desde `since`"""
+    return revocation_list.delta(db, since)
+
+@router.get("/revocations/check", dependencies=[Depends(require_service_or_user)])
+async def check_revocation(
+    jti: str,
+    user_id: int,
+    iat: float,
+    db: Session = Depends(get_db)
+):
+    """Consulta exacta para confirmar un acierto del filtro de Bloom"""
+    return {"revoked": is_revoked_exact(db, jti, user_id, claim_datetime(iat))}
+
 # === USER MANAGEMENT ENDPOINTS ===
 
 @router.post("/register", response_model=UserResponse)
@@ -172,7 +312,7 @@ async def register_user(
     """Registrar nuevo usuario (requiere permisos de admin)"""
     
     # Verificar permisos
-    permission_check = check_user_permission(current_user, Permission.CREATE_USER)
+    permission_check = check_user_permission(current_user, "create_user")
     if not permission_check["has_permission"]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -190,8 +330,9 @@ async def register_user(
             detail="Username or email already registered"
         )
     
-    # Crear usuario
-    hashed_password = get_password_hash(user_data.password)
+    # Crear usuario (sin retener la conexión mientras corre bcrypt)
+    db.rollback()
+    hashed_password = await get_password_hash_async(user_data.password)
     
     db_user = User(
         username=user_data.username,
@@ -219,16 +360,44 @@ async def list_users(
     """Listar usuarios (requiere permisos de lectura)"""
     
     # Verificar permisos
-    permission_check = check_user_permission(current_user, Permission.READ_USER)
+    permission_check = check_user_permission(current_user, "read_user")
     if not permission_check["has_permission"]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail=permission_check.get("reason", "Permission required: READ_USER")
         )
     
-    users = db.query(User).offset(skip).limit(limit).all()
+    users = db.query(User).options(*User.permission_load_options()).order_by(User.id).offset(skip).limit(limit).all()
     return [UserResponse.from_orm(user) for user in users]
 
+@router.post("/users/{user_id}/deactivate")
+async def deactivate_user(
+    user_id: int,
+    current_user: TokenData = Depends(get_current_user_token),
+    db: Session = Depends(get_db)
+):
+    """Desactivar usuario y revocar sus tokens (requiere permisos de actualización)"""
+    
+    permission_check = check_user_permission(current_user, "update_user")
+    if not permission_check["has_permission"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=permission_check.get("reason", "Permission required: UPDATE_USER")
+        )
+    
+    updated = db.query(User).filter(User.id == user_id).update(
+        {User.is_active: False}, synchronize_session=False
+    )
+    if not updated:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    revoke_user_tokens(db, user_id, reason="deactivated")
+    db.commit()
+    
+    return {"message": f"User {user_id} deactivated"}
+
 
 
 # === HEALTH AND STATUS ENDPOINTS ===
@@ -10,7 +10,11 @@ from datetime import datetime, timedelta
 
 from ....core.security import get_current_user_token
 from ....db.session import get_db
-from ....models.rbac import Role, Permission, UserPermission, get_user_effective_permissions
+from ....models.rbac import (
+    Role, Permission, UserPermission, get_user_effective_permissions, bump_user_permission_version
+)
+from ....core.permissions import permission_resolver
+from ....core.revocation import revocation_list
 from ....models.user import User
 from ....schemas.user import TokenData, APIResponse
 from pydantic import BaseModel
@@ -244,6 +248,7 @@ async def grant_user_permission(
         )
         db.add(user_permission)
     
+    bump_user_permission_version(user_id, db)
     db.commit()
     
     action = "granted" if permission_grant.granted else "denied"
@@ -382,6 +387,7 @@ async def revoke_user_permission(
         )
     
     db.delete(user_permission)
+    bump_user_permission_version(user_id, db)
     db.commit()
     
     return APIResponse(
@@ -428,5 +434,7 @@ async def get_rbac_system_status(
             "with_roles": users_with_roles,
             "specific_permissions": specific_permissions
         },
+        "permission_cache": permission_resolver.stats(),
+        "token_revocation": revocation_list.stats(),
         "health": "healthy" if users_with_roles == total_users else "needs_attention"
     }
\ No newline at end of file
@@ -0,0 +1,136 @@
+"""
+Gestión de claves de firma JWT
+Firma asimétrica (RS256/ES256) con publicación del JWKS para que los
+demás servicios verifiquen tokens localmente.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from jose import jwk
+
+from .config import settings
+
+def is_asymmetric(algorithm: str) -> bool:
+    """True si el algoritmo usa par de claves (RS*/ES*)"""
+    return algorithm.startswith(("RS", "ES"))
+
+def _generate_private_key(algorithm: str):
+    if algorithm.startswith("ES"):
+        return ec.generate_private_key(ec.SECP256R1())
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+def _public_pem(private_key) -> bytes:
+    return private_key.public_key().public_bytes(
+        serialization.Encoding.PEM,
+        serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+
+def _key_id(public_pem: bytes) -> str:
+    """Identificador estable derivado de la clave pública"""
+    return hashlib.sha256(public_pem).hexdigest()[:16]
+
+class SigningKeySet:
+    """Clave de firma activa más claves públicas retiradas (rotación)"""
+
+    def __init__(
+        self,
+        algorithm: str,
+        private_key_path: str,
+        retired_public_key_paths: Optional[List[str]] = None,
+        key_id: Optional[str] = None
+    ):
+        self.algorithm = algorithm
+
+        private_key = self._load_or_create(private_key_path)
+        self.private_pem = private_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption()
+        ).decode()
+        public_pem = _public_pem(private_key)
+        self.kid = key_id or _key_id(public_pem)
+        # Claves ya construidas: jose re-parsea (y valida) un PEM en cada firma
+        self.signing_key = jwk.construct(self.private_pem, algorithm)
+
+        # kid -> PEM público; la clave activa y las retiradas siguen publicadas
+        # hasta que expiren los tokens firmados con ellas
+        self.public_keys: Dict[str, str] = {self.kid: public_pem.decode()}
+        for path in retired_public_key_paths or []:
+            with open(path, "rb") as f:
+                pem = f.read()
+            self.public_keys.setdefault(_key_id(pem), pem.decode())
+        self._verifiers = {
+            kid: jwk.construct(pem, algorithm) for kid, pem in self.public_keys.items()
+        }
+
+    def _load_or_create(self, path: str):
+        """Cargar la clave privada; en desarrollo se genera si no existe"""
+        if not os.path.exists(path):
+            private_key = _generate_private_key(self.algorithm)
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Se escribe completa en un temporal y se enlaza en su lugar: si
+            # varios workers arrancan a la vez gana uno solo, y nadie llega a
+            # leer un PEM a medio escribir
+            fd, tmp_path = tempfile.mkstemp(dir=directory or ".", prefix=".jwt-key-")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(private_key.private_bytes(
+                        serialization.Encoding.PEM,
+                        serialization.PrivateFormat.PKCS8,
+                        serialization.NoEncryption()
+                    ))
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.link(tmp_path, path)
+            except FileExistsError:
+                pass
+            else:
+                return private_key
+            finally:
+                os.unlink(tmp_path)
+
+        with open(path, "rb") as f:
+            return serialization.load_pem_private_key(f.read(), password=None)
+
+    def verification_key(self, kid: Optional[str]) -> Optional[str]:
+        if kid is None:
+            return self.public_keys.get(self.kid)
+        return self.public_keys.get(kid)
+
+    def verifier(self, kid: Optional[str]):
+        """Clave pública construida para verificar (None si el kid no es conocido)"""
+        return self._verifiers.get(self.kid if kid is None else kid)
+
+    def jwks(self) -> Dict[str, Any]:
+        """JSON Web Key Set con todas las claves públicas vigentes"""
+        keys = []
+        for kid, pem in self.public_keys.items():
+            key = jwk.construct(pem, self.algorithm).to_dict()
+            key.update({"kid": kid, "use": "sig", "alg": self.algorithm})
+            keys.append(key)
+        return {"keys": keys}
+
+_key_set: Optional[SigningKeySet] = None
+_key_set_lock = threading.Lock()
+
+def get_signing_keys() -> SigningKeySet:
+    """Conjunto de claves del proceso (se carga una sola vez)"""
+    global _key_set
+    if _key_set is None:
+        with _key_set_lock:
+            if _key_set is None:
+                _key_set = SigningKeySet(
+                    algorithm=settings.ALGORITHM,
+                    private_key_path=settings.JWT_PRIVATE_KEY_PATH,
+                    retired_public_key_paths=settings.JWT_RETIRED_PUBLIC_KEY_PATHS,
+                    key_id=settings.JWT_KEY_ID
+                )
+    return _key_set
@@ -0,0 +1,114 @@
+"""
+Registro versionado de permisos
+Cada permiso tiene un índice de bit estable que nunca se reutiliza; los
+tokens llevan los permisos como bitset en base64 (`perm_bits`) junto con la
+versión del registro (`perm_ver`), y se comprueban con una máscara entera.
+"""
+
+import base64
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+def encode_mask(mask: int) -> str:
+    """Máscara entera -> base64url sin relleno (little-endian)"""
+    raw = mask.to_bytes(max(1, (mask.bit_length() + 7) // 8), "little")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+def decode_mask(encoded: Optional[str]) -> int:
+    """base64url (con o sin relleno) -> máscara entera"""
+    if not encoded:
+        return 0
+    raw = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4))
+    return int.from_bytes(raw, "little")
+
+class PermissionRegistry:
+    """Instantánea inmutable nombre -> bit
+
+    La versión es el siguiente bit libre: como los índices solo crecen, un
+    registro con versión >= `perm_ver` del token sabe decodificarlo entero.
+    """
+
+    def __init__(self, bits: Dict[str, int]):
+        self.bits = dict(bits)
+        self.names: Dict[int, str] = {bit: name for name, bit in self.bits.items()}
+        self.version = max(self.bits.values(), default=-1) + 1
+
+    def bit(self, name: str) -> Optional[int]:
+        return self.bits.get(name)
+
+    def mask_for(self, names: Iterable[str]) -> int:
+        mask = 0
+        for name in names:
+            bit = self.bits.get(name)
+            if bit is None:
+                raise KeyError(name)
+            mask |= 1 << bit
+        return mask
+
+    def names_for(self, mask: int) -> List[str]:
+        names = []
+        bit = 0
+        while mask:
+            if mask & 1 and bit in self.names:
+                names.append(self.names[bit])
+            mask >>= 1
+            bit += 1
+        return sorted(names)
+
+    def has(self, mask: int, name: str) -> bool:
+        bit = self.bits.get(name)
+        return bit is not None and bool(mask >> bit & 1)
+
+    def to_dict(self) -> Dict[str, object]:
+        return {"version": self.version, "permissions": self.bits}
+
+class PermissionRegistryCache:
+    """Registro del proceso; se recarga de la BD cuando queda desactualizado"""
+
+    def __init__(self):
+        self._registry: Optional[PermissionRegistry] = None
+        self._lock = threading.Lock()
+
+    @property
+    def current(self) -> Optional[PermissionRegistry]:
+        return self._registry
+
+    def load(self, db: Session) -> PermissionRegistry:
+        from ..models.rbac import Permission
+
+        rows = db.execute(
+            select(Permission.name, Permission.bit_index).where(Permission.bit_index.isnot(None))
+        ).all()
+        registry = PermissionRegistry({name: bit for name, bit in rows})
+        with self._lock:
+            self._registry = registry
+        return registry
+
+    def get(
+        self,
+        db: Optional[Session] = None,
+        min_version: int = 0,
+        names: Iterable[str] = ()
+    ) -> PermissionRegistry:
+        """Registro que cubre `min_version` y todos los `names` (recarga si no)"""
+        registry = self._registry
+        if (
+            registry is not None
+            and registry.version >= min_version
+            and all(name in registry.bits for name in names)
+        ):
+            return registry
+        if db is None:
+            if registry is None:
+                raise LookupError("Permission registry not loaded")
+            return registry
+        return self.load(db)
+
+    def invalidate(self):
+        with self._lock:
+            self._registry = None
+
+permission_registry = PermissionRegistryCache()
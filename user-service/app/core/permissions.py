@@ -0,0 +1,148 @@
+"""
+Resolución de permisos efectivos con caché versionada
+Los permisos se calculan con una sola consulta (rol + permisos específicos)
+y se cachean por usuario. La clave incluye el contador de versión del
+usuario y de su rol, de modo que cualquier cambio los invalida.
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy import Boolean, DateTime, cast, literal, null, select, union_all
+from sqlalchemy.orm import Session
+
+from .config import settings
+
+class _Entry(NamedTuple):
+    version: Tuple[int, Optional[int], int]
+    permissions: Tuple[str, ...]
+    valid_until: Optional[datetime]  # primer expires_at que cambiaría el resultado
+
+ROLE_SOURCE = 0
+USER_SOURCE = 1
+
+def combine_permissions(
+    role_permissions: Iterable[str],
+    overrides: Iterable[Tuple[str, bool, Optional[datetime]]],
+    now: datetime
+) -> Tuple[List[str], Optional[datetime]]:
+    """Aplicar permisos específicos (grant/deny) vigentes sobre los del rol
+
+    Devuelve los permisos efectivos y el primer `expires_at` que los cambiaría.
+    """
+    effective: Set[str] = set(role_permissions)
+    valid_until: Optional[datetime] = None
+    for name, granted, expires_at in overrides:
+        if expires_at is not None:
+            expires_at = expires_at.replace(tzinfo=None)
+            if now > expires_at:
+                continue
+            if valid_until is None or expires_at < valid_until:
+                valid_until = expires_at
+        if granted:
+            effective.add(name)
+        else:
+            effective.discard(name)
+    return sorted(effective), valid_until
+
+class PermissionResolver:
+    """Caché LRU de permisos efectivos por usuario"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _current_version(self, user_id: int, db: Session):
+        from ..models.user import User
+        from ..models.rbac import Role
+
+        row = db.query(
+            User.permissions_version, User.role_id, Role.permissions_version
+        ).outerjoin(Role, Role.id == User.role_id).filter(User.id == user_id).first()
+        if row is None:
+            return None
+        return (row[0] or 0, row[1], row[2] or 0)
+
+    def _load(self, user_id: int, db: Session, now: datetime) -> Tuple[List[str], Optional[datetime]]:
+        """Permisos del rol y específicos del usuario en una sola consulta"""
+        from ..models.user import User
+        from ..models.rbac import Permission, UserPermission, role_permissions_table
+
+        role_rows = select(
+            literal(ROLE_SOURCE).label("source"),
+            Permission.name,
+            literal(True, Boolean).label("granted"),
+            cast(null(), DateTime(timezone=True)).label("expires_at")
+        ).select_from(User).join(
+            role_permissions_table, role_permissions_table.c.role_id == User.role_id
+        ).join(
+            Permission, Permission.id == role_permissions_table.c.permission_id
+        ).where(User.id == user_id, Permission.is_active == True)
+
+        user_rows = select(
+            literal(USER_SOURCE),
+            Permission.name,
+            UserPermission.granted,
+            UserPermission.expires_at
+        ).join(
+            Permission, Permission.id == UserPermission.permission_id
+        ).where(UserPermission.user_id == user_id, Permission.is_active == True)
+
+        rows = db.execute(union_all(role_rows, user_rows)).all()
+        role_names = [name for source, name, _, _ in rows if source == ROLE_SOURCE]
+        overrides = [
+            (name, granted, expires_at)
+            for source, name, granted, expires_at in rows if source == USER_SOURCE
+        ]
+        return combine_permissions(role_names, overrides, now)
+
+    def resolve(self, user_id: int, db: Session) -> List[str]:
+        """Permisos efectivos del usuario (rol + permisos específicos vigentes)"""
+        version = self._current_version(user_id, db)
+        if version is None:
+            return []
+
+        now = datetime.utcnow()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if (
+                entry is not None
+                and entry.version == version
+                and (entry.valid_until is None or now <= entry.valid_until)
+            ):
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return list(entry.permissions)
+            self.misses += 1
+
+        permissions, valid_until = self._load(user_id, db, now)
+
+        with self._lock:
+            self._entries[user_id] = _Entry(version, tuple(permissions), valid_until)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return permissions
+
+    def invalidate(self, user_id: Optional[int] = None):
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+permission_resolver = PermissionResolver(maxsize=settings.PERMISSION_CACHE_MAX_SIZE)
@@ -0,0 +1,223 @@
+"""
+Revocación de tokens con filtro de Bloom
+La tabla `revoked_tokens` es el conjunto exacto. Cada proceso mantiene un
+filtro de Bloom que se actualiza por deltas (cursor = id de la fila, más una
+ventana de las revocadas en los últimos segundos), y solo ante un acierto del
+filtro se consulta la tabla. Los servicios que verifican
+tokens reciben el mismo filtro vía /auth/revocations.
+"""
+
+import base64
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Optional
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+
+from .config import settings
+from ..models.revocation import RevokedToken
+
+def token_key(jti: str) -> str:
+    return f"jti:{jti}"
+
+def user_key(user_id: int) -> str:
+    return f"user:{user_id}"
+
+def claim_datetime(timestamp: float) -> datetime:
+    """`iat`/`exp` se emiten como datetime.utcnow().timestamp(); deshacer la conversión"""
+    return datetime.fromtimestamp(timestamp)
+
+class BloomFilter:
+    """Filtro de Bloom sobre bytearray (consulta O(k) sin copiar el bitset)"""
+
+    def __init__(self, size: int, hashes: int, bits: Optional[bytearray] = None):
+        self.size = size
+        self.hashes = hashes
+        self.bits = bits if bits is not None else bytearray((size + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, capacity: int, error_rate: float) -> "BloomFilter":
+        size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        hashes = max(1, round(size / capacity * math.log(2)))
+        return cls(size, hashes)
+
+    def _positions(self, key: str) -> Iterable[int]:
+        # Doble hashing: h1 + i*h2 (h2 impar para recorrer todo el rango)
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "hashes": self.hashes,
+            "bits": base64.b64encode(bytes(self.bits)).decode(),
+        }
+
+class RevocationList:
+    """Filtro de Bloom local sincronizado con la tabla `revoked_tokens`"""
+
+    def __init__(
+        self,
+        capacity: int,
+        error_rate: float,
+        refresh_interval: float,
+        rebuild_interval: float,
+        max_delta: int,
+        overlap: float
+    ):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.refresh_interval = refresh_interval
+        self.rebuild_interval = rebuild_interval
+        self.max_delta = max_delta
+        self.overlap = overlap
+        self._filter = BloomFilter.for_capacity(capacity, error_rate)
+        self.cursor = 0
+        self._synced_at = float("-inf")
+        self._built_at = float("-inf")
+        self._lock = threading.Lock()
+        self.checks = 0
+        self.filter_hits = 0
+        self.revoked = 0
+
+    def sync(self, db: Session, force: bool = False):
+        """Incorporar revocaciones nuevas; reconstruir periódicamente sin las expiradas"""
+        now = time.monotonic()
+        if not force and now - self._synced_at < self.refresh_interval:
+            return
+
+        if now - self._built_at >= self.rebuild_interval:
+            cursor = db.query(func.max(RevokedToken.id)).scalar() or 0
+            rows = db.query(RevokedToken.key).filter(
+                RevokedToken.id <= cursor,
+                RevokedToken.expires_at > datetime.utcnow()
+            ).all()
+            fresh = BloomFilter.for_capacity(self.capacity, self.error_rate)
+            for (key,) in rows:
+                fresh.add(key)
+            with self._lock:
+                self._filter = fresh
+                self.cursor = cursor
+                self._built_at = now
+        else:
+            rows = self._rows_after(db, self.cursor).all()
+            with self._lock:
+                for row_id, key in rows:
+                    self._filter.add(key)
+                    self.cursor = max(self.cursor, row_id)
+        self._synced_at = now
+
+    def _rows_after(self, db: Session, cursor: int):
+        """Filas con id > cursor y las revocadas en la ventana de solape.
+
+        Un id menor que el cursor puede hacerse visible tarde (su transacción
+        confirmó después que la de un id mayor); reenviar la ventana es inocuo
+        porque añadir una clave al filtro es idempotente.
+        """
+        recent = datetime.utcnow() - timedelta(seconds=self.overlap)
+        return db.query(RevokedToken.id, RevokedToken.key).filter(
+            or_(RevokedToken.id > cursor, RevokedToken.revoked_at >= recent)
+        ).order_by(RevokedToken.id)
+
+    def add(self, key: str):
+        """Reflejar una revocación local sin esperar al siguiente delta"""
+        with self._lock:
+            self._filter.add(key)
+
+    def might_be_revoked(self, jti: str, user_id: int) -> bool:
+        return token_key(jti) in self._filter or user_key(user_id) in self._filter
+
+    def is_revoked(self, db: Session, jti: str, user_id: int, issued_at: datetime) -> bool:
+        """O(1) en el caso común; consulta exacta solo si el filtro acierta"""
+        self.sync(db)
+        self.checks += 1
+        if not self.might_be_revoked(jti, user_id):
+            return False
+        self.filter_hits += 1
+        revoked = is_revoked_exact(db, jti, user_id, issued_at)
+        if revoked:
+            self.revoked += 1
+        return revoked
+
+    def snapshot(self, db: Session) -> Dict[str, Any]:
+        self.sync(db)
+        with self._lock:
+            return {"cursor": self.cursor, "filter": self._filter.to_dict()}
+
+    def delta(self, db: Session, since: Optional[int]) -> Dict[str, Any]:
+        """Claves revocadas desde `since`; filtro completo sin cursor o si el delta es grande"""
+        if since is None:
+            return self.snapshot(db)
+        rows = self._rows_after(db, since).limit(self.max_delta + 1).all()
+        if len(rows) > self.max_delta:
+            return self.snapshot(db)
+        return {
+            "cursor": max(since, rows[-1][0]) if rows else since,
+            "keys": [key for _, key in rows],
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cursor": self.cursor,
+            "filter_bits": self._filter.size,
+            "filter_hashes": self._filter.hashes,
+            "checks": self.checks,
+            "filter_hits": self.filter_hits,
+            "revoked": self.revoked,
+        }
+
+def is_revoked_exact(db: Session, jti: str, user_id: int, issued_at: datetime) -> bool:
+    """Consulta exacta: el jti está revocado o el usuario revocó todo tras emitirse"""
+    return db.query(RevokedToken.id).filter(
+        or_(
+            RevokedToken.key == token_key(jti),
+            and_(
+                RevokedToken.key == user_key(user_id),
+                RevokedToken.revoked_at >= issued_at
+            )
+        )
+    ).first() is not None
+
+def _record(db: Session, key: str, user_id: Optional[int], reason: str, expires_at: datetime):
+    now = datetime.utcnow()
+    # Las entradas expiradas ya no pueden coincidir con ningún token válido
+    db.query(RevokedToken).filter(RevokedToken.expires_at < now).delete(synchronize_session=False)
+    db.add(RevokedToken(key=key, user_id=user_id, reason=reason, revoked_at=now, expires_at=expires_at))
+    revocation_list.add(key)
+
+def revoke_token(db: Session, jti: str, user_id: Optional[int], expires_at: datetime, reason: str):
+    """Revocar un token concreto hasta su expiración (no hace commit)"""
+    _record(db, token_key(jti), user_id, reason, expires_at)
+
+def revoke_user_tokens(db: Session, user_id: int, reason: str):
+    """Revocar todos los tokens emitidos hasta ahora a un usuario (no hace commit)"""
+    lifetime = max(
+        timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES),
+        timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    )
+    _record(db, user_key(user_id), user_id, reason, datetime.utcnow() + lifetime)
+
+revocation_list = RevocationList(
+    capacity=settings.REVOCATION_FILTER_CAPACITY,
+    error_rate=settings.REVOCATION_FILTER_ERROR_RATE,
+    refresh_interval=settings.REVOCATION_REFRESH_INTERVAL,
+    rebuild_interval=settings.REVOCATION_REBUILD_INTERVAL,
+    max_delta=settings.REVOCATION_MAX_DELTA,
+    overlap=settings.REVOCATION_DELTA_OVERLAP,
+)
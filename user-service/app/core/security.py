@@ -1,37 +1,68 @@
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Union
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-from sqlalchemy.orm import Session
-from fastapi import HTTPException, status, Depends
+from sqlalchemy.orm import Session, object_session
+from fastapi import HTTPException, status, Depends, Header
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from .config import settings
+from .keys import get_signing_keys, is_asymmetric
+from .hashing import password_hasher, pwd_context
+from .permission_registry import decode_mask, encode_mask, permission_registry
+from .revocation import claim_datetime, revocation_list
 from ..models.user import User, UserRole
 from ..schemas.user import TokenData
 from ..models.rbac import Permission
+from ..db.session import get_db
 import secrets
 import uuid
 from functools import wraps
 
 # === PASSWORD MANAGEMENT ===
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verificar password"""
+    """Verificar password (bloqueante; en endpoints usar verify_password_async)"""
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    """Hash de password"""
+    """Hash de password (bloqueante; en endpoints usar get_password_hash_async)"""
     return pwd_context.hash(password)
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verificar password en el pool de bcrypt sin bloquear el event loop"""
+    return await password_hasher.verify(plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash de password en el pool de bcrypt sin bloquear el event loop"""
+    return await password_hasher.hash(password)
+
 def generate_password() -> str:
     """Generar password aleatorio"""
     return secrets.token_urlsafe(12)
 
 # === JWT TOKEN MANAGEMENT ===
 
+def encode_jwt(payload: Dict[str, Any]) -> str:
+    """Firmar payload con la clave activa (asimétrica) o SECRET_KEY (HS*)"""
+    if is_asymmetric(settings.ALGORITHM):
+        keys = get_signing_keys()
+        return jwt.encode(
+            payload, keys.signing_key, algorithm=settings.ALGORITHM,
+            headers={"kid": keys.kid}
+        )
+    return jwt.encode(payload, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+def decode_jwt(token: str) -> Dict[str, Any]:
+    """Verificar firma y expiración; selecciona la clave por `kid`"""
+    if is_asymmetric(settings.ALGORITHM):
+        kid = jwt.get_unverified_header(token).get("kid")
+        key = get_signing_keys().verifier(kid)
+        if key is None:
+            raise JWTError(f"Unknown signing key: {kid}")
+        return jwt.decode(token, key, algorithms=[settings.ALGORITHM])
+    return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+
 def create_access_token(
     user: User, 
     expires_delta: Optional[timedelta] = None,
@@ -45,22 +76,24 @@ def create_access_token(
     else:
         access_expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    refresh_expire = datetime.utcnow() + timedelta(days=7)  # Refresh token 7 días
+    refresh_expire = datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
     
     # JWT ID único
     jti = str(uuid.uuid4())
     
-    # Payload del access token
+    # Permisos como bitset compacto + versión del registro
+    permissions = user.permissions
+    registry = permission_registry.get(object_session(user), names=permissions)
+    
+    # Payload del access token (email/nombre se consultan en /me, no viajan en cada petición)
     access_payload = {
         "sub": str(user.id),
         "username": user.username,
-        "email": user.email,
-        "full_name": user.full_name,
         "role": user.role.name if user.role else "no_role",
-        "permissions": user.permissions if isinstance(user.permissions, list) else [perm.value for perm in user.permissions],
+        "perm_bits": encode_mask(registry.mask_for(permissions)),
+        "perm_ver": registry.version,
         "branch_id": user.branch_id,
         "is_superuser": user.is_superuser,
-        "is_active": user.is_active,
         "iat": datetime.utcnow().timestamp(),
         "exp": access_expire.timestamp(),
         "jti": jti,
@@ -68,7 +101,7 @@ def create_access_token(
     }
     
     # Crear access token
-    access_token = jwt.encode(access_payload, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    access_token = encode_jwt(access_payload)
     
     result = {
         "access_token": access_token,
@@ -87,15 +120,15 @@ def create_access_token(
             "type": "refresh"
         }
         
-        refresh_token = jwt.encode(refresh_payload, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+        refresh_token = encode_jwt(refresh_payload)
         result["refresh_token"] = refresh_token
     
     return result
 
-def verify_token(token: str) -> Optional[TokenData]:
+def verify_token(token: str, db: Optional[Session] = None) -> Optional[TokenData]:
     """Verificar y decodificar token JWT"""
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        payload = decode_jwt(token)
         
         # Validar campos requeridos
         user_id = payload.get("sub")
@@ -116,34 +149,53 @@ def verify_token(token: str) -> Optional[TokenData]:
         }
         role_enum = role_mapping.get(role_name, UserRole.VIEWER)
         
+        # Decodificar el bitset; tokens anteriores traen la lista de nombres
+        permission_version = int(payload.get("perm_ver", 0))
+        if permission_version:
+            permission_mask = decode_mask(payload.get("perm_bits"))
+            registry = permission_registry.get(db, min_version=permission_version)
+            permissions = registry.names_for(permission_mask)
+        else:
+            permission_mask = 0
+            permissions = payload.get("permissions", [])
+        
         token_data = TokenData(
             user_id=int(user_id),
             username=username,
             role=role_enum,
-            permissions=payload.get("permissions", []),
+            permissions=permissions,
+            permission_mask=permission_mask,
+            permission_version=permission_version,
             branch_id=payload.get("branch_id"),
             is_superuser=payload.get("is_superuser", False),
             exp=int(payload.get("exp", 0)),
-            iat=int(payload.get("iat", 0)),
+            iat=float(payload.get("iat", 0)),
             jti=payload.get("jti", "")
         )
         
         return token_data
         
-    except (JWTError, ValueError, KeyError):
+    except (JWTError, ValueError, KeyError, LookupError):
         return None
 
 def refresh_access_token(refresh_token: str, db: Session) -> Optional[Dict[str, Any]]:
     """Renovar access token usando refresh token"""
     try:
-        payload = jwt.decode(refresh_token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        payload = decode_jwt(refresh_token)
         
         # Verificar que es un refresh token
         if payload.get("type") != "refresh":
             return None
         
         user_id = int(payload.get("sub"))
-        user = db.query(User).filter(User.id == user_id, User.is_active == True).first()
+        if revocation_list.is_revoked(
+            db, payload.get("jti", ""), user_id, claim_datetime(payload.get("iat", 0))
+        ):
+            return None
+        
+        user = db.query(User).options(*User.permission_load_options()).filter(
+            User.id == user_id, User.is_active == True
+        ).first()
         
         if not user:
             return None
@@ -156,7 +208,10 @@ def refresh_access_token(refresh_token: str, db: Session) -> Optional[Dict[str,
 
 # === AUTHENTICATION DEPENDENCIES ===
 
-async def get_current_user_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> TokenData:
+async def get_current_user_token(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+) -> TokenData:
     """Dependency para obtener usuario actual del token JWT"""
     
     credentials_exception = HTTPException(
@@ -166,7 +221,7 @@ async def get_current_user_token(credentials: HTTPAuthorizationCredentials = Dep
     )
     
     try:
-        token_data = verify_token(credentials.credentials)
+        token_data = verify_token(credentials.credentials, db)
         if not token_data:
             raise credentials_exception
         
@@ -178,16 +233,40 @@ async def get_current_user_token(credentials: HTTPAuthorizationCredentials = Dep
                 headers={"WWW-Authenticate": "Bearer"},
             )
         
+        # Revocación: filtro de Bloom en memoria, BD solo si el filtro acierta
+        if revocation_list.is_revoked(
+            db, token_data.jti, token_data.user_id, claim_datetime(token_data.iat)
+        ):
+            raise credentials_exception
+        
         return token_data
         
     except Exception:
         raise credentials_exception
 
+async def require_service_or_user(
+    x_service_key: Optional[str] = Header(None),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False)),
+    db: Session = Depends(get_db)
+):
+    """Servicios internos con X-Service-Key, o cualquier usuario autenticado"""
+    if x_service_key is not None and settings.SERVICE_API_KEY and secrets.compare_digest(
+        x_service_key.encode(), settings.SERVICE_API_KEY.encode()
+    ):
+        return
+    if credentials is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    await get_current_user_token(credentials, db)
+
 # === PERMISSION HELPERS ===
 
 def check_user_permission(
     user_data: TokenData,
-    permission: Permission,
+    permission: Union[str, Permission],
     resource_id: Optional[int] = None,
     branch_id: Optional[int] = None
 ) -> Dict[str, Any]:
@@ -196,11 +275,18 @@ def check_user_permission(
     if user_data.is_superuser:
         return {"has_permission": True}
     
-    # Verificar permiso básico
-    if permission.value not in user_data.permissions:
+    permission_name = permission if isinstance(permission, str) else permission.name
+    
+    # Verificar permiso básico (O(1) sobre la máscara del token)
+    if user_data.permission_version:
+        registry = permission_registry.current
+        granted = registry is not None and registry.has(user_data.permission_mask, permission_name)
+    else:
+        granted = permission_name in user_data.permissions
+    if not granted:
         return {
             "has_permission": False,
-            "reason": f"User does not have permission: {permission.value}"
+            "reason": f"User does not have permission: {permission_name}"
         }
     
     # Verificar acceso a sucursal si se especifica
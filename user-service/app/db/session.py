@@ -1,16 +1,109 @@
+import threading
+import time
+from typing import Any, Dict, Optional
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 from ..core.config import settings
 
-# Create engine lazily to avoid connection at import time
-def get_engine():
-    return create_engine(settings.DATABASE_URL)
+Base = declarative_base()
 
-def get_session_local():
-    return sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
+# === POOL INSTRUMENTATION ===
 
-Base = declarative_base()
+class PoolWaitStats:
+    """Estadísticas de espera al obtener conexiones del pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.total_wait = 0.0
+            self.max_wait = 0.0
+
+    def record(self, wait: float):
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += wait
+            if wait > self.max_wait:
+                self.max_wait = wait
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            avg = self.total_wait / self.checkouts if self.checkouts else 0.0
+            return {
+                "checkouts": self.checkouts,
+                "total_wait_ms": round(self.total_wait * 1000, 3),
+                "avg_wait_ms": round(avg * 1000, 3),
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+            }
+
+pool_wait_stats = PoolWaitStats()
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool que mide el tiempo de espera de cada checkout"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_wait_stats.record(time.perf_counter() - start)
+
+# === ENGINE LIFECYCLE ===
+
+# Un único engine por proceso; se crea en el arranque de la app (lifespan)
+# o de forma perezosa en el primer uso para scripts y tests.
+_engine: Optional[Engine] = None
+_SessionLocal: Optional[sessionmaker] = None
+_engine_lock = threading.Lock()
+
+def _engine_options(database_url: str) -> Dict[str, Any]:
+    """Opciones del engine según el backend configurado"""
+    if database_url.startswith("sqlite"):
+        # SQLite no admite pool_size/max_overflow; usa el pool por defecto
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+def init_engine(database_url: Optional[str] = None) -> Engine:
+    """Crear el engine compartido del proceso (idempotente)"""
+    global _engine, _SessionLocal
+    with _engine_lock:
+        if _engine is None:
+            url = database_url or settings.DATABASE_URL
+            _engine = create_engine(url, **_engine_options(url))
+            _SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=_engine)
+    return _engine
+
+def dispose_engine():
+    """Cerrar todas las conexiones del pool (apagado de la app)"""
+    global _engine, _SessionLocal
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+        _engine = None
+        _SessionLocal = None
+    pool_wait_stats.reset()
+
+def get_engine() -> Engine:
+    return _engine if _engine is not None else init_engine()
+
+def get_session_local() -> sessionmaker:
+    if _SessionLocal is None:
+        init_engine()
+    return _SessionLocal
 
 def get_db():
     SessionLocal = get_session_local()
@@ -18,4 +111,27 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Estadísticas del pool de conexiones del engine compartido"""
+    if _engine is None:
+        return {"initialized": False}
+
+    pool = _engine.pool
+    stats: Dict[str, Any] = {
+        "initialized": True,
+        "pool_class": type(pool).__name__,
+    }
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "max_overflow": pool._max_overflow,
+            "timeout": pool.timeout(),
+        })
+    if isinstance(pool, InstrumentedQueuePool):
+        stats["wait"] = pool_wait_stats.snapshot()
+    return stats
@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from typing import Dict, Any
@@ -36,10 +37,23 @@ except Exception as e:
     print(f"❌ Unexpected error importing RBAC router: {e}")
     rbac_router = None
 
+from app.db.session import init_engine, dispose_engine, get_pool_stats
+from app.core.hashing import password_hasher
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Un solo engine/pool de conexiones por proceso
+    init_engine()
+    password_hasher.start()
+    yield
+    password_hasher.shutdown()
+    dispose_engine()
+
 app = FastAPI(
     title="User Management Service",
     version="1.0.0",
-    description="User Management Service for POS System"
+    description="User Management Service for POS System",
+    lifespan=lifespan
 )
 
 # CORS
@@ -68,6 +82,16 @@ else:
 async def health_check():
     return {"status": "healthy", "service": "user"}
 
+@app.get("/health/db-pool")
+async def db_pool_stats():
+    """Estadísticas del pool de conexiones a la base de datos"""
+    return get_pool_stats()
+
+@app.get("/health/password-hasher")
+async def password_hasher_stats():
+    """Métricas del pool de bcrypt (cola, espera, ejecución)"""
+    return password_hasher.stats()
+
 # Additional endpoints
 @app.get("/api/v1/users")
 async def get_users():
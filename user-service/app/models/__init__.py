@@ -1,10 +1,11 @@
 # Import all models for Alembic discovery
 from .user import User, UserRole
 from .rbac import Role, Permission as RBACPermission, UserPermission, create_default_roles_and_permissions, get_user_effective_permissions
+from .revocation import RevokedToken
 
 __all__ = [
     "User", "UserRole",
-    "Role", "RBACPermission", "UserPermission",
+    "Role", "RBACPermission", "UserPermission", "RevokedToken",
     "create_default_roles_and_permissions", "get_user_effective_permissions"
 ]
 
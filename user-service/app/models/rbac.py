@@ -3,8 +3,8 @@ Role-Based Access Control (RBAC) Models
 Implementación escalable de roles y permisos
 """
 
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Table, Text
-from sqlalchemy.orm import relationship, Session
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Table, Text, event, select, update
+from sqlalchemy.orm import object_session, relationship, Session
 from sqlalchemy.sql import func
 from typing import List, Optional
 from ..db.session import Base
@@ -29,6 +29,9 @@ class Role(Base):
     description = Column(Text, nullable=True)
     is_active = Column(Boolean, default=True)
     
+    # Versión de permisos del rol (invalida la caché de todos sus usuarios)
+    permissions_version = Column(Integer, nullable=False, default=0, server_default="0")
+    
     # Metadata
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -61,6 +64,10 @@ class Permission(Base):
     resource = Column(String(50), nullable=False, index=True)  # users, sales, products, reports
     action = Column(String(50), nullable=False, index=True)    # create, read, update, delete, export
     
+    # Bit estable en el bitset de permisos de los tokens (nunca se reutiliza:
+    # desactivar un permiso con is_active en lugar de borrarlo)
+    bit_index = Column(Integer, unique=True, nullable=True)
+    
     # Metadata
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -104,6 +111,52 @@ class UserPermission(Base):
             return datetime.utcnow() <= self.expires_at.replace(tzinfo=None)
         return True
 
+@event.listens_for(Role.permissions, "append")
+@event.listens_for(Role.permissions, "remove")
+def _bump_version_on_role_permissions_change(target, value, initiator):
+    """Cambios en los permisos del rol invalidan la caché de sus usuarios"""
+    target.permissions_version = (target.permissions_version or 0) + 1
+
+@event.listens_for(Permission.is_active, "set", active_history=True)
+def _bump_versions_on_permission_toggle(target, value, oldvalue, initiator):
+    """Retirar o reactivar un permiso invalida la caché de los roles y usuarios que lo tienen"""
+    session = object_session(target)
+    if session is None or target.id is None or bool(value) == bool(oldvalue):
+        return
+    from .user import User
+
+    role_ids = select(role_permissions_table.c.role_id).where(
+        role_permissions_table.c.permission_id == target.id
+    )
+    user_ids = select(UserPermission.user_id).where(UserPermission.permission_id == target.id)
+    with session.no_autoflush:
+        session.execute(
+            update(Role).where(Role.id.in_(role_ids))
+            .values(permissions_version=Role.permissions_version + 1)
+            .execution_options(synchronize_session="fetch")
+        )
+        session.execute(
+            update(User).where(User.id.in_(user_ids))
+            .values(permissions_version=User.permissions_version + 1)
+            .execution_options(synchronize_session="fetch")
+        )
+
+@event.listens_for(Session, "before_flush")
+def _assign_permission_bits(session, flush_context, instances):
+    """Asignar el siguiente bit libre a los permisos nuevos"""
+    pending = [
+        obj for obj in session.new
+        if isinstance(obj, Permission) and obj.bit_index is None
+    ]
+    if not pending:
+        return
+    with session.no_autoflush:
+        current = session.execute(select(func.max(Permission.bit_index))).scalar()
+    next_bit = -1 if current is None else current
+    for permission in sorted(pending, key=lambda p: p.name):
+        next_bit += 1
+        permission.bit_index = next_bit
+
 # Funciones de utilidad para el sistema RBAC
 def create_default_roles_and_permissions():
     """Crear roles y permisos por defecto del sistema"""
@@ -224,32 +277,19 @@ def create_default_roles_and_permissions():
     finally:
         db.close()
 
-def get_user_effective_permissions(user_id: int, db: Session) -> List[str]:
-    """Obtener permisos efectivos de un usuario (rol + permisos específicos)"""
+def bump_user_permission_version(user_id: int, db: Session):
+    """Invalidar los permisos cacheados de un usuario (grant/revoke)"""
     from .user import User
+    from ..core.permissions import permission_resolver
     
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        return []
-    
-    # Obtener permisos del rol
-    role_permissions = set()
-    if user.role:
-        role_permissions = set(user.role.get_permission_names())
-    
-    # Obtener permisos específicos del usuario
-    user_permissions = db.query(UserPermission).filter(
-        UserPermission.user_id == user_id
-    ).all()
-    
-    # Aplicar permisos específicos (grant/deny)
-    effective_permissions = role_permissions.copy()
-    
-    for user_perm in user_permissions:
-        if user_perm.is_valid():
-            if user_perm.granted:
-                effective_permissions.add(user_perm.permission.name)
-            else:
-                effective_permissions.discard(user_perm.permission.name)
+    db.query(User).filter(User.id == user_id).update(
+        {User.permissions_version: User.permissions_version + 1},
+        synchronize_session=False
+    )
+    permission_resolver.invalidate(user_id)
+
+def get_user_effective_permissions(user_id: int, db: Session) -> List[str]:
+    """Obtener permisos efectivos de un usuario (rol + permisos específicos)"""
+    from ..core.permissions import permission_resolver
     
-    return list(effective_permissions)
\ No newline at end of file
+    return permission_resolver.resolve(user_id, db)
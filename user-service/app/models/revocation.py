@@ -0,0 +1,25 @@
+"""
+Tokens revocados
+Cada fila revoca un token concreto (`jti:<jti>`) o todos los emitidos a un
+usuario hasta `revoked_at` (`user:<id>`). El id autoincremental sirve de
+cursor para distribuir deltas a los servicios que verifican tokens.
+"""
+
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from ..db.session import Base
+
+class RevokedToken(Base):
+    """Entrada de la lista de revocación"""
+    __tablename__ = "revoked_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    key = Column(String(100), nullable=False, index=True)  # jti:<jti> | user:<id>
+    user_id = Column(Integer, ForeignKey('users.id', ondelete="CASCADE"), nullable=True, index=True)
+    reason = Column(String(30), nullable=False)  # logout, password_change, deactivated
+
+    # UTC sin zona, igual que `iat`/`exp` de los tokens
+    revoked_at = Column(DateTime, nullable=False, index=True)  # ventana de los deltas
+    expires_at = Column(DateTime, nullable=False, index=True)  # purgable a partir de aquí
+
+    def __repr__(self):
+        return f"<RevokedToken(key='{self.key}', reason='{self.reason}')>"
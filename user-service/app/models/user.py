@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Enum as SQLEnum, ForeignKey, Table
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Enum as SQLEnum, ForeignKey, Table, event
+from sqlalchemy.orm import relationship, selectinload
 from sqlalchemy.sql import func
+from datetime import datetime
 from enum import Enum as PyEnum
 from typing import List, Optional
 from ..db.session import Base
@@ -27,6 +28,9 @@ class User(Base):
     # Role relationship (Foreign Key to roles table)
     role_id = Column(Integer, ForeignKey('roles.id'), nullable=True)
     
+    # Versión de permisos: se incrementa con cada cambio de rol o permiso específico
+    permissions_version = Column(Integer, nullable=False, default=0, server_default="0")
+    
     # Estado
     is_active = Column(Boolean, default=True)
     is_superuser = Column(Boolean, default=False)
@@ -51,22 +55,36 @@ class User(Base):
         role_name = self.role.name if self.role else "no_role"
         return f"<User(username='{self.username}', role='{role_name}')>"
     
+    @classmethod
+    def permission_load_options(cls):
+        """Carga ansiosa de rol→permisos y permisos específicos (consultas constantes)"""
+        from .rbac import Role, UserPermission
+        return (
+            selectinload(cls.role).selectinload(Role.permissions),
+            selectinload(cls.user_permissions).selectinload(UserPermission.permission),
+        )
+    
     @property
     def permissions(self) -> List[str]:
-        """Obtiene permisos efectivos del usuario (rol + permisos específicos)"""
-        from .rbac import get_user_effective_permissions
-        from ..db.session import get_db
+        """Obtiene permisos efectivos del usuario (rol + permisos específicos)
+        
+        Se calculan con la sesión que cargó al usuario; para listas, cargar con
+        `permission_load_options()` y evitar consultas por usuario.
+        """
+        cached = self.__dict__.get("_effective_permissions")
+        if cached is not None:
+            return list(cached)
+        
+        from ..core.permissions import combine_permissions
         
-        # This is a simplified version for compatibility
-        # In real usage, pass the db session as parameter
-        try:
-            db = next(get_db())
-            return get_user_effective_permissions(self.id, db)
-        except:
-            # Fallback to role permissions only
-            if self.role:
-                return self.role.get_permission_names()
-            return []
+        role_permissions = self.role.get_permission_names() if self.role else []
+        overrides = [
+            (user_perm.permission.name, user_perm.granted, user_perm.expires_at)
+            for user_perm in self.user_permissions
+        ]
+        permissions, _ = combine_permissions(role_permissions, overrides, datetime.utcnow())
+        self._effective_permissions = tuple(permissions)
+        return permissions
     
     def has_permission(self, permission_name: str) -> bool:
         """Verifica si el usuario tiene un permiso específico"""
@@ -100,3 +118,10 @@ class User(Base):
         return role_mapping.get(self.role.name, UserRole.VIEWER)
 
 
+@event.listens_for(User.role_id, "set")
+@event.listens_for(User.role, "set")
+def _bump_version_on_role_change(target, value, oldvalue, initiator):
+    """Un cambio de rol invalida los permisos cacheados del usuario"""
+    if value is not oldvalue:
+        target.permissions_version = (target.permissions_version or 0) + 1
+        target.__dict__.pop("_effective_permissions", None)
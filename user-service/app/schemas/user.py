@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr, validator
+from pydantic import BaseModel, EmailStr, Field, validator
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 from ..models.user import UserRole
@@ -44,10 +44,23 @@ class UserResponse(UserBase):
     updated_at: Optional[datetime]
     last_login: Optional[datetime]
     permissions: List[str]  # List of permission strings
+    # Nombre del rol RBAC: puede ser un rol propio, fuera del enum legacy
+    role: str = UserRole.VIEWER.value
     
     class Config:
         from_attributes = True
         
+    @validator('role', pre=True)
+    def extract_role(cls, v):
+        # User.role es la fila Role (RBAC)
+        if v is None:
+            return UserRole.VIEWER.value
+        if isinstance(v, UserRole):
+            return v.value
+        if not isinstance(v, str) and hasattr(v, 'name'):
+            return v.name
+        return v
+        
     @validator('permissions', pre=True)
     def extract_permissions(cls, v):
         if hasattr(v, '__iter__') and not isinstance(v, str):
@@ -88,10 +101,12 @@ class TokenData(BaseModel):
     username: str
     role: UserRole
     permissions: List[str]
+    permission_mask: int = 0  # bitset del token (ver core/permission_registry)
+    permission_version: int = 0  # versión del registro con la que se emitió
     branch_id: Optional[int] = None
     is_superuser: bool = False
     exp: int  # expiration timestamp
-    iat: int  # issued at timestamp
+    iat: float  # issued at timestamp (sub-segundo: se compara con revocaciones)
     jti: str  # JWT ID (unique identifier)
 
 class RefreshTokenRequest(BaseModel):
@@ -112,6 +127,12 @@ class PermissionResponse(BaseModel):
     has_permission: bool
     reason: Optional[str] = None
 
+class PermissionBatchCheck(BaseModel):
+    checks: List[PermissionCheck] = Field(..., max_length=200)
+
+class PermissionBatchResponse(BaseModel):
+    results: List[PermissionResponse]  # mismo orden que `checks`
+
 class RolePermissions(BaseModel):
     role: UserRole
     permissions: List[str]
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Benchmark de login bajo carga concurrente
+Compara bcrypt bloqueando el event loop ("blocking", comportamiento anterior)
+con bcrypt en el pool acotado ("executor"). Mide p50/p95/p99 y throughput de
+/login y el retraso del event loop durante la ráfaga (cuánto se bloquea).
+
+Uso:
+    python benchmarks/bench_login.py --mode both --concurrency 32 --requests 128
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.main import app
+from app.api.v1.endpoints import auth as auth_endpoints
+from app.core import keys as jwt_keys
+from app.core.hashing import password_hasher
+from app.core.keys import SigningKeySet
+from app.core.security import get_password_hash, verify_password
+from app.db.session import Base, get_db
+from app.models.rbac import Role
+from app.models.user import User
+from common import summarize
+
+def setup_database(workdir, users):
+    engine = create_engine(
+        f"sqlite:///{workdir}/bench_login.db", connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine, autoflush=False)
+
+    db = SessionLocal()
+    role = Role(name="cashier", display_name="Cashier")
+    db.add(role)
+    hashed = get_password_hash("cashier123")
+    for i in range(users):
+        db.add(User(
+            username=f"cashier{i}", email=f"cashier{i}@possystem.com",
+            full_name=f"Cashier {i}", hashed_password=hashed, role=role
+        ))
+    db.commit()
+    db.close()
+
+    def override_get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+
+async def blocking_verify(plain_password, hashed_password):
+    # Comportamiento anterior: bcrypt directamente en el event loop
+    return verify_password(plain_password, hashed_password)
+
+async def run_storm(concurrency, total, users):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        semaphore = asyncio.Semaphore(concurrency)
+        login_latencies, loop_lag = [], []
+        done = asyncio.Event()
+
+        async def login(i):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post("/api/v1/auth/login", json={
+                    "username": f"cashier{i % users}", "password": "cashier123"
+                })
+                login_latencies.append(time.perf_counter() - start)
+                assert response.status_code == 200, response.text
+
+        async def probe_loop_lag():
+            # Retraso del event loop: cuánto tarda en despertar un sleep de 10ms
+            while not done.is_set():
+                start = time.perf_counter()
+                await asyncio.sleep(0.01)
+                loop_lag.append(max(0.0, time.perf_counter() - start - 0.01))
+
+        probe = asyncio.create_task(probe_loop_lag())
+        start = time.perf_counter()
+        await asyncio.gather(*(login(i) for i in range(total)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await probe
+
+    return {
+        "login": summarize(login_latencies, elapsed),
+        "event_loop_lag": summarize(loop_lag, elapsed),
+        "elapsed_s": round(elapsed, 3),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["blocking", "executor", "both"], default="both")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=128)
+    parser.add_argument("--users", type=int, default=16)
+    parser.add_argument("--output", help="Guardar resultados JSON en este archivo")
+    args = parser.parse_args()
+
+    results = {
+        "benchmark": "login",
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        "hash_workers": password_hasher.workers,
+        "hash_executor": password_hasher.kind,
+    }
+    original_verify = auth_endpoints.verify_password_async
+    modes = ["blocking", "executor"] if args.mode == "both" else [args.mode]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        jwt_keys._key_set = SigningKeySet("RS256", os.path.join(workdir, "jwt.pem"))
+        setup_database(workdir, args.users)
+        for mode in modes:
+            auth_endpoints.verify_password_async = (
+                blocking_verify if mode == "blocking" else original_verify
+            )
+            password_hasher.reset_stats()
+            results[mode] = asyncio.run(run_storm(args.concurrency, args.requests, args.users))
+            if mode == "executor":
+                results[mode]["hasher"] = password_hasher.stats()
+        auth_endpoints.verify_password_async = original_verify
+        password_hasher.shutdown()
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Utilidades compartidas por los benchmarks de user-service
+Percentiles, resumen de latencias, conteo de consultas SQL y comparación
+contra una ejecución anterior (JSON) para detectar regresiones.
+"""
+
+import json
+import time
+from typing import Any, Dict, List
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p * (len(values) - 1))))]
+
+def summarize(latencies, elapsed):
+    return {
+        "count": len(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(max(latencies) * 1000, 2) if latencies else 0.0,
+    }
+
+class QueryCounter:
+    """Cuenta las sentencias SQL emitidas por un engine"""
+
+    def __init__(self, engine: Engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+class OpTimer:
+    """Acumula latencias y consultas de una operación"""
+
+    def __init__(self, counter: QueryCounter):
+        self.counter = counter
+        self.latencies: List[float] = []
+        self.queries = 0
+        self.elapsed = 0.0
+
+    def __enter__(self):
+        self._queries_before = self.counter.count
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        latency = time.perf_counter() - self._start
+        self.latencies.append(latency)
+        self.elapsed += latency
+        self.queries += self.counter.count - self._queries_before
+
+    def result(self) -> Dict[str, Any]:
+        summary = summarize(self.latencies, self.elapsed)
+        summary["ops_per_sec"] = summary.pop("throughput_rps")
+        summary["queries_per_op"] = round(self.queries / len(self.latencies), 2) if self.latencies else 0.0
+        return summary
+
+def compare(current: Dict[str, Any], baseline_path: str, threshold: float) -> List[str]:
+    """Operaciones cuyo p95 o queries/op empeoraron más de `threshold` (fracción)"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    regressions = []
+    for name, result in current.get("operations", {}).items():
+        previous = baseline.get("operations", {}).get(name)
+        if not previous:
+            continue
+        if previous["p95_ms"] and result["p95_ms"] > previous["p95_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p95 {previous['p95_ms']}ms -> {result['p95_ms']}ms")
+        # Las sincronizaciones periódicas añaden décimas; solo cuenta una consulta más por op
+        if result["queries_per_op"] >= previous["queries_per_op"] + 0.5:
+            regressions.append(
+                f"{name}: queries/op {previous['queries_per_op']} -> {result['queries_per_op']}"
+            )
+    return regressions
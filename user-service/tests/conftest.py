@@ -0,0 +1,33 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.main import app
+from app.core import keys as jwt_keys
+from app.core.keys import SigningKeySet
+from app.core.permission_registry import permission_registry
+from app.db.session import Base, get_db
+
+@pytest.fixture
+def session_factory(tmp_path, monkeypatch):
+    """Sessions on an empty SQLite database that the app is also served from.
+
+    Tokens are signed with a key made for the test, and the permission
+    registry is reloaded from this database.
+    """
+    monkeypatch.setattr(jwt_keys, "_key_set", SigningKeySet("RS256", str(tmp_path / "jwt.pem")))
+    monkeypatch.setattr(permission_registry, "_registry", None)
+    engine = create_engine(f"sqlite:///{tmp_path}/users.db", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def override_get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield SessionLocal
+    app.dependency_overrides.pop(get_db, None)
+    engine.dispose()
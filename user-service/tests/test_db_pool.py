@@ -0,0 +1,49 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from app.main import app
+from app.db import session as db_session
+from app.db.session import InstrumentedQueuePool, pool_wait_stats
+
+def test_engine_is_shared_across_sessions(tmp_path):
+    db_session.dispose_engine()
+    engine = db_session.init_engine(f"sqlite:///{tmp_path}/pool.db")
+    try:
+        assert db_session.init_engine() is engine
+        assert db_session.get_engine() is engine
+
+        first = next(db_session.get_db())
+        second = next(db_session.get_db())
+        assert first.get_bind() is second.get_bind() is engine
+    finally:
+        db_session.dispose_engine()
+
+    assert db_session.get_pool_stats() == {"initialized": False}
+
+def test_instrumented_pool_records_wait(tmp_path):
+    pool_wait_stats.reset()
+    engine = create_engine(
+        f"sqlite:///{tmp_path}/wait.db",
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+    )
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+    snapshot = pool_wait_stats.snapshot()
+    assert snapshot["checkouts"] == 1
+    assert snapshot["max_wait_ms"] >= 0
+    engine.dispose()
+
+def test_pool_stats_endpoint(tmp_path):
+    db_session.dispose_engine()
+    db_session.init_engine(f"sqlite:///{tmp_path}/endpoint.db")
+    try:
+        response = TestClient(app).get("/health/db-pool")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["initialized"] is True
+        assert "checked_out" in data
+        assert "overflow" in data
+    finally:
+        db_session.dispose_engine()
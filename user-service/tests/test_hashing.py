@@ -0,0 +1,32 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from app.core.hashing import PasswordHasher
+
+def test_hash_and_verify_run_in_executor():
+    hasher = PasswordHasher(kind="thread", workers=2, max_queue=8)
+
+    async def scenario():
+        hashed = await hasher.hash("cashier123")
+        results = await asyncio.gather(
+            hasher.verify("cashier123", hashed),
+            hasher.verify("wrong-pass", hashed),
+        )
+        return results
+
+    try:
+        assert asyncio.run(scenario()) == [True, False]
+    finally:
+        hasher.shutdown()
+
+    stats = hasher.stats()
+    assert stats["completed"] == 3
+    assert stats["queued"] == 0
+    assert stats["running"] == 0
+
+def test_rejects_when_queue_is_full():
+    hasher = PasswordHasher(kind="thread", workers=1, max_queue=0)
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(hasher.hash("cashier123"))
+    assert exc.value.status_code == 503
+    assert hasher.stats()["rejected"] == 1
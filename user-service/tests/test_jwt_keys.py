@@ -0,0 +1,93 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from fastapi.testclient import TestClient
+from jose import jwt
+from app.main import app
+from app.core import keys as jwt_keys
+from app.core.keys import SigningKeySet
+from app.core.permission_registry import PermissionRegistry, permission_registry
+from app.core.security import create_access_token, verify_token
+from app.models.user import User
+
+@pytest.fixture
+def key_set(tmp_path, monkeypatch):
+    key_set = SigningKeySet("RS256", str(tmp_path / "jwt_private.pem"))
+    monkeypatch.setattr(jwt_keys, "_key_set", key_set)
+    monkeypatch.setattr(permission_registry, "_registry", PermissionRegistry({"read_sale": 0}))
+    return key_set
+
+def make_user():
+    return User(
+        id=1, username="cashier1", email="cashier1@possystem.com",
+        full_name="John Cashier", is_superuser=False, is_active=True, branch_id=1
+    )
+
+def test_private_key_is_persisted(tmp_path):
+    path = str(tmp_path / "jwt_private.pem")
+    first = SigningKeySet("RS256", path)
+    second = SigningKeySet("RS256", path)
+    assert first.kid == second.kid
+
+def test_workers_starting_together_share_one_key(tmp_path, monkeypatch):
+    path = str(tmp_path / "keys" / "jwt_private.pem")
+    generate = jwt_keys._generate_private_key
+
+    class SlowToSerialize:
+        # Widens the window in which the winner is still writing the key
+        def __init__(self, key):
+            self.key = key
+
+        def __getattr__(self, name):
+            return getattr(self.key, name)
+
+        def private_bytes(self, *args):
+            time.sleep(0.2)
+            return self.key.private_bytes(*args)
+
+    monkeypatch.setattr(jwt_keys, "_generate_private_key", lambda algorithm: SlowToSerialize(generate(algorithm)))
+    barrier = threading.Barrier(8)
+
+    def start():
+        barrier.wait()
+        return SigningKeySet("RS256", path).kid
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        kids = set(pool.map(lambda _: start(), range(8)))
+    assert kids == {SigningKeySet("RS256", path).kid}
+    assert os.listdir(tmp_path / "keys") == ["jwt_private.pem"]
+
+def test_access_token_is_signed_with_active_key(key_set, monkeypatch):
+    monkeypatch.setattr(User, "permissions", property(lambda self: ["read_sale"]))
+    token = create_access_token(make_user())["access_token"]
+
+    header = jwt.get_unverified_header(token)
+    assert header["alg"] == "RS256"
+    assert header["kid"] == key_set.kid
+
+    token_data = verify_token(token)
+    assert token_data.user_id == 1
+    assert token_data.permissions == ["read_sale"]
+
+def test_jwks_verifies_issued_tokens(key_set, monkeypatch):
+    monkeypatch.setattr(User, "permissions", property(lambda self: []))
+    token = create_access_token(make_user())["access_token"]
+
+    response = TestClient(app).get("/api/v1/auth/jwks.json")
+    assert response.status_code == 200
+    jwks = response.json()
+    assert [k["kid"] for k in jwks["keys"]] == [key_set.kid]
+
+    payload = jwt.decode(token, jwks, algorithms=["RS256"])
+    assert payload["sub"] == "1"
+
+def test_retired_keys_remain_published(tmp_path, monkeypatch):
+    old = SigningKeySet("RS256", str(tmp_path / "old.pem"))
+    retired_path = tmp_path / "old_public.pem"
+    retired_path.write_text(old.public_keys[old.kid])
+
+    current = SigningKeySet("RS256", str(tmp_path / "new.pem"), [str(retired_path)])
+    assert set(current.public_keys) == {current.kid, old.kid}
+    assert current.verification_key(old.kid) == old.public_keys[old.kid]
@@ -0,0 +1,96 @@
+import pytest
+from fastapi.testclient import TestClient
+from jose import jwt
+from app.main import app
+from app.core.permission_registry import (
+    PermissionRegistry, decode_mask, encode_mask, permission_registry
+)
+from app.core.security import check_user_permission, create_access_token, verify_token
+from app.models.rbac import Permission, Role
+from app.models.user import User
+
+NAMES = ("create_sale", "read_sale", "delete_sale", "view_reports")
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    perms = [Permission(name=n, display_name=n, resource="sales", action=n) for n in NAMES]
+    cashier = Role(name="cashier", display_name="Cashier")
+    cashier.permissions = [perms[0], perms[1]]
+    session.add_all([cashier, *perms])
+    session.add(User(
+        id=1, username="cashier1", email="c1@possystem.com", full_name="Cashier",
+        hashed_password="x", role=cashier
+    ))
+    session.commit()
+    yield session
+    session.close()
+
+def test_mask_roundtrip():
+    for mask in (0, 1, 0b1010, 1 << 70 | 5):
+        assert decode_mask(encode_mask(mask)) == mask
+
+def test_bits_are_stable_and_append_only(db):
+    bits = dict(db.query(Permission.name, Permission.bit_index))
+    assert sorted(bits.values()) == [0, 1, 2, 3]
+
+    db.add(Permission(name="export_reports", display_name="x", resource="reports", action="export"))
+    db.commit()
+    registry = permission_registry.load(db)
+    assert registry.version == 5
+    assert registry.bit("export_reports") == 4
+    assert all(registry.bit(name) == bit for name, bit in bits.items())
+
+def test_token_carries_bitset(db):
+    user = db.get(User, 1)
+    token = create_access_token(user)["access_token"]
+
+    claims = jwt.get_unverified_claims(token)
+    assert "permissions" not in claims and "email" not in claims
+    registry = permission_registry.current
+    assert claims["perm_ver"] == registry.version
+    assert registry.names_for(decode_mask(claims["perm_bits"])) == ["create_sale", "read_sale"]
+
+    token_data = verify_token(token, db)
+    assert token_data.permissions == ["create_sale", "read_sale"]
+    assert check_user_permission(token_data, "create_sale")["has_permission"]
+    assert not check_user_permission(token_data, "delete_sale")["has_permission"]
+
+def test_newer_registry_version_is_reloaded(db):
+    token = create_access_token(db.get(User, 1))["access_token"]
+    permission_registry._registry = PermissionRegistry({"create_sale": 0})
+
+    assert verify_token(token, db).permissions == ["create_sale", "read_sale"]
+    assert permission_registry.current.version == 4
+
+def test_registry_endpoint(db):
+    response = TestClient(app).get("/api/v1/auth/permission-registry")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["version"] == 4
+    assert set(data["permissions"]) == set(NAMES)
+
+def test_batch_permission_check(db):
+    db.get(User, 1).branch_id = 1
+    db.commit()
+    user = db.query(User).options(*User.permission_load_options()).filter(User.id == 1).one()
+    token = create_access_token(user)["access_token"]
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = client.post("/api/v1/auth/check-permissions", headers=headers, json={"checks": [
+        {"permission": "create_sale"},
+        {"permission": "delete_sale"},
+        {"permission": "create_sale", "branch_id": 2},
+        {"permission": "no_such_permission"},
+    ]})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["has_permission"] for r in results] == [True, False, False, False]
+    assert "branch" in results[2]["reason"]
+    assert "Invalid permission" in results[3]["reason"]
+
+    single = client.post("/api/v1/auth/check-permission", headers=headers, json={"permission": "read_sale"})
+    assert single.json()["has_permission"] is True
+    invalid = client.post("/api/v1/auth/check-permission", headers=headers, json={"permission": "nope"})
+    assert invalid.status_code == 400
@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import event
+from app.core.permissions import PermissionResolver
+from app.models.rbac import Permission, Role, UserPermission, bump_user_permission_version
+from app.models.user import User
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    perms = {
+        name: Permission(name=name, display_name=name, resource="sales", action=name)
+        for name in ("create_sale", "read_sale", "delete_sale", "export_reports")
+    }
+    cashier = Role(name="cashier", display_name="Cashier")
+    cashier.permissions = [perms["create_sale"], perms["read_sale"]]
+    session.add_all([cashier, *perms.values()])
+    session.add(User(
+        id=1, username="cashier1", email="c1@possystem.com", full_name="Cashier",
+        hashed_password="x", role=cashier
+    ))
+    session.commit()
+
+    session.info["statements"] = 0
+
+    @event.listens_for(session.get_bind(), "before_cursor_execute")
+    def count(*args):
+        session.info["statements"] += 1
+
+    yield session
+    event.remove(session.get_bind(), "before_cursor_execute", count)
+    session.close()
+
+def grant(db, name, granted=True, expires_at=None):
+    permission = db.query(Permission).filter(Permission.name == name).one()
+    db.add(UserPermission(user_id=1, permission_id=permission.id, granted=granted, expires_at=expires_at))
+    bump_user_permission_version(1, db)
+    db.commit()
+
+def test_resolves_in_one_query_and_caches(db):
+    resolver = PermissionResolver(maxsize=10)
+
+    assert resolver.resolve(1, db) == ["create_sale", "read_sale"]
+    assert db.info["statements"] == 2  # version lookup + joined permission query
+
+    db.info["statements"] = 0
+    assert resolver.resolve(1, db) == ["create_sale", "read_sale"]
+    assert db.info["statements"] == 1
+    assert resolver.stats()["hits"] == 1
+
+def test_grant_and_deny_bump_version(db):
+    resolver = PermissionResolver(maxsize=10)
+    resolver.resolve(1, db)
+
+    grant(db, "export_reports")
+    grant(db, "read_sale", granted=False)
+    assert resolver.resolve(1, db) == ["create_sale", "export_reports"]
+
+def test_role_changes_invalidate(db):
+    resolver = PermissionResolver(maxsize=10)
+    resolver.resolve(1, db)
+
+    role = db.query(Role).one()
+    role.permissions.append(db.query(Permission).filter(Permission.name == "delete_sale").one())
+    db.commit()
+    assert "delete_sale" in resolver.resolve(1, db)
+
+    user = db.get(User, 1)
+    user.role = Role(name="viewer", display_name="Viewer")
+    db.commit()
+    assert resolver.resolve(1, db) == []
+
+def test_expiring_grants_are_honored(db):
+    resolver = PermissionResolver(maxsize=10)
+    grant(db, "export_reports", expires_at=datetime.utcnow() + timedelta(seconds=1))
+    assert "export_reports" in resolver.resolve(1, db)
+
+    entry = resolver._entries[1]
+    resolver._entries[1] = entry._replace(valid_until=datetime.utcnow() - timedelta(seconds=1))
+    db.query(UserPermission).update({UserPermission.expires_at: datetime.utcnow() - timedelta(seconds=1)})
+    db.commit()
+    assert "export_reports" not in resolver.resolve(1, db)
+
+def test_deactivating_a_permission_invalidates(db):
+    resolver = PermissionResolver(maxsize=10)
+    grant(db, "export_reports")
+    assert resolver.resolve(1, db) == ["create_sale", "export_reports", "read_sale"]
+
+    for name in ("read_sale", "export_reports"):
+        db.query(Permission).filter(Permission.name == name).one().is_active = False
+    db.commit()
+    assert resolver.resolve(1, db) == ["create_sale"]
+
+    db.query(Permission).filter(Permission.name == "read_sale").one().is_active = True
+    db.commit()
+    assert resolver.resolve(1, db) == ["create_sale", "read_sale"]
@@ -0,0 +1,151 @@
+import pytest
+from datetime import datetime, timedelta
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.config import settings
+from app.core.revocation import BloomFilter, revocation_list
+from app.core.security import create_access_token, get_password_hash
+from app.models.rbac import Permission, Role
+from app.models.revocation import RevokedToken
+from app.models.user import User
+
+@pytest.fixture
+def client(session_factory, monkeypatch):
+    # Rebuild the process-wide filter from this test's database
+    monkeypatch.setattr(revocation_list, "_built_at", float("-inf"))
+    monkeypatch.setattr(revocation_list, "_synced_at", float("-inf"))
+
+    db = session_factory()
+    update_user = Permission(name="update_user", display_name="Update Users", resource="users", action="update")
+    admin = Role(name="admin", display_name="Admin", permissions=[update_user])
+    db.add_all([admin, update_user])
+    for username in ("admin1", "cashier1"):
+        db.add(User(
+            username=username, email=f"{username}@possystem.com", full_name=username,
+            hashed_password=get_password_hash("secret123"),
+            role=admin if username == "admin1" else None
+        ))
+    db.commit()
+    db.close()
+    return TestClient(app), session_factory
+
+def issue(SessionLocal, username):
+    db = SessionLocal()
+    user = db.query(User).options(*User.permission_load_options()).filter(User.username == username).one()
+    tokens = create_access_token(user)
+    db.close()
+    return tokens
+
+def auth(token):
+    return {"Authorization": f"Bearer {token}"}
+
+def test_bloom_filter_membership_and_error_rate():
+    bloom = BloomFilter.for_capacity(1000, 0.01)
+    for i in range(1000):
+        bloom.add(f"jti:{i}")
+    assert all(f"jti:{i}" in bloom for i in range(1000))
+    false_positives = sum(f"other:{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+
+def test_logout_revokes_access_and_refresh_tokens(client):
+    client, SessionLocal = client
+    tokens = issue(SessionLocal, "cashier1")
+    other = issue(SessionLocal, "cashier1")
+
+    assert client.get("/api/v1/auth/me", headers=auth(tokens["access_token"])).status_code == 200
+    response = client.post(
+        "/api/v1/auth/logout", json={"refresh_token": tokens["refresh_token"]},
+        headers=auth(tokens["access_token"])
+    )
+    assert response.status_code == 200
+
+    assert client.get("/api/v1/auth/me", headers=auth(tokens["access_token"])).status_code == 401
+    assert client.post(
+        "/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]}
+    ).status_code == 401
+    # Other sessions stay valid
+    assert client.get("/api/v1/auth/me", headers=auth(other["access_token"])).status_code == 200
+
+def test_password_change_revokes_all_tokens(client):
+    client, SessionLocal = client
+    tokens = issue(SessionLocal, "cashier1")
+
+    response = client.post(
+        "/api/v1/auth/change-password",
+        json={"current_password": "secret123", "new_password": "new-secret-456"},
+        headers=auth(tokens["access_token"])
+    )
+    assert response.status_code == 200
+    assert client.get("/api/v1/auth/me", headers=auth(tokens["access_token"])).status_code == 401
+
+    login = client.post("/api/v1/auth/login", json={"username": "cashier1", "password": "new-secret-456"})
+    assert login.status_code == 200
+    assert client.get("/api/v1/auth/me", headers=auth(login.json()["access_token"])).status_code == 200
+
+def test_deactivation_revokes_tokens(client):
+    client, SessionLocal = client
+    admin = issue(SessionLocal, "admin1")["access_token"]
+    cashier = issue(SessionLocal, "cashier1")["access_token"]
+
+    db = SessionLocal()
+    cashier_id = db.query(User.id).filter(User.username == "cashier1").scalar()
+    db.close()
+
+    assert client.post(f"/api/v1/auth/users/{cashier_id}/deactivate", headers=auth(cashier)).status_code == 403
+    assert client.post(f"/api/v1/auth/users/{cashier_id}/deactivate", headers=auth(admin)).status_code == 200
+    assert client.get("/api/v1/auth/me", headers=auth(cashier)).status_code == 401
+
+def test_revocations_snapshot_delta_and_exact_check(client):
+    client, SessionLocal = client
+    tokens = issue(SessionLocal, "cashier1")
+
+    service = {"X-Service-Key": settings.SERVICE_API_KEY}
+
+    snapshot = client.get("/api/v1/auth/revocations", headers=service).json()
+    assert snapshot["filter"]["size"] > 0
+
+    client.post("/api/v1/auth/logout", json={}, headers=auth(tokens["access_token"]))
+    delta = client.get("/api/v1/auth/revocations", params={"since": snapshot["cursor"]}, headers=service).json()
+    assert len(delta["keys"]) == 1
+    assert delta["cursor"] > snapshot["cursor"]
+
+    claims = jwt_claims(tokens["access_token"])
+    params = {"jti": claims["jti"], "user_id": claims["sub"], "iat": claims["iat"]}
+    check = client.get("/api/v1/auth/revocations/check", params=params, headers=service)
+    assert check.json() == {"revoked": True}
+
+    # Services or signed-in users only
+    other = issue(SessionLocal, "admin1")["access_token"]
+    assert client.get("/api/v1/auth/revocations").status_code == 401
+    assert client.get("/api/v1/auth/revocations/check", params=params).status_code == 401
+    assert client.get("/api/v1/auth/revocations", headers={"X-Service-Key": "wrong"}).status_code == 401
+    assert client.get("/api/v1/auth/revocations", headers=auth(other)).status_code == 200
+
+def test_delta_resends_rows_that_committed_late(client):
+    client, SessionLocal = client
+    service = {"X-Service-Key": settings.SERVICE_API_KEY}
+    now = datetime.utcnow()
+    db = SessionLocal()
+    db.add_all([
+        RevokedToken(id=5, key="jti:early", reason="logout", revoked_at=now - timedelta(hours=1),
+                     expires_at=now + timedelta(hours=1)),
+        RevokedToken(id=10, key="jti:fast", reason="logout", revoked_at=now, expires_at=now + timedelta(hours=1)),
+    ])
+    db.commit()
+    cursor = client.get("/api/v1/auth/revocations", headers=service).json()["cursor"]
+    assert cursor == 10
+
+    # id 7 was taken before id 10 but its transaction committed after the read
+    db.add(RevokedToken(id=7, key="jti:slow", reason="logout", revoked_at=now, expires_at=now + timedelta(hours=1)))
+    db.commit()
+    db.close()
+    delta = client.get("/api/v1/auth/revocations", params={"since": cursor}, headers=service).json()
+    assert "jti:slow" in delta["keys"] and "jti:early" not in delta["keys"]
+    assert delta["cursor"] == 10
+
+    revocation_list.sync(SessionLocal(), force=True)
+    assert "jti:slow" in revocation_list._filter
+
+def jwt_claims(token):
+    from jose import jwt
+    return jwt.get_unverified_claims(token)
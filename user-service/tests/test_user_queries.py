@@ -0,0 +1,87 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from app.main import app
+from app.core.revocation import revocation_list
+from app.core.security import create_access_token, get_password_hash
+from app.models.rbac import Permission, Role, UserPermission
+from app.models.user import User
+
+PASSWORD_HASH = get_password_hash("secret123")
+
+@pytest.fixture
+def env(session_factory):
+    statements = []
+
+    @event.listens_for(session_factory.kw["bind"], "before_cursor_execute")
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    # The revocation filter syncs periodically, not per request; keep it out of the counts
+    db = session_factory()
+    revocation_list.sync(db, force=True)
+    db.close()
+    yield session_factory, statements
+    event.remove(session_factory.kw["bind"], "before_cursor_execute", count)
+
+def seed_users(SessionLocal, count):
+    db = SessionLocal()
+    read_user = Permission(name="read_user", display_name="View Users", resource="users", action="read")
+    export = Permission(name="export_reports", display_name="Export", resource="reports", action="export")
+    role = Role(name="manager", display_name="Manager", permissions=[read_user])
+    db.add_all([role, read_user, export])
+    for i in range(count):
+        user = User(
+            username=f"user{i}", email=f"user{i}@possystem.com", full_name=f"User {i}",
+            hashed_password=PASSWORD_HASH, role=role
+        )
+        db.add(user)
+        db.flush()
+        db.add(UserPermission(user_id=user.id, permission_id=export.id, granted=True))
+    db.commit()
+    admin = db.query(User).options(*User.permission_load_options()).first()
+    token = create_access_token(admin)["access_token"]
+    db.close()
+    return token
+
+def list_users_statements(env, count):
+    SessionLocal, statements = env
+    token = seed_users(SessionLocal, count)
+    statements.clear()
+    response = TestClient(app).get(
+        "/api/v1/auth/users", headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200
+    users = response.json()
+    assert len(users) == count
+    assert sorted(users[0]["permissions"]) == ["export_reports", "read_user"]
+    return len(statements)
+
+@pytest.mark.parametrize("count", [3, 40])
+def test_list_users_query_count_is_constant(env, count):
+    assert list_users_statements(env, count) <= 5
+
+def test_login_query_count(env):
+    SessionLocal, statements = env
+    seed_users(SessionLocal, 3)
+    statements.clear()
+    response = TestClient(app).post(
+        "/api/v1/auth/login", json={"username": "user1", "password": "secret123"}
+    )
+    assert response.status_code == 200
+    selects = [s for s in statements if s.lstrip().upper().startswith("SELECT")]
+    assert len(selects) <= 6
+
+def test_users_with_a_custom_role_are_listed(env):
+    SessionLocal, _ = env
+    token = seed_users(SessionLocal, 1)
+    db = SessionLocal()
+    db.add(User(
+        username="night", email="night@possystem.com", full_name="Night Shift",
+        hashed_password=PASSWORD_HASH, role=Role(name="night_supervisor", display_name="Night Supervisor")
+    ))
+    db.commit()
+    db.close()
+    response = TestClient(app).get("/api/v1/auth/users", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    assert sorted(user["role"] for user in response.json()) == ["manager", "night_supervisor"]